@@ -6,11 +6,11 @@ from datetime import datetime
 from .statuses.booking_statii import BookingStatus
 
 class AddBookingAmmendmentCommand:
-    def __init__(self, request: AddBookingAmmendmentRequest, response, logger):
+    def __init__(self, request: AddBookingAmmendmentRequest, response, logger, unit_of_work = None):
         self.request = request
         self.response = response
         self.logger = logger
-        self.booking_repository = BookingRepository()
+        self.booking_repository = BookingRepository(unit_of_work)
 
     def Execute(self):
         try:
@@ -25,6 +25,10 @@ class AddBookingAmmendmentCommand:
 
             bookingAmendment = self._createBookingAmendment()
             self.booking_repository.AddBookingAmmendment(bookingAmendment)
+
+            # An ammendment approved by both parties up front takes effect immediately
+            if bookingAmendment.DriverApproval and bookingAmendment.PassengerApproval:
+                self.booking_repository.RefreshEffectiveBooking(bookingAmendment.BookingId)
             self.logger.debug(f"Added booking amendment for booking {self.request.BookingId} successfully.")
 
             return {"Status": "Success", "BookingAmmendmentId": f"{bookingAmendment.BookingAmmendmentId}"}
@@ -6,12 +6,12 @@ from .statuses.booking_statii import BookingStatus
 
 class ApproveBookingCommand:
 
-    def __init__(self, booking_id, request : ApproveBookingRequest, response, logger, email_sender, dvla_client):
+    def __init__(self, booking_id, request : ApproveBookingRequest, response, logger, email_sender, dvla_client, unit_of_work = None):
         self.booking_id = booking_id
         self.request = request
         self.response = response
         self.logger = logger
-        self.booking_repository = BookingRepository()
+        self.booking_repository = BookingRepository(unit_of_work)
         self.dvla_client = dvla_client
         self.email_sender = email_sender
 
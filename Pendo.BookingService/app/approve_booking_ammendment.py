@@ -5,7 +5,7 @@ from datetime import datetime
 from fastapi import status
 from .statuses.booking_statii import BookingStatus
 from .payment_service_api import PaymentServiceClient
-from .cron_checker import getNextTimes
+from .cron_checker import countOccurrences
 
 class ApproveBookingAmmendmentCommand:
 
@@ -16,12 +16,14 @@ class ApproveBookingAmmendmentCommand:
                  logger, 
                  email_sender, 
                  dvla_client,
-                 payment_service_client : PaymentServiceClient):
+                 payment_service_client : PaymentServiceClient,
+                 unit_of_work = None):
         self.ammendment_id = ammendment_id
         self.request = request
         self.response = response
         self.logger = logger
-        self.booking_repository = BookingRepository()
+        self.unit_of_work = unit_of_work
+        self.booking_repository = BookingRepository(unit_of_work)
         self.dvla_client = dvla_client
         self.email_sender = email_sender
         self.payment_service_client = payment_service_client
@@ -58,7 +60,7 @@ class ApproveBookingAmmendmentCommand:
                     self.response.status_code = status.HTTP_401_UNAUTHORIZED
                     raise Exception(f"User {self.request.UserId} not authorised to cancel booking ammendment {self.ammendment_id}")
                 
-                self._applyAmmendment(booking_ammendment, passenger, driver, journey)
+                self._applyAmmendment(booking_ammendment, passenger, driver, journey, booking.BookingStatusId)
                 return self._success("Booking ammendment fully approved and booking cancelled.")
             
             self._setApprovals(booking_ammendment, driver, passenger)
@@ -66,7 +68,7 @@ class ApproveBookingAmmendmentCommand:
             if booking_ammendment.DriverApproval and booking_ammendment.PassengerApproval:
                 self.logger.debug(f"Booking ammendment {self.ammendment_id} fully approved. Updating booking...")
 
-                self._applyAmmendment(booking_ammendment, passenger, driver, journey)
+                self._applyAmmendment(booking_ammendment, passenger, driver, journey, booking.BookingStatusId)
                 if booking_ammendment.CancellationRequest:
                     return self._success("Booking ammendment fully approved and booking cancelled.")
                 return self._success("Booking ammendment fully approved and applied to booking. Booking set to confirmed.")
@@ -85,7 +87,9 @@ class ApproveBookingAmmendmentCommand:
                 self.response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
             return {"Status": "Error", "Message": str(e)}
     
-    def _applyAmmendment(self, ammendment, passenger, driver, journey):
+    def _applyAmmendment(self, ammendment, passenger, driver, journey, previous_status):
+        self.booking_repository.RefreshEffectiveBooking(ammendment.BookingId)
+
         email_data = generateEmailDataFromAmmendment(ammendment, driver, journey, self.dvla_client.GetVehicleDetails(journey.RegPlate))
 
         if ammendment.CancellationRequest:
@@ -100,10 +104,9 @@ class ApproveBookingAmmendmentCommand:
             num_journeys = 1
 
             if booking["Journey"]["JourneyType"] == 2:
-                num_journeys = len(getNextTimes(booking["Journey"]["Recurrence"], 
-                                            booking["Booking"]["RideTime"], 
-                                            booking["Booking"]["BookedWindowEnd"], 
-                                            9999))
+                num_journeys = countOccurrences(booking["Journey"]["Recurrance"],
+                                                booking["Booking"]["RideTime"],
+                                                booking["Booking"]["BookedWindowEnd"])
 
             booking_id = booking["Booking"]["BookingId"]
             amount = booking["Journey"]["Price"] * num_journeys
@@ -112,6 +115,10 @@ class ApproveBookingAmmendmentCommand:
             journeyTime = booking["Journey"]["StartTime"]
             userId = self.request.UserId
 
+            # The payment service reads the booking, so it is committed before the call
+            if self.unit_of_work is not None:
+                self.unit_of_work.Commit()
+
             if not self.payment_service_client.RefundRequest(userId, 
                                                              booking_id, 
                                                              journeyTime, 
@@ -120,6 +127,13 @@ class ApproveBookingAmmendmentCommand:
                 
                 msg = "Error refunding user"
                 self.logger.error(msg)
+
+                # The cancellation is already committed, so it is undone rather than rolled back
+                self.logger.debug(f"Restoring booking {ammendment.BookingId} to status {previous_status}.")
+                self.booking_repository.UpdateBookingStatus(ammendment.BookingId, previous_status)
+                # Committed here, the failed request's rollback would otherwise discard the restore
+                if self.unit_of_work is not None:
+                    self.unit_of_work.Commit()
                 raise Exception(msg)
             
             self.logger.info(f"User {passenger.UserId} refunded successfully.")
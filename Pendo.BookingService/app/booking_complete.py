@@ -3,19 +3,20 @@ from fastapi import status
 from .responses import StatusResponse
 from .statuses.booking_statii import BookingStatus
 from .payment_service_api import PaymentServiceClient
-from .cron_checker import getNextTimes
+from .cron_checker import countOccurrences
 
 class BookingCompleteCommand:
     """
     BookingCompleteCommand class is a command object for completing a booking.
     """
 
-    def __init__(self, bookingId, request, response, logger, payment_service_client):
+    def __init__(self, bookingId, request, response, logger, payment_service_client, unit_of_work = None):
         self.bookingId = bookingId
         self.request = request
         self.response = response
         self.logger = logger
-        self.booking_repository = BookingRepository()
+        self.unit_of_work = unit_of_work
+        self.booking_repository = BookingRepository(unit_of_work)
         self.payment_service_client : PaymentServiceClient = payment_service_client
 
     def Execute(self) -> StatusResponse:
@@ -69,15 +70,18 @@ class BookingCompleteCommand:
                     
                     num_journeys = 1
                     if booking["Journey"]["JourneyType"] == 2:
-                        num_journeys = len(getNextTimes(booking["Journey"]["Recurrence"], 
-                                                    booking["Booking"]["RideTime"], 
-                                                    booking["Booking"]["BookedWindowEnd"], 
-                                                    9999))
+                        num_journeys = countOccurrences(booking["Journey"]["Recurrance"],
+                                                        booking["Booking"]["RideTime"],
+                                                        booking["Booking"]["BookedWindowEnd"])
 
                     amount = booking["Journey"]["Price"] * num_journeys
                     
                     # Note: The discount has already been applied to the journey price in the GetBookingsForUser method
 
+                    # The payment service reads the booking, so it is committed before the call
+                    if self.unit_of_work is not None:
+                        self.unit_of_work.Commit()
+
                     self.logger.info(f"Sending completed booking request to payment service for booking {self.bookingId}")
                     if not self.payment_service_client.CompletedBookingRequest(self.bookingId, amount):
                         msg = "Payment service returned an error, rolloing booking back to not completed."
@@ -1,34 +1,66 @@
-from .models import Booking, User, Journey, BookingAmmendment, Configuration
-from sqlalchemy.orm import joinedload, with_loader_criteria
+from .models import Booking, User, Journey, BookingAmmendment, Configuration, Discounts, EffectiveBooking
+from .models import BookingStatus as BookingStatusModel
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
 from .db_provider import get_db
 from datetime import datetime
 from .statuses.booking_statii import BookingStatus
+from typing import NamedTuple, Optional
 import logging
 
+# Ammendment values projected onto EffectiveBooking, which falls back to the booking / journey where they are NULL
+EFFECTIVE_AMMENDMENT_FIELDS = ("ProposedPrice", "StartName", "StartLong", "StartLat", "EndName", "EndLong", "EndLat", "StartTime", "Recurrance")
+
+class BookingCreationContext(NamedTuple):
+    """
+    Rows needed to create a booking, loaded together by GetBookingCreationContext.
+    """
+    User: Optional[User]
+    Journey: Optional[Journey]
+    Driver: Optional[User]
+    ExistingBooking: Optional[Booking]
+    Discount: Optional[Discounts]
+
 class BookingRepository():
     """
     This class is responsible for handling all the database operations related to bookings
     """
 
-    def __init__(self):
+    def __init__(self, unit_of_work = None):
         """
         Constructor for BookingRepository class.
+        :param unit_of_work: Optional unit of work whose session is used. Changes are then only
+                             flushed and the unit of work commits them once for the whole command.
+                             Without one the repository owns a session and commits each change.
         """
         self.logger = logging.getLogger(__name__)
-        self.db_session = next(get_db())
+        self.unit_of_work = unit_of_work
+        self.db_session = unit_of_work.session if unit_of_work is not None else next(get_db())
 
     def __del__(self):
         """
         Destructor for BookingRepository class.
         
-        Disposes the database session.
+        Disposes the database session if the repository owns it.
         Needed to prevent https://docs.sqlalchemy.org/en/20/errors.html#error-3o7r
         """
-        self.db_session.close()
+        if getattr(self, "unit_of_work", None) is None and hasattr(self, "db_session"):
+            self.db_session.close()
+
+    def _save(self):
+        """
+        Persist pending changes: flushed within a unit of work, otherwise committed.
+        """
+        if self.unit_of_work is not None:
+            self.db_session.flush()
+        else:
+            self.db_session.commit()
 
     def GetBookingsForUser(self, user_id, booking_id = None, driver_view = False):
         """
         GetBookingsForUser method returns all the bookings for a specific user.
+        Ammendments are read from the effective booking projection, so no ammendments are loaded or folded here.
+        Bookings without an effective booking use their booking and journey values.
         :param user_id: Id of the user.
         :return: List of bookings for the user, along with journey (altered by any ammendments) and booking status.
         """
@@ -41,114 +73,99 @@ class BookingRepository():
         else:
             filters.append(Journey.UserId == user_id)
 
-        try:
-            return_dto = []
-            query_options = [
-                joinedload(Booking.BookingStatus_),
-                joinedload(Booking.User_),
-                joinedload(Booking.Journey_).joinedload(Journey.User_),
-                joinedload(Booking.BookingAmmendment, innerjoin=False),
-                with_loader_criteria(BookingAmmendment, (BookingAmmendment.DriverApproval & BookingAmmendment.PassengerApproval))
-            ]
-            
-            try:
-                if hasattr(Journey, 'Discounts_'):
-                    query_options.append(joinedload(Booking.Journey_).joinedload(Journey.Discounts_, innerjoin=False))
-            except Exception as e:
-                self.logger.warning(f"Could not join Discounts_: {e}")
-                
-            bookings = self.db_session.query(Booking)\
-                .join(Booking.Journey_)\
-                .filter(*filters)\
-                .options(*query_options)\
-                .all()
-            
-        except Exception as e:
-            self.logger.error(f"Error getting bookings: {e}")
-            # Fall back to a simpler query if the relationship causes issues
-            query_options = [
-                joinedload(Booking.BookingStatus_),
-                joinedload(Booking.User_),
-                joinedload(Booking.Journey_).joinedload(Journey.User_),
-                joinedload(Booking.BookingAmmendment, innerjoin=False)
-            ]
-                
-            bookings = self.db_session.query(Booking)\
-                .join(Booking.Journey_)\
-                .filter(*filters)\
-                .options(*query_options)\
-                .all()
-            
-        # Process each booking
-        for booking in bookings:
-            startTime, startName, startLong, startLat, endName, endLong, endLat, rideTime, price, reccurance = (None,) * 10
-
-            if booking.BookingAmmendment:
-                for amendment in sorted(booking.BookingAmmendment, key=lambda x: x.CreateDate):
-                    startTime = self.setIfNotNull(amendment.StartTime)
-                    startName = self.setIfNotNull(amendment.StartName)
-                    startLong = self.setIfNotNull(amendment.StartLong)
-                    startLat = self.setIfNotNull(amendment.StartLat)
-                    endName = self.setIfNotNull(amendment.EndName)
-                    endLong = self.setIfNotNull(amendment.EndLong)
-                    endLat = self.setIfNotNull(amendment.EndLat)
-                    rideTime = self.setIfNotNull(amendment.StartTime)
-                    price = self.setIfNotNull(amendment.ProposedPrice)
-                    reccurance = self.setIfNotNull(amendment.Recurrance)
+        passenger = aliased(User)
+        driver = aliased(User)
+        rows = self.db_session.query(Booking, EffectiveBooking, BookingStatusModel, Journey, passenger, driver, Discounts)\
+            .select_from(Booking)\
+            .outerjoin(EffectiveBooking, EffectiveBooking.BookingId == Booking.BookingId)\
+            .join(BookingStatusModel, BookingStatusModel.BookingStatusId == Booking.BookingStatusId)\
+            .join(Journey, Journey.JourneyId == Booking.JourneyId)\
+            .join(passenger, passenger.UserId == Booking.UserId)\
+            .join(driver, driver.UserId == Journey.UserId)\
+            .outerjoin(Discounts, Discounts.DiscountID == Journey.DiscountID)\
+            .filter(*filters)\
+            .all()
 
+        return_dto = []
+        for booking, effective, booking_status, journey, passenger_user, driver_user, discount in rows:
             # Get the base price from journey or amendment
-            base_price = self.setDefaultIfNotNull(price, booking.Journey_.AdvertisedPrice)
+            base_price = self._ammendedValue(effective, "ProposedPrice", journey.AdvertisedPrice)
             discount_info = None
-            
+
             # Apply discount for commuter journeys if available
-            try:
-                if booking.Journey_.JourneyType == 2 and hasattr(booking.Journey_, 'Discounts_') and booking.Journey_.Discounts_ is not None:
-                    discount = booking.Journey_.Discounts_
-                    discount_info = {
-                        "DiscountID": discount.DiscountID,
-                        "WeeklyJourneys": discount.WeeklyJourneys,
-                        "DiscountPercentage": discount.DiscountPercentage,
-                        "OriginalPrice": float(base_price)
-                    }
-                    # Apply the discount
-                    base_price = float(base_price) * (1 - discount.DiscountPercentage)
-            except Exception as e:
-                self.logger.warning(f"Could not apply discount: {e}")
+            if journey.JourneyType == 2 and discount is not None:
+                discount_info = {
+                    "DiscountID": discount.DiscountID,
+                    "WeeklyJourneys": discount.WeeklyJourneys,
+                    "DiscountPercentage": discount.DiscountPercentage,
+                    "OriginalPrice": float(base_price)
+                }
+                base_price = float(base_price) * (1 - discount.DiscountPercentage)
 
             return_dto.append({
                 "Booking": {
                     "BookingId": booking.BookingId,
-                    "User": booking.User_,
+                    "User": passenger_user,
                     "FeeMargin": booking.FeeMargin,
-                    "RideTime": self.setDefaultIfNotNull(rideTime, booking.RideTime),
+                    "RideTime": self._ammendedValue(effective, "StartTime", booking.RideTime),
                     "BookedWindowEnd": booking.BookedWindowEnd,
                 },
                 "BookingStatus": {
                     "StatusId": booking.BookingStatusId,
-                    "Status": booking.BookingStatus_.Status,
-                    "Description": booking.BookingStatus_.Description
+                    "Status": booking_status.Status,
+                    "Description": booking_status.Description
                 },
                 "Journey": {
                     "JourneyId": booking.JourneyId,
-                    "User": booking.Journey_.User_,
-                    "StartTime" : self.setDefaultIfNotNull(startTime, booking.RideTime),
-                    "StartName": self.setDefaultIfNotNull(startName, booking.Journey_.StartName),
-                    "StartLong": self.setDefaultIfNotNull(startLong, booking.Journey_.StartLong),
-                    "StartLat": self.setDefaultIfNotNull(startLat, booking.Journey_.StartLat),
-                    "EndName": self.setDefaultIfNotNull(endName, booking.Journey_.EndName),
-                    "EndLong": self.setDefaultIfNotNull(endLong, booking.Journey_.EndLong),
-                    "EndLat": self.setDefaultIfNotNull(endLat, booking.Journey_.EndLat),
+                    "User": driver_user,
+                    "StartTime" : self._ammendedValue(effective, "StartTime", booking.RideTime),
+                    "StartName": self._ammendedValue(effective, "StartName", journey.StartName),
+                    "StartLong": self._ammendedValue(effective, "StartLong", journey.StartLong),
+                    "StartLat": self._ammendedValue(effective, "StartLat", journey.StartLat),
+                    "EndName": self._ammendedValue(effective, "EndName", journey.EndName),
+                    "EndLong": self._ammendedValue(effective, "EndLong", journey.EndLong),
+                    "EndLat": self._ammendedValue(effective, "EndLat", journey.EndLat),
                     "Price": base_price,
                     "Discount": discount_info,
-                    "JourneyStatusId": booking.Journey_.JourneyStatusId,
-                    "JourneyType": booking.Journey_.JourneyType,
-                    "Recurrance": self.setDefaultIfNotNull(reccurance, booking.Journey_.Recurrance)
+                    "JourneyStatusId": journey.JourneyStatusId,
+                    "JourneyType": journey.JourneyType,
+                    "Recurrance": self._ammendedValue(effective, "Recurrance", journey.Recurrance)
                 }
             })
 
         return return_dto
 
+    def RefreshEffectiveBooking(self, booking_id):
+        """
+        RefreshEffectiveBooking method projects the latest approved ammendment (by CreateDate) of a booking
+        onto its effective booking, which GetBookingsForUser reads. Called whenever an ammendment is applied
+        or added already approved by both driver and passenger.
+        :param booking_id: Id of the booking.
+        """
+        effective = self.db_session.get(EffectiveBooking, booking_id)
+        if effective is None:
+            effective = EffectiveBooking(BookingId=booking_id)
+            self.db_session.add(effective)
+
+        ammendment = self.db_session.query(BookingAmmendment)\
+            .filter(BookingAmmendment.BookingId == booking_id,
+                    BookingAmmendment.DriverApproval,
+                    BookingAmmendment.PassengerApproval)\
+            .order_by(BookingAmmendment.CreateDate.desc())\
+            .first()
+
+        effective.BookingAmmendmentId = ammendment.BookingAmmendmentId if ammendment is not None else None
+        for field in EFFECTIVE_AMMENDMENT_FIELDS:
+            setattr(effective, field, getattr(ammendment, field) if ammendment is not None else None)
+        effective.UpdateDate = datetime.now()
+        self._save()
     
+    def _ammendedValue(self, effective, field, default):
+        """
+        Value of a field from the effective booking, or the default where there is none.
+        """
+        return self.setDefaultIfNotNull(getattr(effective, field) if effective is not None else None, default)
+
     def setDefaultIfNotNull(self, value, default):
         return value if value is not None else default
     
@@ -191,13 +208,36 @@ class BookingRepository():
         """
         return self.db_session.query(Booking).filter(Booking.UserId == user_id, Booking.JourneyId == journey_id).first()
     
+    def GetBookingCreationContext(self, user_id, journey_id) -> BookingCreationContext:
+        """
+        GetBookingCreationContext method loads the passenger, journey, driver, any existing booking
+        of the journey by the passenger and the journey's discount in a single query.
+        :param user_id: Id of the passenger.
+        :param journey_id: Id of the journey.
+        :return: BookingCreationContext, with User None if the user does not exist and Journey None if the journey does not.
+        """
+        driver = aliased(User)
+        row = self.db_session.query(User, Journey, driver, Booking, Discounts)\
+            .select_from(User)\
+            .outerjoin(Journey, Journey.JourneyId == journey_id)\
+            .outerjoin(driver, driver.UserId == Journey.UserId)\
+            .outerjoin(Booking, and_(Booking.UserId == User.UserId, Booking.JourneyId == Journey.JourneyId))\
+            .outerjoin(Discounts, Discounts.DiscountID == Journey.DiscountID)\
+            .filter(User.UserId == user_id)\
+            .first()
+
+        if row is None:
+            return BookingCreationContext(None, None, None, None, None)
+
+        return BookingCreationContext(*row)
+
     def CreateBooking(self, booking):
         """
         CreateBooking method creates a new booking in the database.
         :param booking: Booking object to be created.
         """
         self.db_session.add(booking)
-        self.db_session.commit()
+        self._save()
 
     def DeleteBooking(self, booking):
         """
@@ -206,7 +246,7 @@ class BookingRepository():
         """
         booking = self.GetBookingById(booking.BookingId)
         self.db_session.delete(booking)
-        self.db_session.commit()
+        self._save()
 
     def MarkJourneyBooked(self, booking):
         """
@@ -214,7 +254,19 @@ class BookingRepository():
         """
         journey = self.GetJourney(booking.JourneyId)
         journey.JourneyStatusId = 2
-        self.db_session.commit()
+        self._save()
+
+    def MarkBookingPending(self, booking, journey):
+        """
+        MarkBookingPending method sets an already loaded booking to pending and its journey to booked,
+        persisting both changes together.
+        :param booking: Booking object to be updated.
+        :param journey: Journey object of the booking.
+        """
+        booking.BookingStatusId = BookingStatus.Pending
+        booking.UpdateDate = datetime.now()
+        journey.JourneyStatusId = 2
+        self._save()
 
     def ApproveBooking(self, booking_id):
         """
@@ -231,7 +283,7 @@ class BookingRepository():
         
         booking.DriverApproval = True
         booking.UpdatedDate = datetime.now()
-        self.db_session.commit()
+        self._save()
 
         return booking
 
@@ -248,7 +300,7 @@ class BookingRepository():
         
         booking.BookingStatusId = bookingStatusId
         booking.UpdateDate = datetime.now()
-        self.db_session.commit()
+        self._save()
 
     def AddBookingAmmendment(self, booking_ammendment):
         """
@@ -256,7 +308,7 @@ class BookingRepository():
         :param booking_ammendment: BookingAmmendment object to be added.
         """
         self.db_session.add(booking_ammendment)
-        self.db_session.commit()
+        self._save()
 
     def GetBookingAmmendment(self, booking_ammendment_id):
         """
@@ -287,7 +339,7 @@ class BookingRepository():
         :param booking_ammendment: BookingAmmendment object to be updated.
         """
         booking_ammendment.UpdateDate = datetime.now()
-        self.db_session.commit()
+        self._save()
 
     def UpdateBooking(self, booking):
         """
@@ -295,7 +347,7 @@ class BookingRepository():
         :param booking: Booking object to be updated.
         """
         booking.UpdateDate = datetime.now()
-        self.db_session.commit()
+        self._save()
 
     def CalculateDriverRating(self, driver_id):
         """
@@ -325,4 +377,4 @@ class BookingRepository():
         rating = completed_count / float(total_bookings) if total_bookings > 0 else -1.0
 
         driver.UserRating = rating
-        self.db_session.commit()
\ No newline at end of file
+        self._save()
\ No newline at end of file
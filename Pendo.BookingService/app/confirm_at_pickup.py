@@ -9,9 +9,9 @@ from .requests import ConfirmAtPickupRequest
 
 class ConfirmAtPickupCommand:
 
-    def __init__(self, booking_id: str, request : ConfirmAtPickupRequest, response, configuration_provider, email_sender, logger, dvla_client):
+    def __init__(self, booking_id: str, request : ConfirmAtPickupRequest, response, configuration_provider, email_sender, logger, dvla_client, unit_of_work = None):
         self.booking_id = booking_id
-        self.booking_repository = BookingRepository()
+        self.booking_repository = BookingRepository(unit_of_work)
         self.request = request
         self.response = response
         self.configuration_provider = configuration_provider
@@ -1,15 +1,13 @@
 from .booking_repository import BookingRepository, Booking
 from .email_sender import generateEmailDataFromBooking
 from datetime import datetime
-from .cron_checker import checkTimeValid, getNextTimes
+from .cron_checker import checkTimeValid, countOccurrences
 from sqlalchemy import DECIMAL, cast
 from fastapi import status
 from .statuses.booking_statii import BookingStatus
 from .responses import StatusResponse
 from .requests import CreateBookingRequest
-from .db_provider import get_db
 from .payment_service_api import PaymentServiceClient
-from .models import Discounts
 
 class CreateBookingCommand:
     """
@@ -23,12 +21,15 @@ class CreateBookingCommand:
                  logger, 
                  dvla_client, 
                  configuration_provider,
-                 payment_service_client : PaymentServiceClient):
+                 payment_service_client : PaymentServiceClient,
+                 unit_of_work = None):
         """
         Constructor for CreateBookingCommand class.
         :param request: Request object containing the booking details.
+        :param unit_of_work: Optional unit of work shared by the command's database access.
         """
-        self.booking_repository = BookingRepository()
+        self.unit_of_work = unit_of_work
+        self.booking_repository = BookingRepository(unit_of_work)
         self.email_sender = email_sender
         self.request = request
         self.logger = logger
@@ -43,12 +44,14 @@ class CreateBookingCommand:
         :return: Response object containing the status of the operation.
         """
         try:
-            user = self.booking_repository.GetUser(self.request.UserId)
+            context = self.booking_repository.GetBookingCreationContext(self.request.UserId, self.request.JourneyId)
+
+            user = context.User
             if user is None:
                 self.response.status_code = status.HTTP_404_NOT_FOUND
                 raise Exception("User not found")
             
-            journey = self.booking_repository.GetJourney(self.request.JourneyId)
+            journey = context.Journey
             if journey is None:
                 self.response.status_code = status.HTTP_404_NOT_FOUND
                 raise Exception("Journey not found")
@@ -62,7 +65,7 @@ class CreateBookingCommand:
                 self.response.status_code = status.HTTP_400_BAD_REQUEST
                 raise Exception("Commuter journey must have a recurrance.")
             
-            existing_booking = self.booking_repository.GetExistingBooking(user.UserId, journey.JourneyId)
+            existing_booking = context.ExistingBooking
             if existing_booking is not None:
                 if journey.JourneyType == 2:
                     self._handleNewBookingWindow(existing_booking)
@@ -70,7 +73,7 @@ class CreateBookingCommand:
                     self.response.status_code = status.HTTP_400_BAD_REQUEST
                     raise Exception("Booking for this journey already exists")
             
-            current_booking_fee = self.configuration_provider.GetSingleValue(next(get_db()), "Booking.FeeMargin")
+            current_booking_fee = self.configuration_provider.GetSingleValue(self.booking_repository.db_session, "Booking.FeeMargin")
             if current_booking_fee is None:
                 self.response.status_code = status.HTTP_404_NOT_FOUND
                 raise Exception("Booking fee margin not found.")
@@ -93,39 +96,37 @@ class CreateBookingCommand:
             self.booking_repository.CreateBooking(booking)
             self.logger.debug(f"Booking DB object created successfully. BookingId: {booking.BookingId}")
 
+            # The payment service reads the booking, so it is committed before the call
+            if self.unit_of_work is not None:
+                self.unit_of_work.Commit()
+
             numJourneysInWindow = 1
             if journey.JourneyType == 2:
-                numJourneysInWindow = len(getNextTimes(journey.Recurrance, booking.RideTime, booking.BookedWindowEnd, 9999))
+                numJourneysInWindow = countOccurrences(journey.Recurrance, booking.RideTime, booking.BookedWindowEnd)
                 
             amount = journey.AdvertisedPrice * numJourneysInWindow
             
             # Apply discount if present for commuter journeys
-            if journey.JourneyType == 2 and journey.DiscountID is not None:
-                try:
-                    discount = self.booking_repository.db_session.query(Discounts).filter_by(DiscountID=journey.DiscountID).first()
-                    if discount is not None:
-                        self.logger.info(f"Applying discount: {discount.DiscountPercentage * 100}% off for {discount.WeeklyJourneys} weekly journeys")
-                        amount = amount * (1 - discount.DiscountPercentage)
-                except Exception as e:
-                    self.logger.warning(f"Could not apply discount: {e}")
-                    
-            print(journey.AdvertisedPrice, numJourneysInWindow, amount)
-            print(booking.BookingId, booking.RideTime, booking.BookedWindowEnd)
+            discount = context.Discount
+            if journey.JourneyType == 2 and discount is not None:
+                self.logger.info(f"Applying discount: {discount.DiscountPercentage * 100}% off for {discount.WeeklyJourneys} weekly journeys")
+                amount = amount * (1 - discount.DiscountPercentage)
 
             # Notify payment service of new booking
             if not self.payment_service_client.PendingBookingRequest(booking.BookingId, amount):
                  self.response.status_code = status.HTTP_403_FORBIDDEN
                  self.booking_repository.DeleteBooking(booking)
+                 # The booking was committed for the payment service, so its removal is committed
+                 # too, the failed request's rollback would otherwise leave it in place
+                 if self.unit_of_work is not None:
+                     self.unit_of_work.Commit()
                  raise Exception("Payment service failed to process booking. User balance insufficient.")
             
-            self.booking_repository.UpdateBookingStatus(booking.BookingId, BookingStatus.Pending)
+            # Booking and journey are already held, so both transitions are written without re-reading them
+            self.booking_repository.MarkBookingPending(booking, journey)
             self.logger.debug("Booking status updated to pending successfully.")
-            
-            self.booking_repository.MarkJourneyBooked(booking)
-
-            driver = self.booking_repository.GetUser(journey.UserId)
 
-            email_data = generateEmailDataFromBooking(booking, driver, journey, self.dvla_client.GetVehicleDetails(journey.RegPlate))
+            email_data = generateEmailDataFromBooking(booking, context.Driver, journey, self.dvla_client.GetVehicleDetails(journey.RegPlate))
 
             self.email_sender.SendBookingPending(user.Email, email_data)
             self.logger.debug("Booking pending email sent successfully.")
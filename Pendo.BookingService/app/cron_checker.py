@@ -1,6 +1,40 @@
 from cronex import CronExpression
 from croniter import croniter
-from datetime import datetime
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+import copy
+import numpy as np
+
+# Number of compiled cron expressions kept
+COMPILED_CRON_CACHE_SIZE = 1024
+# Number of (expression, window) occurrence counts kept
+OCCURRENCE_CACHE_SIZE = 4096
+
+# 1970-01-01 was a Thursday
+_EPOCH_WEEKDAY = 3
+
+@lru_cache(maxsize=COMPILED_CRON_CACHE_SIZE)
+def _compiledExpression(cron : str) -> CronExpression:
+    """
+    Parsed cronex expression. Checking a trigger does not change it, so one instance is shared.
+    """
+    return CronExpression(cron)
+
+@lru_cache(maxsize=COMPILED_CRON_CACHE_SIZE)
+def _compiledCroniter(cron : str) -> croniter:
+    """
+    Parsed croniter template. Iterating changes its position, so callers take a copy via _croniterFrom.
+    """
+    return croniter(cron)
+
+def _croniterFrom(cron : str, startTime : datetime) -> croniter:
+    """
+    Returns a croniter positioned at the start time, reusing the cached parse of the expression.
+    """
+    iter = copy.copy(_compiledCroniter(cron))
+    iter.set_current(startTime, force=True)
+    return iter
 
 def checkTimeValid(cron, time):
     """
@@ -10,7 +44,7 @@ def checkTimeValid(cron, time):
     :return: True if the time is valid, False otherwise.
     """
     try:
-        cron = CronExpression(cron)
+        cron = _compiledExpression(cron)
         time = datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
         time_tuple = (time.year, time.month, time.day, time.hour, time.minute)
         return cron.check_trigger(time_tuple)
@@ -41,7 +75,7 @@ def toHumanReadable(cron: str) -> str:
             return f"Every {minutes} minutes"
 
         base = datetime.now()
-        itr = croniter(cron, base)
+        itr = _croniterFrom(cron, base)
         next_date = itr.get_next(datetime)
         time_str = next_date.strftime("%I:%M %p").lstrip("0")
         
@@ -75,7 +109,7 @@ def getNextTimes(cron : str, startTime : datetime, endTime : datetime, max : int
     :return: List of times.
     """
     try:
-        iter = croniter(cron, startTime)
+        iter = _croniterFrom(cron, startTime)
         numTimes = 0
         times = []
         nextTime = iter.get_next(datetime)
@@ -88,3 +122,188 @@ def getNextTimes(cron : str, startTime : datetime, endTime : datetime, max : int
         return times
     except Exception as e:
         return str(e)
+
+def countOccurrences(cron : str, startTime : datetime, endTime : datetime) -> int:
+    """
+    countOccurrences method counts the times that satisfy the cron expression after the start time, up to and including the end time.
+    Matches len(getNextTimes(cron, startTime, endTime, ...)) for a valid expression.
+    Daily and weekly shapes (fixed months and days of the month left as '*') are counted arithmetically,
+    other expressions are iterated. Counts are memoized per expression and window.
+    :param cron: Cron expression.
+    :param startTime: Start time, exclusive.
+    :param endTime: End time, inclusive.
+    :return: Number of times.
+    :raises ValueError: If the cron expression is invalid.
+    """
+    return _countOccurrences(cron, startTime, endTime)
+
+@lru_cache(maxsize=OCCURRENCE_CACHE_SIZE)
+def _countOccurrences(cron, startTime, endTime):
+    if endTime <= startTime:
+        return 0
+
+    schedule = _parseWeeklySchedule(cron)
+    if schedule is None:
+        return _iterateOccurrences(cron, startTime, endTime)
+
+    timesOfDay, weekdays = schedule
+    count = 0
+    for timeOfDay in timesOfDay:
+        # First and last dates whose occurrence at this time lies inside the window
+        first = startTime.date()
+        if datetime.combine(first, timeOfDay) <= startTime:
+            first += timedelta(days=1)
+        last = endTime.date()
+        if datetime.combine(last, timeOfDay) > endTime:
+            last -= timedelta(days=1)
+        count += _countWeekdays(first, last, weekdays)
+
+    return count
+
+def _countWeekdays(first : date, last : date, weekdays : frozenset) -> int:
+    """
+    Counts the dates from first to last inclusive falling on one of the weekdays (Monday = 0).
+    """
+    days = (last - first).days + 1
+    if days <= 0:
+        return 0
+
+    weeks, remainder = divmod(days, 7)
+    count = weeks * len(weekdays)
+    start = first.weekday()
+    for offset in range(remainder):
+        if (start + offset) % 7 in weekdays:
+            count += 1
+    return count
+
+@lru_cache(maxsize=COMPILED_CRON_CACHE_SIZE)
+def _parseWeeklySchedule(cron : str):
+    """
+    Parses a five field expression whose day of month and month are '*' into its times of day
+    and weekdays (Monday = 0). Returns None for any other shape, including stepped days of the week,
+    whose expansion around Sunday being both 0 and 7 is left to croniter.
+    """
+    parts = cron.split()
+    if len(parts) != 5 or parts[2] != "*" or parts[3] != "*" or "/" in parts[4]:
+        return None
+
+    minutes = _expandField(parts[0], 0, 59)
+    hours = _expandField(parts[1], 0, 23)
+    cronDays = _expandField(parts[4], 0, 7)
+    if minutes is None or hours is None or cronDays is None:
+        return None
+
+    # Cron counts weekdays from Sunday as 0 (or 7), datetime from Monday as 0
+    weekdays = frozenset((day - 1) % 7 for day in cronDays)
+    timesOfDay = tuple(time(hour, minute) for hour in hours for minute in minutes)
+    return timesOfDay, weekdays
+
+def _expandField(field : str, low : int, high : int):
+    """
+    Expands a numeric cron field made of values, ranges and steps (e.g. '*', '9', '1-5', '*/15', '1,3,5')
+    into its sorted values. Returns None for anything else, such as names or special characters.
+    """
+    values = set()
+    for item in field.split(","):
+        rangePart, _, stepPart = item.partition("/")
+        step = 1
+        if stepPart:
+            if not stepPart.isdigit() or int(stepPart) == 0:
+                return None
+            step = int(stepPart)
+
+        if rangePart == "*":
+            first, last = low, high
+        elif rangePart.isdigit():
+            first = int(rangePart)
+            last = high if stepPart else first
+        else:
+            bounds = rangePart.split("-")
+            if len(bounds) != 2 or not all(bound.isdigit() for bound in bounds):
+                return None
+            first, last = int(bounds[0]), int(bounds[1])
+
+        if first < low or last > high or first > last:
+            return None
+        values.update(range(first, last + 1, step))
+
+    return sorted(values)
+
+def _iterateOccurrences(cron, startTime, endTime):
+    """
+    Counts occurrences by stepping through them with croniter.
+    """
+    try:
+        iter = _croniterFrom(cron, startTime)
+    except Exception as e:
+        raise ValueError(f"Invalid cron expression '{cron}': {e}")
+
+    count = 0
+    nextTime = iter.get_next(datetime)
+    while nextTime <= endTime:
+        count += 1
+        nextTime = iter.get_next(datetime)
+    return count
+
+def expandOccurrences(windows) -> list[np.ndarray]:
+    """
+    expandOccurrences method expands many cron windows at once, e.g. for every commuter booking in a list or revenue report.
+    Windows sharing an expression with a daily or weekly shape are expanded once over their combined span
+    and sliced, other expressions are iterated per window.
+    :param windows: Iterable of (cron, startTime, endTime) tuples.
+    :return: List of sorted datetime64[m] arrays, one per window in the given order, holding the times
+             after its start time up to and including its end time.
+    :raises ValueError: If a cron expression is invalid.
+    """
+    windows = list(windows)
+    results = [None] * len(windows)
+
+    byCron = defaultdict(list)
+    for index, (cron, startTime, endTime) in enumerate(windows):
+        byCron[cron].append(index)
+
+    for cron, indices in byCron.items():
+        schedule = _parseWeeklySchedule(cron)
+        if schedule is None:
+            for index in indices:
+                _, startTime, endTime = windows[index]
+                results[index] = _iterateTimes(cron, startTime, endTime)
+            continue
+
+        starts = np.array([windows[index][1] for index in indices], dtype="datetime64[us]")
+        ends = np.array([windows[index][2] for index in indices], dtype="datetime64[us]")
+        times = _weeklyTimes(schedule, starts.min(), ends.max())
+
+        lefts = np.searchsorted(times, starts, side="right")
+        rights = np.maximum(np.searchsorted(times, ends, side="right"), lefts)
+        for index, left, right in zip(indices, lefts, rights):
+            results[index] = times[left:right]
+
+    return results
+
+def _weeklyTimes(schedule, startTime : np.datetime64, endTime : np.datetime64) -> np.ndarray:
+    """
+    Every time of a weekly schedule on the dates from startTime to endTime, as a sorted datetime64[m] array.
+    """
+    timesOfDay, weekdays = schedule
+    days = np.arange(startTime.astype("datetime64[D]"), endTime.astype("datetime64[D]") + 1, dtype="datetime64[D]")
+    days = days[np.isin((days.astype(np.int64) + _EPOCH_WEEKDAY) % 7, list(weekdays))]
+
+    offsets = np.array([timeOfDay.hour * 60 + timeOfDay.minute for timeOfDay in timesOfDay], dtype="timedelta64[m]")
+    return (days.astype("datetime64[m]")[:, None] + offsets[None, :]).ravel()
+
+def _iterateTimes(cron, startTime, endTime) -> np.ndarray:
+    """
+    Lists occurrences by stepping through them with croniter.
+    """
+    try:
+        iter = _croniterFrom(cron, startTime)
+    except Exception as e:
+        raise ValueError(f"Invalid cron expression '{cron}': {e}")
+
+    times = []
+    nextTime = iter.get_next(datetime)
+    while nextTime <= endTime:
+        times.append(nextTime)
+        nextTime = iter.get_next(datetime)
+    return np.array(times, dtype="datetime64[m]")
@@ -5,12 +5,13 @@ class GetBookingsCommand:
     GetBookingsCommand class is responsible for getting all bookings for a user.
     """
 
-    def __init__(self, request, logger):
+    def __init__(self, request, logger, unit_of_work = None):
         """
         Constructor for GetBookingCommand class.
         :param request: Request object containing the booking details.
+        :param unit_of_work: Optional unit of work shared by the command's database access.
         """
-        self.booking_repository = BookingRepository()
+        self.booking_repository = BookingRepository(unit_of_work)
         self.request = request
         self.logger = logger
 
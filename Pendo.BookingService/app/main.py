@@ -3,6 +3,7 @@ import logging
 from uuid import UUID
 from fastapi import FastAPI, HTTPException, Depends, Response, status
 from .db_provider import get_db, Session, text, configProvider, environment
+from .unit_of_work import UnitOfWork, get_unit_of_work
 
 from .create_booking import CreateBookingCommand
 from .get_bookings import GetBookingsCommand
@@ -60,12 +61,12 @@ def test_db(db: Session = Depends(get_db)):
         raise HTTPException(500, detail="DB connection failed.")
 
 @app.post("/GetBookings", tags=["Get Bookings"], status_code=status.HTTP_200_OK)
-def get_bookings(request: GetBookingsRequest, db: Session = Depends(get_db)):
+def get_bookings(request: GetBookingsRequest, unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
     logger.debug("Getting bookings...")
-    return GetBookingsCommand(request, logging.getLogger("GetBookingsCommand")).Execute()
+    return GetBookingsCommand(request, logging.getLogger("GetBookingsCommand"), unit_of_work).Execute()
 
 @app.post("/CreateBooking", tags=["Create Bookings"], status_code=status.HTTP_200_OK)
-def create_booking(request: CreateBookingRequest, response : Response, db: Session = Depends(get_db)) -> StatusResponse:
+def create_booking(request: CreateBookingRequest, response : Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> StatusResponse:
     logger.debug(f"Creating booking with request {request}.")
     return CreateBookingCommand(request, 
                                 response, 
@@ -73,47 +74,53 @@ def create_booking(request: CreateBookingRequest, response : Response, db: Sessi
                                 logging.getLogger("CreateBookingCommand"), 
                                 dvla_client, 
                                 configProvider,
-                                payment_service_client).Execute()
+                                payment_service_client,
+                                unit_of_work).Execute()
 
 @app.post("/AddBookingAmmendment", tags=["Add Booking Ammendment"], status_code=status.HTTP_200_OK)
-def add_booking_ammendment(request : AddBookingAmmendmentRequest, response : Response, db: Session = Depends(get_db)):
+def add_booking_ammendment(request : AddBookingAmmendmentRequest, response : Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
     return AddBookingAmmendmentCommand(request, 
                                        response, 
-                                       logging.getLogger("AddBookingAmmendmentCommand")).Execute()
+                                       logging.getLogger("AddBookingAmmendmentCommand"),
+                                       unit_of_work).Execute()
 
 @app.put("/ApproveBookingAmmendment/{BookingAmmendmentId}", tags=["Approve Booking Ammendment"], status_code=status.HTTP_200_OK)
-def approve_booking_ammendment(BookingAmmendmentId: UUID, request: ApproveBookingAmmendmentRequest, response : Response, db: Session = Depends(get_db)):
+def approve_booking_ammendment(BookingAmmendmentId: UUID, request: ApproveBookingAmmendmentRequest, response : Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
     return ApproveBookingAmmendmentCommand(BookingAmmendmentId, 
                                            request, 
                                            response, 
                                            logging.getLogger("ApproveBookingAmmendmentCommand"), 
                                            mailSender, 
                                            dvla_client,
-                                           payment_service_client).Execute()
+                                           payment_service_client,
+                                           unit_of_work).Execute()
 
 @app.put("/ApproveBooking/{BookingId}", tags=["Approve Booking Request"], status_code=status.HTTP_200_OK)
-def approve_booking_request(BookingId: UUID, request: ApproveBookingRequest, response : Response, db: Session = Depends(get_db)):
+def approve_booking_request(BookingId: UUID, request: ApproveBookingRequest, response : Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
     return ApproveBookingCommand(BookingId, 
                                  request, 
                                  response, 
                                  logging.getLogger("ApproveBookingCommand"), 
                                  mailSender, 
-                                 dvla_client).Execute()
+                                 dvla_client,
+                                 unit_of_work).Execute()
 
 @app.put("/ConfirmAtPickup/{BookingId}", tags=["Confirm At Pickup"], status_code=status.HTTP_200_OK)
-def confirm_at_pickup(BookingId: UUID, request : ConfirmAtPickupRequest, response : Response, db: Session = Depends(get_db)) -> StatusResponse:
+def confirm_at_pickup(BookingId: UUID, request : ConfirmAtPickupRequest, response : Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> StatusResponse:
     return ConfirmAtPickupCommand(BookingId, 
                                   request, 
                                   response, 
                                   configProvider, 
                                   mailSender, 
                                   logging.getLogger("ConfirmAtPickupCommand"), 
-                                  dvla_client).Execute()
+                                  dvla_client,
+                                  unit_of_work).Execute()
 
 @app.put("/CompleteBooking/{BookingId}", tags=["Complete Booking"], status_code=status.HTTP_200_OK)
-def complete_booking(BookingId: UUID, request : CompleteBookingRequest, response : Response, db: Session = Depends(get_db)) -> StatusResponse:
+def complete_booking(BookingId: UUID, request : CompleteBookingRequest, response : Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> StatusResponse:
     return BookingCompleteCommand(BookingId, 
                                   request, 
                                   response, 
                                   logging.getLogger("BookingCompleteCommand"), 
-                                  payment_service_client).Execute()
\ No newline at end of file
+                                  payment_service_client,
+                                  unit_of_work).Execute()
\ No newline at end of file
@@ -205,3 +205,26 @@ class BookingAmmendment(Base):
     Recurrance = mapped_column(Unicode(100, 'SQL_Latin1_General_CP1_CI_AS'))
 
     Booking_: Mapped['Booking'] = relationship('Booking', back_populates='BookingAmmendment')
+
+
+class EffectiveBooking(Base):
+    __tablename__ = 'EffectiveBooking'
+    __table_args__ = (
+        ForeignKeyConstraint(['BookingAmmendmentId'], ['booking.BookingAmmendment.BookingAmmendmentId'], name='FK_EffectiveBooking_BookingAmmendment'),
+        ForeignKeyConstraint(['BookingId'], ['booking.Booking.BookingId'], ondelete='CASCADE', name='FK_EffectiveBooking_Booking'),
+        PrimaryKeyConstraint('BookingId', name='PK_EffectiveBooking'),
+        {'schema': 'booking'}
+    )
+
+    BookingId = mapped_column(Uuid)
+    UpdateDate = mapped_column(DATETIME2, nullable=False, server_default=text('(getutcdate())'))
+    BookingAmmendmentId = mapped_column(Uuid)
+    ProposedPrice = mapped_column(DECIMAL(18, 8))
+    StartName = mapped_column(Unicode(collation='SQL_Latin1_General_CP1_CI_AS'))
+    StartLong = mapped_column(Float(53))
+    StartLat = mapped_column(Float(53))
+    EndName = mapped_column(Unicode(collation='SQL_Latin1_General_CP1_CI_AS'))
+    EndLong = mapped_column(Float(53))
+    EndLat = mapped_column(Float(53))
+    StartTime = mapped_column(DATETIME2)
+    Recurrance = mapped_column(Unicode(100, 'SQL_Latin1_General_CP1_CI_AS'))
@@ -0,0 +1,66 @@
+from fastapi import Response
+from .db_provider import SessionLocal
+
+class UnitOfWork:
+    """
+    UnitOfWork class holds the one database session and transaction used by a command.
+
+    Repositories and configuration lookups built on the unit of work share its
+    session and only flush their changes; the unit of work commits them once,
+    when the command has finished.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        """
+        Constructor for UnitOfWork class.
+        :param session_factory: Factory for the session, defaults to the application's session maker.
+        """
+        self.session = session_factory()
+        self.commits = 0
+
+    def Commit(self):
+        """
+        Commit method commits all changes made in the unit of work so far.
+        """
+        self.session.commit()
+        self.commits += 1
+
+    def Rollback(self):
+        """
+        Rollback method discards all changes made since the last commit.
+        """
+        self.session.rollback()
+
+    def Close(self):
+        """
+        Close method returns the session's connection to the pool, discarding anything uncommitted.
+        """
+        self.session.close()
+
+def _requestSession():
+    """
+    Session for a single request. Objects are not expired on commit, as reloading them
+    afterwards within the same request would only cost extra round trips.
+    """
+    return SessionLocal(expire_on_commit=False)
+
+def get_unit_of_work(response: Response):
+    """
+    Dependency providing a request-scoped unit of work.
+    Commits once after the command has run. Rolls back if it raised or, as commands catch their
+    errors and report them through the status code, if the response is an error.
+    :param response: The route's response, shared with the command.
+    """
+    unit_of_work = UnitOfWork(_requestSession)
+    try:
+        yield unit_of_work
+    except Exception:
+        unit_of_work.Rollback()
+        raise
+    else:
+        if response.status_code is not None and response.status_code >= 400:
+            unit_of_work.Rollback()
+        else:
+            unit_of_work.Commit()
+    finally:
+        unit_of_work.Close()
@@ -0,0 +1,80 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.cron_checker import countOccurrences, expandOccurrences, getNextTimes, _countOccurrences
+
+"""
+Measures the cost of counting the journeys in a commuter booking window.
+
+Compares len(getNextTimes(..., 9999)), which bookings used to price commuter
+windows with, against countOccurrences: cold calls on distinct windows,
+which count common daily and weekly shapes arithmetically, and warm calls
+answered from the memo. It then compares listing the occurrences of every
+window one at a time with expanding them all in one expandOccurrences call.
+
+Usage:
+    python -m benchmarks.recurrence_benchmark --windows 500 --days 28 90
+"""
+
+CRONS = [
+    "0 9 * * *",
+    "30 8 * * 1-5",
+    "0 7,17 * * 1,3,5",
+    "15 6 * * 0,6",
+    # Falls back to iteration
+    "0 9 * * mon-fri",
+]
+
+def make_windows(count, days):
+    random.seed(2913)
+    started = datetime(2025, 1, 1)
+    windows = []
+    for _ in range(count):
+        start = started + timedelta(minutes=random.randrange(60 * 24 * 365))
+        windows.append((random.choice(CRONS), start, start + timedelta(days=days)))
+    return windows
+
+def time_per_call(func, windows):
+    started = time.perf_counter()
+    for cron, start, end in windows:
+        func(cron, start, end)
+    return (time.perf_counter() - started) / len(windows)
+
+def main(args):
+    print(f"{'days':>6} {'iterate_us':>12} {'cold_us':>10} {'warm_us':>10} {'speedup_cold':>13}")
+    for days in args.days:
+        windows = make_windows(args.windows, days)
+
+        iterate = time_per_call(lambda cron, start, end: len(getNextTimes(cron, start, end, 9999)), windows)
+        _countOccurrences.cache_clear()
+        cold = time_per_call(countOccurrences, windows)
+        warm = time_per_call(countOccurrences, windows)
+
+        for cron, start, end in windows:
+            assert countOccurrences(cron, start, end) == len(getNextTimes(cron, start, end, 9999))
+
+        print(f"{days:>6} {iterate * 1e6:>12.1f} {cold * 1e6:>10.1f} {warm * 1e6:>10.2f} {iterate / cold:>12.1f}x")
+
+    print()
+    print(f"{'days':>6} {'per_window_ms':>14} {'batch_ms':>10} {'speedup':>8}")
+    for days in args.days:
+        windows = make_windows(args.windows, days)
+
+        started = time.perf_counter()
+        for cron, start, end in windows:
+            getNextTimes(cron, start, end, 9999)
+        per_window = time.perf_counter() - started
+
+        started = time.perf_counter()
+        expandOccurrences(windows)
+        batch = time.perf_counter() - started
+
+        print(f"{days:>6} {per_window * 1e3:>14.1f} {batch * 1e3:>10.1f} {per_window / batch:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recurrence occurrence counting benchmark")
+    parser.add_argument("--windows", type=int, default=500, help="Booking windows per window length")
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 28, 90], help="Window lengths in days")
+    main(parser.parse_args())
@@ -47,6 +47,16 @@ def test_add_booking_ammendment_success(add_booking_ammendment_command, mock_rep
     assert result["Status"] == "Success"
     mock_repository.AddBookingAmmendment.assert_called_once()
     mock_logger.debug.assert_any_call(f"Added booking amendment for booking {DummyRequest.BookingId} successfully.")
+    mock_repository.RefreshEffectiveBooking.assert_not_called()
+
+def test_add_booking_ammendment_already_approved_takes_effect(add_booking_ammendment_command, mock_repository):
+    add_booking_ammendment_command.request.DriverApproval = True
+    add_booking_ammendment_command.request.PassengerApproval = True
+
+    result = add_booking_ammendment_command.Execute()
+
+    assert result["Status"] == "Success"
+    mock_repository.RefreshEffectiveBooking.assert_called_once_with(DummyRequest.BookingId)
 
 def test_add_booking_ammendment_booking_not_found(add_booking_ammendment_command, mock_repository):
     mock_repository.GetBookingById.return_value = None
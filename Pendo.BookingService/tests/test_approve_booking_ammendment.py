@@ -1,6 +1,7 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from app.approve_booking_ammendment import ApproveBookingAmmendmentCommand
+from app.unit_of_work import get_unit_of_work
 
 class DummyRequest:
     UserId = None
@@ -52,6 +53,22 @@ def mock_repository():
     repo.GetBookingsForUser.return_value = [{"Booking": {"BookingId": 100}, "Journey": {"Price": 50, "StartTime": "2025-03-12T12:00:00", "JourneyType": 1}}]
     return repo
 
+class TrackingSession:
+    """Session keeping committed and pending writes apart, to check what outlives the request"""
+    def __init__(self, **committed):
+        self.committed = committed
+        self.pending = {}
+
+    def commit(self):
+        self.committed.update(self.pending)
+        self.pending.clear()
+
+    def rollback(self):
+        self.pending.clear()
+
+    def close(self):
+        self.pending.clear()
+
 def get_command(ammendment_id, request, response, logger, email_sender, dvla_client, repository, payment_service_client):
     cmd = ApproveBookingAmmendmentCommand(ammendment_id, request, response, logger, email_sender, dvla_client, payment_service_client)
     cmd.booking_repository = repository
@@ -90,6 +107,7 @@ def test_full_approval(mock_repository, mock_logger, mock_email_sender, mock_dvl
     req.BookingId = 100
     cmd = get_command(1, req, res, mock_logger, mock_email_sender, mock_dvla_client, mock_repository, mock_payment_service_client)
     result = cmd.Execute()
+    mock_repository.RefreshEffectiveBooking.assert_called_once_with(booking_ammendment.BookingId)
     mock_repository.UpdateBookingStatus.assert_called_with(booking_ammendment.BookingId, 2)
     mock_email_sender.SendBookingConfirmation.assert_called_once()
     assert result["Status"] == "Success"
@@ -157,4 +175,42 @@ def test_passenger_only_approval(mock_repository, mock_logger, mock_email_sender
     cmd = get_command(1, req, res, mock_logger, mock_email_sender, mock_dvla_client, mock_repository, mock_payment_service_client)
     result = cmd.Execute()
     assert result["Status"] == "Success"
-    assert "Passenger approved booking ammendment" in result["Message"]
\ No newline at end of file
+    assert "Passenger approved booking ammendment" in result["Message"]
+def test_cancellation_commits_before_refund(mock_repository, mock_logger, mock_email_sender, mock_dvla_client, mock_payment_service_client):
+    booking_ammendment, _, _, _ = mock_repository.GetBookingAmmendment.return_value
+    booking_ammendment.CancellationRequest = True
+    req = DummyRequest()
+    req.UserId = 20
+    req.CancellationRequest = True
+    cmd = get_command(1, req, DummyResponse(), mock_logger, mock_email_sender, mock_dvla_client, mock_repository, mock_payment_service_client)
+    calls = []
+    cmd.unit_of_work = MagicMock()
+    cmd.unit_of_work.Commit.side_effect = lambda: calls.append("commit")
+    mock_payment_service_client.RefundRequest.side_effect = lambda *args: calls.append("refund") or True
+    result = cmd.Execute()
+    assert result["Status"] == "Success"
+    assert calls == ["commit", "refund"]
+
+def test_cancellation_refund_failure_restores_status(mock_repository, mock_logger, mock_email_sender, mock_dvla_client, mock_payment_service_client):
+    booking_ammendment, _, _, _ = mock_repository.GetBookingAmmendment.return_value
+    booking_ammendment.CancellationRequest = True
+    mock_payment_service_client.RefundRequest.return_value = False
+    req = DummyRequest()
+    res = DummyResponse()
+    req.UserId = 20
+    req.CancellationRequest = True
+    cmd = get_command(1, req, res, mock_logger, mock_email_sender, mock_dvla_client, mock_repository, mock_payment_service_client)
+    session = TrackingSession(BookingStatusId=1)
+    mock_repository.UpdateBookingStatus.side_effect = lambda booking_id, status_id: session.pending.update(BookingStatusId=status_id)
+
+    with patch('app.unit_of_work.SessionLocal', return_value=session):
+        dependency = get_unit_of_work(res)
+        cmd.unit_of_work = next(dependency)
+        result = cmd.Execute()
+        with pytest.raises(StopIteration):
+            next(dependency)
+
+    assert result["Status"] == "Error"
+    assert res.status_code == 500
+    assert session.committed == {"BookingStatusId": 1}
+    mock_repository.UpdateBookingStatus.assert_called_with(booking_ammendment.BookingId, 1)
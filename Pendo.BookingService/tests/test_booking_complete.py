@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime
 from unittest.mock import MagicMock
 from app.booking_complete import BookingCompleteCommand
 from app.statuses.booking_statii import BookingStatus
@@ -116,6 +117,45 @@ def test_passenger_completed_success(command, dummy_request, dummy_response, dum
     assert result.Status == "Success"
     assert "completed successfully" in result.Message
 
+def test_passenger_completed_commuter_charges_each_occurrence(command, dummy_request, dummy_booking_repository, dummy_payment_service_client):
+    dummy_request.UserId = 20
+    dummy_request.Completed = True
+    dummy_booking_repository.GetUser.return_value = MagicMock(UserId=20)
+    booking = MagicMock(BookingId="dummy_booking_id", JourneyId="journey_2", BookingStatusId=BookingStatus.PendingCompletion)
+    booking.UserId = 20
+    dummy_booking_repository.GetBookingById.return_value = booking
+    dummy_booking_repository.GetBookingsForUser.return_value = [{
+        "Booking": {"RideTime": datetime(2025, 3, 10, 8, 0), "BookedWindowEnd": datetime(2025, 3, 23, 8, 0)},
+        "Journey": {"JourneyType": 2, "Price": 20, "Recurrance": "0 9 * * 1-5"}
+    }]
+    dummy_booking_repository.GetJourney.return_value = MagicMock(JourneyId="journey_2", UserId=99, JourneyType=2)
+    dummy_payment_service_client.CompletedBookingRequest.return_value = True
+
+    result = command.Execute()
+
+    dummy_payment_service_client.CompletedBookingRequest.assert_called_with("dummy_booking_id", 20 * 10)
+    assert result.Status == "Success"
+
+def test_passenger_completed_commits_before_payment(command, dummy_request, dummy_booking_repository, dummy_payment_service_client):
+    dummy_request.UserId = 20
+    dummy_request.Completed = True
+    dummy_booking_repository.GetUser.return_value = MagicMock(UserId=20)
+    booking = MagicMock(BookingId="dummy_booking_id", JourneyId="journey_2", BookingStatusId=BookingStatus.PendingCompletion)
+    booking.UserId = 20
+    dummy_booking_repository.GetBookingById.return_value = booking
+    dummy_booking_repository.GetBookingsForUser.return_value = [{"Journey": {"JourneyType": 1, "Price": 20}}]
+    dummy_booking_repository.GetJourney.return_value = MagicMock(JourneyId="journey_2", UserId=99, JourneyType=1)
+    calls = []
+    command.unit_of_work = MagicMock()
+    command.unit_of_work.Commit.side_effect = lambda: calls.append("commit")
+    dummy_booking_repository.UpdateBookingStatus.side_effect = lambda *args: calls.append("status")
+    dummy_payment_service_client.CompletedBookingRequest.side_effect = lambda *args: calls.append("payment") or True
+
+    result = command.Execute()
+
+    assert result.Status == "Success"
+    assert calls == ["status", "commit", "payment"]
+
 def test_passenger_completed_failure(command, dummy_request, dummy_response, dummy_booking_repository, dummy_logger, dummy_payment_service_client):
     dummy_request.UserId = 20
     dummy_request.Completed = True
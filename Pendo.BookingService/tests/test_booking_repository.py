@@ -1,8 +1,8 @@
 import pytest
 from datetime import datetime
 from unittest.mock import MagicMock, patch
-from app.booking_repository import BookingRepository
-from app.models import Booking, User, Journey, BookingAmmendment
+from app.booking_repository import BookingRepository, EFFECTIVE_AMMENDMENT_FIELDS
+from app.models import Booking, User, Journey, BookingAmmendment, EffectiveBooking
 
 def create_dummy_ammendment(create_date, start_name, start_long, start_lat, end_name, end_long, end_lat, start_time, proposed_price):
     ammendment = MagicMock(spec=BookingAmmendment)
@@ -62,20 +62,26 @@ def booking_repository(mock_db_session):
     with patch('app.booking_repository.get_db', return_value=iter([mock_db_session])):
         return BookingRepository()
 
-def setup_get_bookings_chain(db_session, dummy_booking):
+def setup_get_bookings_chain(db_session, dummy_booking, effective):
     mock_query = MagicMock()
-    mock_join = MagicMock()
-    mock_filter = MagicMock()
-    mock_options = MagicMock()
     db_session.query.return_value = mock_query
-    mock_query.join.return_value = mock_join
-    mock_join.filter.return_value = mock_filter
-    mock_filter.options.return_value = mock_options
-    mock_options.all.return_value = [dummy_booking]
+    mock_query.select_from.return_value = mock_query
+    mock_query.join.return_value = mock_query
+    mock_query.outerjoin.return_value = mock_query
+    mock_query.filter.return_value = mock_query
+    mock_query.all.return_value = [(dummy_booking, effective, dummy_booking.BookingStatus_, dummy_booking.Journey_, 1, 1, None)]
+
+def create_dummy_effective_booking(ammendment = None):
+    effective = MagicMock(spec=EffectiveBooking)
+    effective.BookingId = 1
+    effective.BookingAmmendmentId = None
+    for field in EFFECTIVE_AMMENDMENT_FIELDS:
+        setattr(effective, field, getattr(ammendment, field) if ammendment is not None else None)
+    return effective
 
 def test_get_bookings_for_user_no_ammendment(booking_repository):
     dummy_booking = setup_dummy_booking([])
-    setup_get_bookings_chain(booking_repository.db_session, dummy_booking)
+    setup_get_bookings_chain(booking_repository.db_session, dummy_booking, None)
 
     result = booking_repository.GetBookingsForUser(1)
     expected = [{
@@ -110,7 +116,7 @@ def test_get_bookings_for_user_no_ammendment(booking_repository):
     }]
 
     assert result == expected
-    booking_repository.db_session.query.assert_called_once_with(Booking)
+    booking_repository.db_session.query.assert_called_once()
 
 def test_get_bookings_for_user_single_ammendment(booking_repository):
     ammendment = create_dummy_ammendment(
@@ -127,7 +133,7 @@ def test_get_bookings_for_user_single_ammendment(booking_repository):
     dummy_booking = setup_dummy_booking([ammendment])
     dummy_booking.RideTime = '2025-03-02T09:00:00'
     dummy_booking.BookedWindowEnd = '2025-03-02T10:00:00'
-    setup_get_bookings_chain(booking_repository.db_session, dummy_booking)
+    setup_get_bookings_chain(booking_repository.db_session, dummy_booking, create_dummy_effective_booking(ammendment))
     
     result = booking_repository.GetBookingsForUser(1)
     expected = [{
@@ -162,20 +168,22 @@ def test_get_bookings_for_user_single_ammendment(booking_repository):
     }]
     
     assert result == expected
-    booking_repository.db_session.query.assert_called_once_with(Booking)
-
-def test_get_bookings_for_user_multiple_ammendments(booking_repository):
-    earlier_ammendment = create_dummy_ammendment(
-        create_date=datetime(2025, 3, 1, 10, 0, 0),
-        start_name="Early Start",
-        start_long=10.0,
-        start_lat=20.0,
-        end_name="Early End",
-        end_long=30.0,
-        end_lat=40.0,
-        start_time="2025-03-02T10:00:00",
-        proposed_price=60
-    )
+    booking_repository.db_session.query.assert_called_once()
+
+def test_get_bookings_for_user_commuter_discount(booking_repository):
+    dummy_booking = setup_dummy_booking([])
+    dummy_booking.Journey_.JourneyType = 2
+    setup_get_bookings_chain(booking_repository.db_session, dummy_booking, None)
+    discount = MagicMock(DiscountID=5, WeeklyJourneys=3, DiscountPercentage=0.2)
+    row = booking_repository.db_session.query.return_value.all.return_value[0]
+    booking_repository.db_session.query.return_value.all.return_value = [row[:-1] + (discount,)]
+
+    result = booking_repository.GetBookingsForUser(1)
+
+    assert result[0]["Journey"]["Price"] == 40
+    assert result[0]["Journey"]["Discount"] == {"DiscountID": 5, "WeeklyJourneys": 3, "DiscountPercentage": 0.2, "OriginalPrice": 50.0}
+
+def test_refresh_effective_booking_uses_latest_ammendment(booking_repository, mock_db_session):
     later_ammendment = create_dummy_ammendment(
         create_date=datetime(2025, 3, 1, 15, 0, 0),
         start_name="Late Start",
@@ -187,45 +195,31 @@ def test_get_bookings_for_user_multiple_ammendments(booking_repository):
         start_time="2025-03-02T12:00:00",
         proposed_price=80
     )
-    dummy_booking = setup_dummy_booking([later_ammendment, earlier_ammendment])
-    dummy_booking.RideTime = '2025-03-02T09:00:00'
-    dummy_booking.BookedWindowEnd = '2025-03-02T10:00:00'
-    setup_get_bookings_chain(booking_repository.db_session, dummy_booking)
-    
-    result = booking_repository.GetBookingsForUser(1)
-    expected = [{
-        "Booking": {
-            "BookingId": 1,
-            "User": 1,
-            "FeeMargin": 5,
-            "RideTime": "2025-03-02T12:00:00",
-            "BookedWindowEnd": '2025-03-02T10:00:00'
-        },
-        "BookingStatus": {
-            "StatusId": 1,
-            "Status": 'Confirmed',
-            "Description": 'Booking is confirmed'
-        },
-        "Journey": {
-            "Discount": None,
-            "JourneyId": 1,
-            "User": 1,
-            "StartTime": "2025-03-02T12:00:00",
-            "StartName": "Late Start",
-            "StartLong": 15.5,
-            "StartLat": 25.5,
-            "EndName": "Late End",
-            "EndLong": 35.5,
-            "EndLat": 45.5,
-            "Price": 80,
-            "JourneyStatusId": 2,
-            "JourneyType": 'RoundTrip',
-            "Recurrance": None
-        }
-    }]
-    
-    assert result == expected
-    booking_repository.db_session.query.assert_called_once_with(Booking)
+    effective = create_dummy_effective_booking()
+    mock_db_session.get.return_value = effective
+    mock_db_session.query.return_value.filter.return_value.order_by.return_value.first.return_value = later_ammendment
+
+    booking_repository.RefreshEffectiveBooking(1)
+
+    mock_db_session.get.assert_called_once_with(EffectiveBooking, 1)
+    mock_db_session.query.assert_called_once_with(BookingAmmendment)
+    assert effective.BookingAmmendmentId == later_ammendment.BookingAmmendmentId
+    assert effective.StartName == "Late Start"
+    assert effective.StartTime == "2025-03-02T12:00:00"
+    assert effective.ProposedPrice == 80
+    mock_db_session.commit.assert_called_once()
+
+def test_refresh_effective_booking_without_ammendment(booking_repository, mock_db_session):
+    effective = create_dummy_effective_booking()
+    effective.StartName = "Stale Start"
+    mock_db_session.get.return_value = effective
+    mock_db_session.query.return_value.filter.return_value.order_by.return_value.first.return_value = None
+
+    booking_repository.RefreshEffectiveBooking(1)
+
+    assert effective.BookingAmmendmentId is None
+    assert effective.StartName is None
+    assert effective.ProposedPrice is None
 
 def test_get_user(booking_repository, mock_db_session):
     mock_db_session.query.return_value.get.return_value = User()
@@ -357,3 +351,51 @@ def test_calculate_driver_rating_driver_not_found(booking_repository, mock_db_se
         booking_repository.CalculateDriverRating(1)
 
     mock_db_session.commit.assert_not_called()
+
+def test_repository_in_unit_of_work_flushes_without_commit(mock_db_session):
+    unit_of_work = MagicMock(session=mock_db_session)
+    repository = BookingRepository(unit_of_work)
+    booking = Booking(JourneyId=1)
+    repository.CreateBooking(booking)
+    mock_db_session.add.assert_called_once_with(booking)
+    mock_db_session.flush.assert_called_once()
+    mock_db_session.commit.assert_not_called()
+    del repository
+    mock_db_session.close.assert_not_called()
+
+def test_get_booking_creation_context(booking_repository, mock_db_session):
+    row = (User(), Journey(), User(), None, None)
+    mock_db_session.query.return_value.select_from.return_value.outerjoin.return_value.outerjoin.return_value\
+        .outerjoin.return_value.outerjoin.return_value.filter.return_value.first.return_value = row
+    context = booking_repository.GetBookingCreationContext(1, 2)
+    assert context.User is row[0]
+    assert context.Journey is row[1]
+    assert context.Driver is row[2]
+    assert context.ExistingBooking is None
+    mock_db_session.query.assert_called_once()
+
+def test_get_booking_creation_context_user_not_found(booking_repository, mock_db_session):
+    mock_db_session.query.return_value.select_from.return_value.outerjoin.return_value.outerjoin.return_value\
+        .outerjoin.return_value.outerjoin.return_value.filter.return_value.first.return_value = None
+    context = booking_repository.GetBookingCreationContext(1, 2)
+    assert context.User is None
+    assert context.Journey is None
+
+def test_mark_booking_pending(booking_repository, mock_db_session):
+    booking = Booking(BookingStatusId=7)
+    journey = Journey(JourneyStatusId=1)
+    booking_repository.MarkBookingPending(booking, journey)
+    assert booking.BookingStatusId == 1
+    assert journey.JourneyStatusId == 2
+    mock_db_session.query.assert_not_called()
+    mock_db_session.commit.assert_called_once()
+
+def test_refresh_effective_booking_creates_missing_row(booking_repository, mock_db_session):
+    mock_db_session.get.return_value = None
+    mock_db_session.query.return_value.filter.return_value.order_by.return_value.first.return_value = None
+
+    booking_repository.RefreshEffectiveBooking(1)
+
+    effective = mock_db_session.add.call_args.args[0]
+    assert isinstance(effective, EffectiveBooking)
+    assert effective.BookingId == 1
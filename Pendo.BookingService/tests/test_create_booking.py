@@ -1,6 +1,8 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from app.create_booking import CreateBookingCommand
+from app.unit_of_work import get_unit_of_work
+from app.booking_repository import BookingCreationContext
 from datetime import datetime, timedelta
 
 @pytest.fixture
@@ -14,12 +16,21 @@ def mock_logger():
 @pytest.fixture
 def mock_repository():
     mock = MagicMock()
-    mock.GetUser.return_value = MagicMock(UserId=1, Email="test@user.com")
-    mock.GetJourney.return_value = MagicMock(JourneyId=2, JourneyType=1)
-    mock.GetExistingBooking.return_value = None
+    set_context(mock)
     mock.GetBookingsForUser.return_value = []
     return mock
 
+def set_context(mock_repository, **overrides):
+    context = dict(
+        User=MagicMock(UserId=1, Email="test@user.com"),
+        Journey=MagicMock(JourneyId=2, JourneyType=1),
+        Driver=MagicMock(UserId=3, Email="driver@user.com"),
+        ExistingBooking=None,
+        Discount=None
+    )
+    context.update(overrides)
+    mock_repository.GetBookingCreationContext.return_value = BookingCreationContext(**context)
+
 @pytest.fixture
 def mock_dvla_client():
     return MagicMock()
@@ -59,7 +70,7 @@ def test_create_booking_success(create_booking_command, mock_repository, mock_em
 
 
 def test_create_booking_user_not_found(create_booking_command, mock_repository):
-    mock_repository.GetUser.return_value = None
+    set_context(mock_repository, User=None, Journey=None)
     result = create_booking_command.Execute()
     assert result.Status == "Failed"
     assert "User not found" in result.Message
@@ -67,7 +78,7 @@ def test_create_booking_user_not_found(create_booking_command, mock_repository):
 
 
 def test_create_booking_journey_not_found(create_booking_command, mock_repository):
-    mock_repository.GetJourney.return_value = None
+    set_context(mock_repository, Journey=None)
     result = create_booking_command.Execute()
     assert result.Status == "Failed"
     assert "Journey not found" in result.Message
@@ -75,7 +86,7 @@ def test_create_booking_journey_not_found(create_booking_command, mock_repositor
 
 
 def test_create_booking_already_exists(create_booking_command, mock_repository):
-    mock_repository.GetExistingBooking.return_value = MagicMock(BookingId=10)
+    set_context(mock_repository, ExistingBooking=MagicMock(BookingId=10))
     result = create_booking_command.Execute()
     assert result.Status == "Failed"
     assert "Booking for this journey already exists" in result.Message
@@ -99,7 +110,7 @@ def test_create_booking_in_the_past(create_booking_command):
 
 
 def test_create_booking_commuter_no_recurrence(create_booking_command, mock_repository):
-    mock_repository.GetJourney.return_value = MagicMock(JourneyId=2, JourneyType=2, Recurrance=None)
+    set_context(mock_repository, Journey=MagicMock(JourneyId=2, JourneyType=2, Recurrance=None))
     result = create_booking_command.Execute()
     assert result.Status == "Failed"
     assert "Commuter journey must have a recurrance." in result.Message
@@ -111,3 +122,70 @@ def test_create_booking_get_bookings_for_user(create_booking_command, mock_repos
     result = create_booking_command.Execute()
     assert result.Status == "Success"
     assert len(mock_repository.GetBookingsForUser()) == 1
+
+
+def test_create_booking_commits_before_payment_request(create_booking_command, mock_payment_service_client):
+    calls = []
+    create_booking_command.unit_of_work = MagicMock()
+    create_booking_command.unit_of_work.Commit.side_effect = lambda: calls.append("commit")
+    mock_payment_service_client.PendingBookingRequest.side_effect = lambda *args: calls.append("payment") or True
+    result = create_booking_command.Execute()
+    assert result.Status == "Success"
+    assert calls == ["commit", "payment"]
+
+class TrackingSession:
+    """Session keeping committed and pending writes apart, to check what outlives the request"""
+    def __init__(self):
+        self.committed = {}
+        self.pending = {}
+
+    def commit(self):
+        self.committed.update(self.pending)
+        self.pending.clear()
+
+    def rollback(self):
+        self.pending.clear()
+
+    def close(self):
+        self.pending.clear()
+
+def test_create_booking_payment_failure_removes_committed_booking(create_booking_command, mock_repository, mock_payment_service_client):
+    session = TrackingSession()
+    mock_repository.CreateBooking.side_effect = lambda booking: session.pending.update(Booking="PrePending")
+    mock_repository.DeleteBooking.side_effect = lambda booking: session.pending.update(Booking=None)
+    mock_payment_service_client.PendingBookingRequest.return_value = False
+
+    with patch('app.unit_of_work.SessionLocal', return_value=session):
+        dependency = get_unit_of_work(create_booking_command.response)
+        create_booking_command.unit_of_work = next(dependency)
+        result = create_booking_command.Execute()
+        with pytest.raises(StopIteration):
+            next(dependency)
+
+    assert result.Status == "Failed"
+    assert create_booking_command.response.status_code == 403
+    assert session.committed == {"Booking": None}
+
+
+def test_create_booking_uses_loaded_rows(create_booking_command, mock_repository, mock_payment_service_client):
+    driver = MagicMock(UserId=3)
+    set_context(mock_repository, Driver=driver)
+    result = create_booking_command.Execute()
+    assert result.Status == "Success"
+    mock_repository.GetBookingCreationContext.assert_called_once_with(1, 2)
+    mock_repository.MarkBookingPending.assert_called_once()
+    mock_repository.GetUser.assert_not_called()
+    mock_repository.UpdateBookingStatus.assert_not_called()
+    mock_repository.MarkJourneyBooked.assert_not_called()
+    assert create_booking_command.dvla_client.GetVehicleDetails.called
+
+
+def test_create_booking_applies_loaded_discount(create_booking_command, mock_repository, mock_payment_service_client):
+    create_booking_command.request.JourneyTime = datetime(datetime.now().year + 1, 1, 1, 8, 0)
+    create_booking_command.request.EndCommuterWindow = create_booking_command.request.JourneyTime + timedelta(days=6)
+    journey = MagicMock(JourneyId=2, JourneyType=2, Recurrance="0 9 * * *", AdvertisedPrice=10)
+    set_context(mock_repository, Journey=journey, Discount=MagicMock(DiscountPercentage=0.5, WeeklyJourneys=5))
+    result = create_booking_command.Execute()
+    assert result.Status == "Success"
+    booking_id, amount = mock_payment_service_client.PendingBookingRequest.call_args[0]
+    assert amount == 10 * 6 * 0.5
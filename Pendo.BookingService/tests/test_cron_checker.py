@@ -1,5 +1,7 @@
 import pytest
-from app.cron_checker import checkTimeValid
+from datetime import datetime, timedelta
+import numpy as np
+from app.cron_checker import checkTimeValid, countOccurrences, expandOccurrences, getNextTimes, _compiledCroniter, _countOccurrences
 
 def test_check_time_valid():
     cron = "0 12 * * *"
@@ -18,4 +20,79 @@ def test_check_time_invalid_cron_expression():
     time = "2023-01-01 12:00:00"
     result = checkTimeValid(cron, time)
     print(result)
-    assert isinstance(result, str)
\ No newline at end of file
+    assert isinstance(result, str)
+
+def test_count_occurrences_daily():
+    start = datetime(2025, 3, 1, 8, 0)
+    assert countOccurrences("0 9 * * *", start, start + timedelta(days=7)) == 7
+
+def test_count_occurrences_excludes_start_includes_end():
+    start = datetime(2025, 3, 3, 9, 0)
+    assert countOccurrences("0 9 * * *", start, datetime(2025, 3, 5, 9, 0)) == 2
+
+def test_count_occurrences_weekdays():
+    # 2025-03-03 is a Monday; two full weeks of weekday mornings and evenings
+    start = datetime(2025, 3, 3, 0, 0)
+    assert countOccurrences("30 8,17 * * 1-5", start, start + timedelta(days=14)) == 20
+
+def test_count_occurrences_sunday_as_seven():
+    start = datetime(2025, 3, 3, 0, 0)
+    assert countOccurrences("0 10 * * 7", start, start + timedelta(days=21)) == 3
+    assert countOccurrences("0 10 * * 0", start, start + timedelta(days=21)) == 3
+
+def test_count_occurrences_empty_window():
+    start = datetime(2025, 3, 3, 0, 0)
+    assert countOccurrences("0 9 * * *", start, start - timedelta(days=1)) == 0
+
+def test_count_occurrences_matches_iteration():
+    start = datetime(2025, 1, 6, 7, 45, 30)
+    end = start + timedelta(days=45, hours=5)
+    for cron in ["0 9 * * *", "*/15 6-8 * * 0", "15 */6 * * 2-4", "0 9 1 * *", "0 9 * * mon", "0 9 * 1-6 1"]:
+        assert countOccurrences(cron, start, end) == len(getNextTimes(cron, start, end, 9999)), cron
+
+def test_count_occurrences_stepped_and_ranged_weekdays_match_iteration():
+    start = datetime(2025, 3, 1, 7, 13)
+    for cron in ["0 8 * * 1/3", "0 8 * * 7/2", "0 8 * * */2", "0 8 * * 2-6/2", "0 8 * * 5-7", "0 8 * * 0,7", "30 8,17 * * 1-3,5"]:
+        for days in (1, 5, 30, 97):
+            end = start + timedelta(days=days)
+            expected = getNextTimes(cron, start, end, 9999)
+            assert countOccurrences(cron, start, end) == len(expected), (cron, days)
+            assert list(expandOccurrences([(cron, start, end)])[0].astype(datetime)) == expected, (cron, days)
+
+def test_count_occurrences_is_memoized():
+    _countOccurrences.cache_clear()
+    start = datetime(2025, 3, 3, 0, 0)
+    countOccurrences("0 9 * * 1-5", start, start + timedelta(days=30))
+    countOccurrences("0 9 * * 1-5", start, start + timedelta(days=30))
+    assert _countOccurrences.cache_info().hits == 1
+
+def test_count_occurrences_invalid_cron_expression():
+    with pytest.raises(ValueError):
+        countOccurrences("invalid cron", datetime(2025, 3, 3), datetime(2025, 3, 10))
+
+def test_compiled_cron_is_reused():
+    _compiledCroniter.cache_clear()
+    start = datetime(2025, 3, 3, 0, 0)
+    first = getNextTimes("0 9 * * *", start, start + timedelta(days=2), 10)
+    second = getNextTimes("0 9 * * *", start + timedelta(days=1), start + timedelta(days=3), 10)
+    assert _compiledCroniter.cache_info().hits == 1
+    assert first == [datetime(2025, 3, 3, 9, 0), datetime(2025, 3, 4, 9, 0)]
+    assert second == [datetime(2025, 3, 4, 9, 0), datetime(2025, 3, 5, 9, 0)]
+
+def test_expand_occurrences_matches_iteration():
+    start = datetime(2025, 1, 6, 7, 45, 30)
+    windows = [
+        ("30 8,17 * * 1-5", start, start + timedelta(days=10)),
+        ("0 9 * * mon", start, start + timedelta(days=20)),
+        ("30 8,17 * * 1-5", start + timedelta(days=3), start + timedelta(days=40)),
+        ("0 9 * * *", start, start - timedelta(days=1)),
+    ]
+    results = expandOccurrences(windows)
+    assert len(results) == len(windows)
+    for (cron, windowStart, windowEnd), times in zip(windows, results):
+        assert times.dtype == np.dtype("datetime64[m]")
+        assert list(times.astype(datetime)) == getNextTimes(cron, windowStart, windowEnd, 9999)
+
+def test_expand_occurrences_invalid_cron_expression():
+    with pytest.raises(ValueError):
+        expandOccurrences([("invalid cron", datetime(2025, 3, 3), datetime(2025, 3, 10))])
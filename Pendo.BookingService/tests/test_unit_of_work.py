@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi import Depends, FastAPI, Response
+from fastapi.testclient import TestClient
+from app.unit_of_work import UnitOfWork, get_unit_of_work
+
+@pytest.fixture
+def mock_session():
+    return MagicMock()
+
+def test_unit_of_work_uses_one_session(mock_session):
+    factory = MagicMock(return_value=mock_session)
+    unit_of_work = UnitOfWork(factory)
+    assert unit_of_work.session is mock_session
+    factory.assert_called_once()
+
+def test_unit_of_work_commit_counts(mock_session):
+    unit_of_work = UnitOfWork(lambda: mock_session)
+    unit_of_work.Commit()
+    mock_session.commit.assert_called_once()
+    assert unit_of_work.commits == 1
+
+def create_test_client(command_status = None, raises = False):
+    app = FastAPI()
+
+    @app.post("/Command")
+    def command(response: Response, unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
+        unit_of_work.session.add("change")
+        if raises:
+            raise ValueError("failed")
+        if command_status is not None:
+            response.status_code = command_status
+            return {"Status": "Failed"}
+        return {"Status": "Success"}
+
+    return TestClient(app, raise_server_exceptions=False)
+
+def test_route_commits_once_and_closes(mock_session):
+    with patch('app.unit_of_work.SessionLocal', return_value=mock_session):
+        result = create_test_client().post("/Command")
+    assert result.status_code == 200
+    mock_session.commit.assert_called_once()
+    mock_session.rollback.assert_not_called()
+    mock_session.close.assert_called_once()
+
+def test_route_rolls_back_when_command_reports_failure(mock_session):
+    with patch('app.unit_of_work.SessionLocal', return_value=mock_session):
+        result = create_test_client(command_status=500).post("/Command")
+    assert result.status_code == 500
+    mock_session.commit.assert_not_called()
+    mock_session.rollback.assert_called_once()
+    mock_session.close.assert_called_once()
+
+def test_route_commits_on_success_status(mock_session):
+    with patch('app.unit_of_work.SessionLocal', return_value=mock_session):
+        result = create_test_client(command_status=201).post("/Command")
+    assert result.status_code == 201
+    mock_session.commit.assert_called_once()
+    mock_session.rollback.assert_not_called()
+
+def test_route_rolls_back_on_error(mock_session):
+    with patch('app.unit_of_work.SessionLocal', return_value=mock_session):
+        result = create_test_client(raises=True).post("/Command")
+    assert result.status_code == 500
+    mock_session.commit.assert_not_called()
+    mock_session.rollback.assert_called_once()
+    mock_session.close.assert_called_once()
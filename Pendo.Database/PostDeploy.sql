@@ -155,4 +155,60 @@ WHEN NOT MATCHED THEN
     INSERT ([UserId], [Email], [FirstName], [LastName], [UserTypeId])
     VALUES (source.[UserId], source.[Email], source.[FirstName], source.[LastName], source.[UserTypeId]);
 
-GO
\ No newline at end of file
+GO
+
+-- Backfill conversation participant set keys, must match participant_set_key in the message service
+UPDATE c
+SET c.[ParticipantSetKey] = LOWER(CONVERT(CHAR(64), HASHBYTES('SHA2_256', k.[Ids]), 2))
+FROM [messaging].[Conversations] c
+CROSS APPLY (
+    SELECT CAST(STRING_AGG(CAST(LOWER(CONVERT(CHAR(36), p.[UserId])) AS VARCHAR(MAX)), ',')
+        WITHIN GROUP (ORDER BY LOWER(CONVERT(CHAR(36), p.[UserId])) COLLATE Latin1_General_BIN) AS VARCHAR(MAX)) AS [Ids]
+    FROM [messaging].[ConversationParticipants] p
+    WHERE p.[ConversationId] = c.[ConversationId] AND p.[LeftAt] IS NULL
+) k
+WHERE c.[ParticipantSetKey] IS NULL AND k.[Ids] IS NOT NULL;
+
+GO
+
+-- Backfill conversation summaries from the latest stored message
+UPDATE c
+SET c.[LastMessageAt] = m.[CreateDate],
+    c.[LastMessagePreview] = LEFT(COALESCE(JSON_VALUE(m.[Content], '$.text'), JSON_VALUE(m.[Content], '$.content'), m.[Content]), 200),
+    c.[LastMessageSenderId] = m.[SenderId],
+    c.[UpdateDate] = CASE WHEN m.[CreateDate] > c.[UpdateDate] THEN m.[CreateDate] ELSE c.[UpdateDate] END
+FROM [messaging].[Conversations] c
+CROSS APPLY (
+    SELECT TOP 1 [CreateDate], [Content], [SenderId]
+    FROM [messaging].[Messages]
+    WHERE [ConversationId] = c.[ConversationId]
+    ORDER BY [CreateDate] DESC, [MessageId] DESC
+) m
+WHERE c.[LastMessageAt] IS NULL;
+
+GO
+
+UPDATE p
+SET p.[LastActivityAt] = c.[UpdateDate]
+FROM [messaging].[ConversationParticipants] p
+JOIN [messaging].[Conversations] c ON c.[ConversationId] = p.[ConversationId]
+WHERE p.[LastActivityAt] <> c.[UpdateDate];
+
+GO
+
+-- Backfill effective bookings from each booking's latest approved ammendment, must match RefreshEffectiveBooking in the booking service
+INSERT INTO [booking].[EffectiveBooking]
+    ([BookingId], [BookingAmmendmentId], [ProposedPrice], [StartName], [StartLong], [StartLat],
+     [EndName], [EndLong], [EndLat], [StartTime], [Recurrance])
+SELECT b.[BookingId], a.[BookingAmmendmentId], a.[ProposedPrice], a.[StartName], a.[StartLong], a.[StartLat],
+       a.[EndName], a.[EndLong], a.[EndLat], a.[StartTime], a.[Recurrance]
+FROM [booking].[Booking] b
+CROSS APPLY (
+    SELECT TOP 1 *
+    FROM [booking].[BookingAmmendment]
+    WHERE [BookingId] = b.[BookingId] AND [DriverApproval] = 1 AND [PassengerApproval] = 1
+    ORDER BY [CreateDate] DESC
+) a
+WHERE NOT EXISTS (SELECT 1 FROM [booking].[EffectiveBooking] e WHERE e.[BookingId] = b.[BookingId]);
+
+GO
@@ -12,8 +12,19 @@ CREATE INDEX IX_OtpLogin_UserId ON [identity].[OtpLogin] (UserId)
 
 GO;
 
+-- Booking Service Indexes
+-- A user's bookings as passenger, and as driver through their journeys
+CREATE INDEX IX_Booking_UserId ON [booking].[Booking]([UserId]);
+
+GO;
+
+CREATE INDEX IX_Journey_UserId ON [journey].[Journey]([UserId]);
+
+GO;
+
 -- Messaging Service Indexes
-CREATE INDEX IX_Messages_ConversationId ON [messaging].[Messages]([ConversationId]);
+-- Keyset index for paginated history, (CreateDate, MessageId) is the page cursor
+CREATE INDEX IX_Messages_ConversationId_CreateDate ON [messaging].[Messages]([ConversationId], [CreateDate] DESC, [MessageId] DESC);
 
 GO;
 
@@ -21,6 +32,21 @@ CREATE INDEX IX_Messages_SenderId ON [messaging].[Messages]([SenderId]);
 
 GO;
 
+-- Resume index, clients catch up from their last seen per-conversation sequence number
+CREATE INDEX IX_Messages_ConversationId_SequenceNumber ON [messaging].[Messages]([ConversationId], [SequenceNumber]);
+
+GO;
+
 CREATE INDEX IX_ConversationParticipants_UserId ON [messaging].[ConversationParticipants]([UserId]);
 
-GO;
\ No newline at end of file
+GO;
+
+-- Conversation dedup, one lookup by canonical participant set
+CREATE INDEX IX_Conversations_ParticipantSetKey ON [messaging].[Conversations]([ParticipantSetKey]);
+
+GO;
+
+-- Conversation summaries, a user's conversations by last activity, (LastActivityAt, ConversationId) is the page cursor
+CREATE INDEX IX_ConversationParticipants_UserId_LastActivityAt ON [messaging].[ConversationParticipants]([UserId], [LastActivityAt] DESC, [ConversationId] DESC) INCLUDE ([UnreadCount], [LeftAt]);
+
+GO;
@@ -0,0 +1,27 @@
+/*
+Created: 18/10/2026
+Description: Creates Effective Booking Table, a projection of each booking's latest approved ammendment.
+*/
+
+CREATE TABLE [booking].[EffectiveBooking]
+(
+  [BookingId] UNIQUEIDENTIFIER NOT NULL PRIMARY KEY, --Only bookings with an approved ammendment have a row
+  -- Values of the latest approved ammendment, NULL where it does not change the journey / booking
+  [BookingAmmendmentId] UNIQUEIDENTIFIER NULL,
+  [ProposedPrice] DECIMAL(18, 8) NULL,
+  [StartName] NVARCHAR(MAX) NULL,
+  [StartLong] FLOAT NULL,
+  [StartLat] FLOAT NULL,
+  [EndName] NVARCHAR(MAX) NULL,
+  [EndLong] FLOAT NULL,
+  [EndLat] FLOAT NULL,
+  [StartTime] DATETIME2 NULL,
+  [Recurrance] NVARCHAR(100) NULL,
+  [UpdateDate] DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
+
+  CONSTRAINT FK_EffectiveBooking_Booking FOREIGN KEY ([BookingId])
+  REFERENCES [booking].[Booking](BookingId) ON DELETE CASCADE,
+
+  CONSTRAINT FK_EffectiveBooking_BookingAmmendment FOREIGN KEY ([BookingAmmendmentId])
+  REFERENCES [booking].[BookingAmmendment](BookingAmmendmentId)
+);
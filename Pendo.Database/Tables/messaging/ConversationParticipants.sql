@@ -10,6 +10,10 @@ CREATE TABLE [messaging].[ConversationParticipants]
     [UserId] UNIQUEIDENTIFIER NOT NULL,
     [JoinedAt] DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
     [LeftAt] DATETIME2 NULL,
+    -- Per-user conversation summary, maintained as messages are written
+    [LastActivityAt] DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
+    [UnreadCount] INT NOT NULL DEFAULT 0,
+    [LastReadAt] DATETIME2 NULL,
     PRIMARY KEY ([ConversationId], [UserId]),
     CONSTRAINT FK_ConversationParticipants_Conversations FOREIGN KEY ([ConversationId])
         REFERENCES [messaging].[Conversations](ConversationId) ON DELETE CASCADE,
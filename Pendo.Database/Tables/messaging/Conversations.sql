@@ -10,5 +10,11 @@ CREATE TABLE [messaging].[Conversations]
     [Name] NVARCHAR(100) NULL,
     [Type] NVARCHAR(20) NOT NULL CHECK (Type IN ('direct', 'group', 'support')),
     [CreateDate] DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
-    [UpdateDate] DATETIME2 NOT NULL DEFAULT GETUTCDATE()
+    [UpdateDate] DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
+    -- SHA-256 of the sorted lower-case participant ids, used to find an existing conversation
+    [ParticipantSetKey] CHAR(64) NULL,
+    -- Last message summary, maintained as messages are written
+    [LastMessageAt] DATETIME2 NULL,
+    [LastMessagePreview] NVARCHAR(200) NULL,
+    [LastMessageSenderId] UNIQUEIDENTIFIER NULL
 )
@@ -14,6 +14,7 @@ CREATE TABLE [messaging].[Messages]
     [CreateDate] DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
     [EditedAt] DATETIME2 NULL,
     [IsDeleted] BIT NOT NULL DEFAULT 0,
+    [SequenceNumber] BIGINT NULL,
     CONSTRAINT FK_Messages_Conversations FOREIGN KEY ([ConversationId])
         REFERENCES [messaging].[Conversations](ConversationId) ON DELETE CASCADE,
     CONSTRAINT FK_Messages_Sender FOREIGN KEY ([SenderId])
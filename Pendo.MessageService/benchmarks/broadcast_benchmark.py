@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+from src.message_handler import MessageHandler
+
+"""
+Measures broadcast delivery latency against conversation size.
+
+Each simulated socket accepts frames after a random network delay, with a
+small fraction of slow mobile clients. Latency is measured from the start of
+the broadcast until each recipient has accepted the frame, and the time until
+the broadcast call returns to the sender is reported separately. Registered
+sockets are written through their outbound queues, so the benchmark drains
+them before reading delivery times.
+
+Usage:
+    python -m benchmarks.broadcast_benchmark --sizes 2 10 50 200 --rounds 20
+"""
+
+class SimulatedWebSocket:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received_at = []
+
+    async def send(self, message):
+        await asyncio.sleep(self.delay)
+        self.received_at.append(time.perf_counter())
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_size(size, rounds, base_delay, slow_ratio, slow_delay):
+    handler = MessageHandler(repository=None)
+    conversation_id = str(uuid.uuid4())
+    sender = str(uuid.uuid4())
+    sockets = {}
+
+    for i in range(size):
+        user_id = sender if i == 0 else str(uuid.uuid4())
+        delay = slow_delay if random.random() < slow_ratio else base_delay * random.uniform(0.5, 1.5)
+        sockets[user_id] = SimulatedWebSocket(delay)
+        handler.register_user(user_id, sockets[user_id])
+        handler.conversations.setdefault(conversation_id, set()).add(user_id)
+
+    message = {"type": "chat", "from": sender, "conversation_id": conversation_id, "content": "x" * 64}
+    delivery, call = [], []
+
+    for _ in range(rounds):
+        for socket in sockets.values():
+            socket.received_at.clear()
+        started = time.perf_counter()
+        await handler._broadcast_to_conversation(conversation_id, dict(message), exclude_user=sender)
+        call.append(time.perf_counter() - started)
+        await handler.drain()
+        for user_id, socket in sockets.items():
+            if user_id != sender and socket.received_at:
+                delivery.append(socket.received_at[0] - started)
+
+    await handler.shutdown()
+
+    return {
+        "size": size,
+        "p50_ms": percentile(delivery, 50) * 1000,
+        "p95_ms": percentile(delivery, 95) * 1000,
+        "p99_ms": percentile(delivery, 99) * 1000,
+        "broadcast_ms": statistics.mean(call) * 1000,
+    }
+
+async def main(args):
+    random.seed(args.seed)
+    print(f"{'size':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'broadcast ms':>14}")
+    results = []
+    for size in args.sizes:
+        result = await run_size(size, args.rounds, args.delay_ms / 1000, args.slow_ratio, args.slow_delay_ms / 1000)
+        results.append(result)
+        print(f"{result['size']:>6} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['p99_ms']:>10.2f} {result['broadcast_ms']:>14.2f}")
+    if args.json:
+        print(json.dumps(results))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Broadcast fan-out latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 10, 50, 200])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=2)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-delay-ms", type=float, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    asyncio.run(main(parser.parse_args()))
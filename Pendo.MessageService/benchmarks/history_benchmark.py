@@ -0,0 +1,101 @@
+import argparse
+import datetime
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+from src.codec import JSON
+from src.message_handler import MessageHandler
+
+"""
+Measures the cost of building a history response for a page of stored messages.
+
+Compares serializing every row and encoding the response from scratch, as
+each history request used to, with the wire cache: a cold pass that fills
+it and warm passes that only join cached encodings. Cached latest-page
+responses, built from the conversation cache, are measured the same way.
+
+Usage:
+    python -m benchmarks.history_benchmark --messages 100 --iterations 2000
+"""
+
+def make_rows(count):
+    conversation_id = uuid.uuid4()
+    started = datetime.datetime(2025, 1, 1, 12, 0, 0)
+    rows = []
+    for i in range(count):
+        rows.append(SimpleNamespace(
+            MessageId=uuid.uuid4(),
+            ConversationId=conversation_id,
+            SenderId=uuid.uuid4(),
+            MessageType="chat",
+            Content=json.dumps({"text": f"Message {i} " + "x" * 80, "original_type": "chat"}),
+            CreateDate=started + datetime.timedelta(seconds=i),
+            SequenceNumber=i + 1
+        ))
+    return rows[::-1]
+
+def time_per_call(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+def main(args):
+    handler = MessageHandler(repository=None)
+    # Cursors are only built when there is a database behind the handler
+    handler.repository = object()
+    rows = make_rows(args.messages)
+
+    def uncached():
+        messages = [handler.serialize_message(row) for row in rows]
+        return json.dumps({
+            'type': 'history_response',
+            'messages': messages,
+            'has_more': False,
+            'resumed': False,
+            'before_cursor': handler._cursor_for(messages[-1]),
+            'after_cursor': handler._cursor_for(messages[0])
+        })
+
+    def cold():
+        handler.wire_cache = type(handler.wire_cache)()
+        messages = [handler._wire(row)[0] for row in rows]
+        return handler._history_payload(messages, has_more=False, resumed=False).encode(JSON)
+
+    def warm():
+        messages = [handler._wire(row)[0] for row in rows]
+        return handler._history_payload(messages, has_more=False, resumed=False).encode(JSON)
+
+    assert json.loads(uncached()) == json.loads(warm())
+
+    cached_messages = [handler._wire(row)[0] for row in rows]
+
+    def latest_page_uncached():
+        return json.dumps({'type': 'history_response', 'messages': cached_messages, 'has_more': False})
+
+    def latest_page_cached():
+        return handler._history_payload(cached_messages, has_more=False, resumed=False).encode(JSON)
+
+    results = [
+        ("rows, no wire cache", time_per_call(uncached, args.iterations)),
+        ("rows, cold wire cache", time_per_call(cold, args.iterations)),
+        ("rows, warm wire cache", time_per_call(warm, args.iterations)),
+        ("cached page, json.dumps", time_per_call(latest_page_uncached, args.iterations)),
+        ("cached page, wire cache", time_per_call(latest_page_cached, args.iterations)),
+    ]
+
+    print(f"{args.messages} messages per history response")
+    print(f"{'path':<26} {'us/response':>12}")
+    for name, seconds in results:
+        print(f"{name:<26} {seconds * 1e6:>12.1f}")
+    if args.json:
+        print(json.dumps({name: seconds * 1e6 for name, seconds in results}))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="History response serialization benchmark")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,406 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import aiohttp
+import websockets
+
+from benchmarks.broadcast_benchmark import percentile
+from src.codec import CODECS, JSON
+
+"""
+Load generator for the message service WebSocket and HTTP servers.
+
+Starts a local server on in-memory SQLite (see benchmarks.sqlite_server),
+creates conversations through the HTTP API, then connects simulated users
+that chat, leave and rejoin conversations and request history at the
+configured rates. Every user runs in this process, so delivery latency is
+measured from the sender's send to each recipient's receive on one clock.
+
+Reports p50/p95/p99 delivery and history latency, message throughput, the
+server's resident set size and CPU time, and the bytes received by clients
+off the wire, so compression settings can be compared on CPU against bytes
+saved. Run it before every release and compare
+against the previous run. The generator shares one event loop, so check
+that it is not the bottleneck (client CPU near 100%) before reading the
+numbers as server limits.
+
+Usage:
+    python -m benchmarks.load_test --users 200 --conversations 50 --duration 30
+    python -m benchmarks.load_test --compression-threshold 512
+    python -m benchmarks.load_test --ws-url ws://localhost:9010 --http-url http://localhost:9011 --server-pid 1234
+"""
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.connect_failures = 0
+        self.sent = 0
+        self.delivered = 0
+        self.joins = 0
+        self.leaves = 0
+        self.history_requests = 0
+        self.errors = 0
+        self.delivery = []
+        self.history = []
+        self.rss = []
+        self.bytes_received = 0
+        self.payload_bytes_received = 0
+
+class CountingClientProtocol(websockets.WebSocketClientProtocol):
+    """
+    Client protocol that counts the bytes read off the socket, after any compression.
+    """
+    stats = None
+
+    def data_received(self, data):
+        self.stats.bytes_received += len(data)
+        super().data_received(data)
+
+class SimulatedUser:
+    def __init__(self, user_id, conversations, args, stats):
+        self.user_id = user_id
+        self.conversations = conversations
+        self.args = args
+        self.stats = stats
+        self.websocket = None
+        self.codec = CODECS[args.codec]
+        # Join and history requests both answer with a history_response, in order
+        self.pending_history = []
+
+    async def connect(self, ws_url):
+        try:
+            self.websocket = await websockets.connect(
+                ws_url,
+                max_size=10 * 1024 * 1024,
+                compression=None if self.args.no_compression else "deflate",
+                create_protocol=type("Protocol", (CountingClientProtocol,), {"stats": self.stats})
+            )
+            await self.websocket.recv()
+            await self._send({"register": True, "user_id": self.user_id, "codec": self.codec.name})
+            await self.websocket.recv()
+            for conversation_id in self.conversations:
+                await self._join(conversation_id)
+            self.stats.connected += 1
+            return True
+        except Exception:
+            self.stats.connect_failures += 1
+            return False
+
+    async def run(self, until):
+        tasks = [asyncio.create_task(self._receive())]
+        if self.args.chat_rate > 0:
+            tasks.append(asyncio.create_task(self._every(self.args.chat_rate, until, self._chat)))
+        if self.args.churn_rate > 0:
+            tasks.append(asyncio.create_task(self._every(self.args.churn_rate, until, self._churn)))
+        if self.args.history_rate > 0:
+            tasks.append(asyncio.create_task(self._every(self.args.history_rate, until, self._history)))
+
+        await asyncio.sleep(max(0, until - time.perf_counter()))
+        # Give in-flight deliveries time to arrive before disconnecting
+        await asyncio.sleep(self.args.drain)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.websocket.close()
+
+    async def _every(self, rate, until, action):
+        # Poisson arrivals at the configured per-user rate
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            if time.perf_counter() >= until:
+                return
+            try:
+                await action()
+            except websockets.exceptions.ConnectionClosed:
+                return
+
+    async def _send(self, message):
+        await self.websocket.send(self.codec.encode(message))
+
+    async def _join(self, conversation_id):
+        self.pending_history.append(time.perf_counter())
+        await self._send({"type": "join_conversation", "user_id": self.user_id, "conversation_id": conversation_id})
+        self.stats.joins += 1
+
+    async def _chat(self):
+        await self._send({
+            "type": "chat",
+            "from": self.user_id,
+            "conversation_id": random.choice(self.conversations),
+            "content": "x" * self.args.message_size,
+            "sent_at": time.perf_counter()
+        })
+        self.stats.sent += 1
+
+    async def _churn(self):
+        conversation_id = random.choice(self.conversations)
+        await self._send({"type": "leave_conversation", "user_id": self.user_id, "conversation_id": conversation_id})
+        self.stats.leaves += 1
+        await self._join(conversation_id)
+
+    async def _history(self):
+        self.pending_history.append(time.perf_counter())
+        await self._send({
+            "type": "history_request",
+            "user_id": self.user_id,
+            "conversation_id": random.choice(self.conversations)
+        })
+        self.stats.history_requests += 1
+
+    async def _receive(self):
+        try:
+            async for frame in self.websocket:
+                now = time.perf_counter()
+                self.stats.payload_bytes_received += len(frame)
+                data = self.codec.decode(frame) if isinstance(frame, bytes) else JSON.decode(frame)
+                frame_type = data.get("type")
+                if frame_type == "chat" and "sent_at" in data:
+                    self.stats.delivered += 1
+                    self.stats.delivery.append(now - data["sent_at"])
+                elif frame_type == "history_response" and self.pending_history:
+                    self.stats.history.append(now - self.pending_history.pop(0))
+                elif frame_type == "error":
+                    self.stats.errors += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+def read_rss_mb(pid):
+    """
+    Resident set size of a process in MB, read from /proc.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+async def sample_rss(pid, stats, interval=0.5):
+    while True:
+        rss = read_rss_mb(pid)
+        if rss is not None:
+            stats.rss.append(rss)
+        await asyncio.sleep(interval)
+
+def read_cpu_seconds(pid):
+    """
+    User plus system CPU time of a process in seconds, read from /proc.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Fields after the parenthesised command name, utime and stime are the 14th and 15th
+            fields = stat.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args):
+    ws_port, http_port = free_port(), free_port()
+    env = dict(
+        os.environ,
+        ENV="Testing",
+        USE_DATABASE="true",
+        WS_PORT=str(ws_port),
+        HTTP_PORT=str(http_port),
+        LOG_LEVEL="WARNING",
+        # The in-memory database is a single shared SQLite connection
+        DB_POOL_SIZE="1",
+        WS_COMPRESSION_THRESHOLD=str(args.compression_threshold)
+    )
+    output = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.sqlite_server"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        stdout=output,
+        stderr=subprocess.STDOUT
+    )
+    return process, f"ws://127.0.0.1:{ws_port}", f"http://127.0.0.1:{http_port}"
+
+async def wait_for_server(session, http_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{http_url}/api/Message/HealthCheck") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {http_url} did not become healthy within {timeout}s")
+
+async def create_conversations(session, http_url, members):
+    conversation_ids = []
+    for users in members:
+        async with session.post(f"{http_url}/api/Message/CreateConversation", json={
+            "UserId": users[0],
+            "ConversationType": "group",
+            "name": "Load test",
+            "participants": users[1:]
+        }) as response:
+            body = await response.json()
+            if response.status != 200:
+                raise RuntimeError(f"Could not create conversation: {body}")
+            conversation_ids.append(body["ConversationId"])
+    return conversation_ids
+
+async def run(args):
+    random.seed(args.seed)
+    stats = Stats()
+    process = None
+    ws_url, http_url, server_pid = args.ws_url, args.http_url, args.server_pid
+
+    if not ws_url:
+        process, ws_url, http_url = start_server(args)
+        server_pid = process.pid
+
+    rss_task = asyncio.create_task(sample_rss(server_pid, stats)) if server_pid else None
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_for_server(session, http_url)
+
+            # Spread users over conversations, each conversation gets at least one member
+            user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+            members = [[] for _ in range(args.conversations)]
+            memberships = {user_id: [] for user_id in user_ids}
+            for i, user_id in enumerate(user_ids):
+                for slot in {i % args.conversations} | set(random.sample(range(args.conversations), args.conversations_per_user - 1)):
+                    members[slot].append(user_id)
+                    memberships[user_id].append(slot)
+            members = [users or [user_ids[0]] for users in members]
+            conversation_ids = await create_conversations(session, http_url, members)
+
+        users = [
+            SimulatedUser(user_id, [conversation_ids[slot] for slot in slots], args, stats)
+            for user_id, slots in memberships.items()
+        ]
+
+        rss_idle = stats.rss[-1] if stats.rss else read_rss_mb(server_pid) if server_pid else None
+        connect_started = time.perf_counter()
+        for i in range(0, len(users), args.connect_batch):
+            await asyncio.gather(*(user.connect(ws_url) for user in users[i:i + args.connect_batch]))
+        connect_seconds = time.perf_counter() - connect_started
+
+        connected = [user for user in users if user.websocket is not None]
+        stats.history.clear()
+        stats.bytes_received = stats.payload_bytes_received = 0
+        cpu_started = read_cpu_seconds(server_pid) if server_pid else None
+        started = time.perf_counter()
+        await asyncio.gather(*(user.run(started + args.duration) for user in connected))
+        elapsed = time.perf_counter() - started - args.drain
+        cpu_ended = read_cpu_seconds(server_pid) if server_pid else None
+        server_cpu = cpu_ended - cpu_started if cpu_started is not None and cpu_ended is not None else None
+    finally:
+        if rss_task:
+            rss_task.cancel()
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return report(args, stats, elapsed, connect_seconds, rss_idle, server_cpu)
+
+def summarise(values):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {f"p{pct}_ms": percentile(values, pct) * 1000 for pct in (50, 95, 99)}
+
+def report(args, stats, elapsed, connect_seconds, rss_idle, server_cpu):
+    return {
+        "users": args.users,
+        "conversations": args.conversations,
+        "duration_s": elapsed,
+        "connected": stats.connected,
+        "connect_failures": stats.connect_failures,
+        "connect_s": connect_seconds,
+        "sent": stats.sent,
+        "delivered": stats.delivered,
+        "sent_per_s": stats.sent / elapsed,
+        "delivered_per_s": stats.delivered / elapsed,
+        "joins": stats.joins,
+        "leaves": stats.leaves,
+        "history_requests": stats.history_requests,
+        "errors": stats.errors,
+        "delivery": summarise(stats.delivery),
+        "history": summarise(stats.history),
+        "server_cpu_s": server_cpu,
+        "wire_bytes_received": stats.bytes_received,
+        "payload_bytes_received": stats.payload_bytes_received,
+        "rss_mb": {
+            "idle": rss_idle,
+            "peak": max(stats.rss) if stats.rss else None,
+            "end": stats.rss[-1] if stats.rss else None
+        }
+    }
+
+def format_ms(value):
+    return f"{value:.2f}" if value is not None else "-"
+
+def print_report(result):
+    print(f"users={result['users']} conversations={result['conversations']} duration={result['duration_s']:.1f}s")
+    print(f"connected {result['connected']} ({result['connect_failures']} failed) in {result['connect_s']:.2f}s")
+    print(f"sent {result['sent']} ({result['sent_per_s']:.1f}/s), delivered {result['delivered']} ({result['delivered_per_s']:.1f}/s)")
+    print(f"joins {result['joins']}, leaves {result['leaves']}, history requests {result['history_requests']}, errors {result['errors']}")
+    print(f"{'':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name in ("delivery", "history"):
+        row = result[name]
+        print(f"{name:>10} {format_ms(row['p50_ms']):>10} {format_ms(row['p95_ms']):>10} {format_ms(row['p99_ms']):>10}")
+    wire, payload = result["wire_bytes_received"], result["payload_bytes_received"]
+    saved = f", {100 * (1 - wire / payload):.1f}% saved" if payload else ""
+    print(f"received {wire / 1024:.1f} KiB on the wire for {payload / 1024:.1f} KiB of frames{saved}")
+    if result["server_cpu_s"] is not None:
+        print(f"server CPU {result['server_cpu_s']:.2f}s ({100 * result['server_cpu_s'] / result['duration_s']:.1f}% of one core)")
+    rss = result["rss_mb"]
+    if rss["peak"] is not None:
+        print(f"server RSS MB: idle {rss['idle']:.1f}, peak {rss['peak']:.1f}, end {rss['end']:.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Message service load test")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--conversations", type=int, default=25)
+    parser.add_argument("--conversations-per-user", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load after every user has connected")
+    parser.add_argument("--chat-rate", type=float, default=0.5, help="Chat messages per user per second")
+    parser.add_argument("--churn-rate", type=float, default=0.02, help="Leave and rejoin cycles per user per second")
+    parser.add_argument("--history-rate", type=float, default=0.05, help="History requests per user per second")
+    parser.add_argument("--message-size", type=int, default=64)
+    parser.add_argument("--codec", choices=sorted(CODECS), default="json", help="Codec negotiated by every user")
+    parser.add_argument("--compression-threshold", type=int, default=1024, help="Smallest frame the started server compresses, -1 to disable")
+    parser.add_argument("--no-compression", action="store_true", help="Do not offer permessage-deflate from the clients")
+    parser.add_argument("--connect-batch", type=int, default=50, help="Users connected concurrently during ramp up")
+    parser.add_argument("--drain", type=float, default=2, help="Seconds to wait for deliveries after the load stops")
+    parser.add_argument("--ws-url", help="Use a running server instead of starting one")
+    parser.add_argument("--http-url", help="HTTP address of a running server")
+    parser.add_argument("--server-pid", type=int, help="PID of a running server, for RSS sampling")
+    parser.add_argument("--server-log", help="File to write the started server's output to")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.ws_url and not args.http_url:
+        parser.error("--http-url is required with --ws-url")
+    if not 1 <= args.conversations_per_user <= args.conversations:
+        parser.error("--conversations-per-user must be between 1 and --conversations")
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        print(json.dumps(result))
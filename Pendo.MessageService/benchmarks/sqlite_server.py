@@ -0,0 +1,61 @@
+import asyncio
+import datetime
+import os
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.dialects.mssql import DATETIME2
+from sqlalchemy.ext.compiler import compiles
+
+"""
+Runs the message service against an in-memory SQLite database for load testing.
+
+The schema targets SQL Server, so before the service starts each schema is
+attached as its own in-memory SQLite database and the SQL Server types,
+default functions and collation it uses are given SQLite equivalents. The
+tables are then created and the normal server entry point is run.
+
+Usage:
+    ENV=Testing python -m benchmarks.sqlite_server
+"""
+
+SCHEMAS = ("identity", "journey", "booking", "messaging", "payment", "shared", "admin")
+COLLATION = "SQL_Latin1_General_CP1_CI_AS"
+
+@compiles(DATETIME2, "sqlite")
+def _compile_datetime2(type_, compiler, **kw):
+    return "DATETIME"
+
+def _compare_ci(left, right):
+    left, right = left.lower(), right.lower()
+    return (left > right) - (left < right)
+
+def prepare_database():
+    """
+    Initialise the service's SQLite engine and create the schema on it.
+    """
+    os.environ.setdefault("ENV", "Testing")
+
+    from src.db import PendoDatabaseProvider
+    from src.db.PendoDatabase import Base
+
+    PendoDatabaseProvider._initialise_database()
+    engine = PendoDatabaseProvider.engine
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError("The load test server must run with ENV=Testing")
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        for schema in SCHEMAS:
+            dbapi_connection.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+        dbapi_connection.create_function("getutcdate", 0, lambda: datetime.datetime.utcnow().isoformat(" "))
+        dbapi_connection.create_function("newsequentialid", 0, lambda: uuid.uuid4().hex)
+        dbapi_connection.create_collation(COLLATION, _compare_ci)
+
+    Base.metadata.create_all(engine)
+
+if __name__ == "__main__":
+    prepare_database()
+
+    from src import run_servers
+    asyncio.run(run_servers.main())
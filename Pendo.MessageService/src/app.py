@@ -5,10 +5,14 @@ import json
 import os
 import sys
 import traceback
-import time
 from datetime import datetime
 from src.message_handler import MessageHandler
-from src.db.MessageRepository import MessageRepository
+from src.message_bus import create_bus
+from src.heartbeat import HeartbeatScheduler
+from src.compression import server_extensions
+from src import metrics
+from src.db.MessageRepository import MessageRepository, encode_cursor
+from src.db.AsyncRepository import AsyncRepository
 from aiohttp import web
 from aiohttp_cors import setup as cors_setup, ResourceOptions
 import uuid
@@ -33,6 +37,13 @@ websockets_logger.setLevel(logging.DEBUG)
 WS_PORT = int(os.environ.get("WS_PORT", "9010"))
 HTTP_PORT = int(os.environ.get("HTTP_PORT", "9011"))
 
+# Shared account that owns every support conversation
+SUPPORT_USER_ID = "00000000-0000-0000-0000-000000000000"
+
+# Conversation summaries returned per page, and the most a client may ask for
+CONVERSATION_PAGE_SIZE = int(os.environ.get("CONVERSATION_PAGE_SIZE", "20"))
+CONVERSATION_PAGE_SIZE_MAX = int(os.environ.get("CONVERSATION_PAGE_SIZE_MAX", "100"))
+
 # Initialise database repository
 USE_DATABASE = os.environ.get("USE_DATABASE", "true").lower() == "true"
 repository = None
@@ -44,8 +55,35 @@ if USE_DATABASE:
         logger.error(f"Failed to initialise database repository: {str(e)}")
         logger.error(traceback.format_exc())
 
-# Initialise message handler with repository
-message_handler = MessageHandler(repository=repository)
+# Initialise message handler with repository and, for multi-node deployments, a message bus
+message_handler = MessageHandler(repository=repository, bus=create_bus())
+
+# One timer wheel sends heartbeats for every connection
+heartbeat_scheduler = HeartbeatScheduler(send=message_handler.send, on_dead=message_handler.remove_connection)
+
+# Live state is read at scrape time rather than tracked separately
+metrics.Gauge("pendo_ws_connections", "Open WebSocket connections",
+              callback=lambda: len(heartbeat_scheduler))
+metrics.Gauge("pendo_registered_users", "Users registered on this node",
+              callback=lambda: len(message_handler.user_connections))
+metrics.Gauge("pendo_joined_conversations", "Conversations with at least one member on this node",
+              callback=lambda: len(message_handler.conversations))
+metrics.Gauge("pendo_conversation_memberships", "Joined (user, conversation) pairs on this node",
+              callback=lambda: sum(len(users) for users in message_handler.conversations.values()))
+metrics.Gauge("pendo_queued_messages", "Messages waiting to be written to the database",
+              callback=lambda: message_handler.writer.pending_count if message_handler.writer else 0)
+
+# Cache effectiveness, read from each cache's own counters
+cache_lookups = metrics.Counter("pendo_cache_lookups", "Cache lookups, by cache and result",
+                                labelnames=("cache", "result"))
+cache_evictions = metrics.Counter("pendo_cache_evictions", "Entries evicted to stay within a cache's budget",
+                                  labelnames=("cache",))
+for cache_name, cache in (("conversation", message_handler.message_store),
+                          ("wire", message_handler.wire_cache),
+                          ("membership", message_handler.membership_cache)):
+    cache_lookups.labels(cache=cache_name, result="hit").set_function(lambda cache=cache: cache.hits)
+    cache_lookups.labels(cache=cache_name, result="miss").set_function(lambda cache=cache: cache.misses)
+    cache_evictions.labels(cache=cache_name).set_function(lambda cache=cache: cache.evictions)
 
 async def health_check(request):
     """HTTP endpoint for health checks"""
@@ -57,6 +95,13 @@ async def health_check(request):
         "service": "message-service"
     })
 
+async def metrics_handler(request):
+    """HTTP endpoint exposing service metrics in the Prometheus text format"""
+    return web.Response(
+        body=metrics.REGISTRY.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
+
 async def root_handler(request):
     """Root HTTP endpoint"""
     # Extract host and protocol for WebSocket URL
@@ -70,6 +115,7 @@ async def root_handler(request):
         "version": "1.0",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "websocket": f"{ws_protocol}://{ws_host}:{WS_PORT}/ws"
         }
     })
@@ -98,7 +144,7 @@ async def user_conversations_handler(request):
             return web.json_response({"error": "Repository not available"}, status=500)
             
         # Fetch user conversations from repository and return as JSON
-        conversations = repo.get_user_conversations(user_id)
+        conversations = await AsyncRepository(repo).get_user_conversations(user_id)
         conv_list = []
         for conv in conversations:
             conv_list.append({
@@ -131,14 +177,14 @@ async def support_conversations_handler(request):
         return web.json_response({"error": "UserId is not in the request body"}, status=400)
     
     # Update with admin user_id
-    user_id = "00000000-0000-0000-0000-000000000000"
+    user_id = SUPPORT_USER_ID
     
     try:
         repo = request.app.get('repository', repository)
         if repo is None:
             return web.json_response({"error": "Repository not available"}, status=500)
             
-        conversations = repo.get_user_conversations(user_id)
+        conversations = await AsyncRepository(repo).get_user_conversations(user_id)
         conv_list = []
         for conv in conversations:
             conv_list.append({
@@ -154,6 +200,87 @@ async def support_conversations_handler(request):
         logger.error(f"Error fetching user conversations: {str(e)}")
         return web.json_response({"error": str(e)}, status=500)
 
+async def conversation_summaries_handler(request):
+    """
+    HTTP endpoint to get a page of the user's conversations, most recently
+    active first, each with a last message preview and the user's unread count.
+
+    Expects a JSON body with:
+        - UserId (str)
+        - PageSize (int, optional)
+        - Cursor (str, optional): NextCursor from the previous page
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return web.json_response({"error": "Invalid JSON body"}, status=400)
+
+    user_id = data.get("UserId")
+    if not user_id:
+        return web.json_response({"error": "UserId is not in the request body"}, status=400)
+
+    return await _conversation_summaries(request, user_id, data)
+
+async def support_conversation_summaries_handler(request):
+    """
+    HTTP endpoint to get a page of the support account's conversations,
+    with the same body and response as conversation_summaries_handler.
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return web.json_response({"error": "Invalid JSON body"}, status=400)
+
+    if not data.get("UserId"):
+        return web.json_response({"error": "UserId is not in the request body"}, status=400)
+
+    return await _conversation_summaries(request, SUPPORT_USER_ID, data)
+
+async def _conversation_summaries(request, user_id, data):
+    try:
+        page_size = max(1, min(int(data.get("PageSize") or CONVERSATION_PAGE_SIZE), CONVERSATION_PAGE_SIZE_MAX))
+        user_uuid = uuid.UUID(str(user_id))
+    except (TypeError, ValueError):
+        return web.json_response({"error": "Invalid UserId or PageSize"}, status=400)
+
+    try:
+        repo = request.app.get('repository', repository)
+        if repo is None:
+            return web.json_response({"error": "Repository not available"}, status=500)
+
+        # One extra row tells us whether there is another page
+        rows = await AsyncRepository(repo).get_conversation_summaries(user_uuid, limit=page_size + 1, before=data.get("Cursor"))
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error fetching conversation summaries: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+    page = rows[:page_size]
+    conv_list = []
+    for conv, participant in page:
+        conv_list.append({
+            "ConversationId": str(conv.ConversationId),
+            "Type": conv.Type,
+            "CreateDate": conv.CreateDate.isoformat(),
+            "UpdateDate": conv.UpdateDate.isoformat(),
+            "Name": conv.Name,
+            "UserId": str(user_uuid),
+            "LastActivity": participant.LastActivityAt.isoformat(),
+            "LastMessage": {
+                "Preview": conv.LastMessagePreview,
+                "SenderId": str(conv.LastMessageSenderId) if conv.LastMessageSenderId else None,
+                "Timestamp": conv.LastMessageAt.isoformat()
+            } if conv.LastMessageAt else None,
+            "UnreadCount": participant.UnreadCount or 0
+        })
+
+    next_cursor = None
+    if len(rows) > page_size:
+        _, last = page[-1]
+        next_cursor = encode_cursor(last.LastActivityAt, last.ConversationId)
+
+    return web.json_response({"conversations": conv_list, "NextCursor": next_cursor})
 
 async def create_conversation_handler(request):
     """
@@ -199,22 +326,19 @@ async def create_conversation_handler(request):
         if repo is None:
             return web.json_response({"error": "Repository not available"}, status=500)
         
-        existing_convos = repo.get_user_conversations(user_id)
-        for conv in existing_convos:
-            conv_participant_ids = {p.UserId for p in conv.ConversationParticipants}
-            if conv_participant_ids == set(participants):
-                print("Conversation already exists")
-                response_data = {
-                    "ConversationId": str(conv.ConversationId),
-                    "Type": conv.Type,
-                    "CreateDate": conv.CreateDate.isoformat(),
-                    "UpdateDate": conv.UpdateDate.isoformat(),
-                    "Name": conv.Name or f"Conv-{conv.ConversationId}"
-                }
-                return web.json_response(response_data)
+        conv = await AsyncRepository(repo).find_conversation_by_participants(participants)
+        if conv:
+            logger.info(f"Conversation {conv.ConversationId} already exists for these participants")
+            response_data = {
+                "ConversationId": str(conv.ConversationId),
+                "Type": conv.Type,
+                "CreateDate": conv.CreateDate.isoformat(),
+                "UpdateDate": conv.UpdateDate.isoformat(),
+                "Name": conv.Name or f"Conv-{conv.ConversationId}"
+            }
+            return web.json_response(response_data)
 
-            
-        conversation = repo.create_conversation_with_participants(conversation_type, participants, name)
+        conversation = await AsyncRepository(repo).create_conversation_with_participants(conversation_type, participants, name)
         response_data = {
             "ConversationId": str(conversation.ConversationId),
             "Type": conversation.Type,
@@ -242,7 +366,7 @@ async def websocket_handler(websocket):
             logger.debug(f"Client {client_id} headers: {dict(request_headers.items())}")
         
         # Send a welcome message
-        await websocket.send(json.dumps({
+        await message_handler.send(websocket, {
             "type": "welcome",
             "message": f"Connected to Pendo Message Service via path: {path}",
             "timestamp": datetime.now().isoformat(),
@@ -251,28 +375,15 @@ async def websocket_handler(websocket):
                 "remote": str(remote),
                 "path": path
             }
-        }))
+        })
         
-        last_heartbeat = time.time()
-        heartbeat_interval = 15
+        # Heartbeats and dead peer detection are driven by the shared scheduler
+        heartbeat_scheduler.add(websocket)
         
         while True:
-            current_time = time.time()
-            if current_time - last_heartbeat > heartbeat_interval:
-                # Send a heartbeat message to check for disconnect
-                try:
-                    await websocket.send(json.dumps({
-                        "type": "heartbeat",
-                        "timestamp": datetime.now().isoformat()
-                    }))
-                    last_heartbeat = current_time
-                except websockets.exceptions.ConnectionClosed:
-                    logger.info(f"Connection closed during heartbeat for client {client_id}")
-                    break
-            
             try:
-                # Wait for message with timeout to allow heartbeat checks
-                msg = await asyncio.wait_for(websocket.recv(), timeout=heartbeat_interval)
+                msg = await websocket.recv()
+                heartbeat_scheduler.touch(websocket)
                 logger.debug(f"Received from client {client_id}: {msg[:200]}...")
                 
                 # Process the message using message handler
@@ -280,19 +391,17 @@ async def websocket_handler(websocket):
                     await message_handler.handle_message(websocket, msg)
                 except json.JSONDecodeError:
                     logger.error(f"Invalid JSON received from client {client_id}")
-                    await websocket.send(json.dumps({
+                    await message_handler.send(websocket, {
                         "type": "error", 
                         "message": "Invalid JSON format"
-                    }))
+                    })
                 except Exception as e:
                     logger.error(f"Error processing message: {str(e)}")
-                    await websocket.send(json.dumps({
+                    await message_handler.send(websocket, {
                         "type": "error",
                         "message": "Server error processing message"
-                    }))
+                    })
                     
-            except asyncio.TimeoutError:
-                continue
             except websockets.exceptions.ConnectionClosed as e:
                 logger.info(f"Connection closed for client {client_id}: code={e.code}, reason='{e.reason}'")
                 break
@@ -301,11 +410,9 @@ async def websocket_handler(websocket):
         logger.error(traceback.format_exc())
     # Cleanup on exit
     finally:
-        # Remove user from message handler
-        for user_id, conn in list(message_handler.user_connections.items()):
-            if conn == websocket:
-                message_handler.remove_user(user_id)
-                break
+        # Remove user from message handler and heartbeat scheduler
+        heartbeat_scheduler.remove(websocket)
+        message_handler.remove_connection(websocket)
         logger.info(f"WebSocket connection ended: {client_id}")
 
 async def setup_http_server():
@@ -327,8 +434,11 @@ async def setup_http_server():
     # Register HTTP endpoints
     app.router.add_get('/', root_handler)
     app.router.add_get('/api/Message/HealthCheck', health_check)
+    app.router.add_get('/metrics', metrics_handler)
     app.router.add_post('/api/Message/UserConversation', user_conversations_handler)
     app.router.add_get('/api/Message/SupportConversation', support_conversations_handler)
+    app.router.add_post('/api/Message/ConversationSummaries', conversation_summaries_handler)
+    app.router.add_post('/api/Message/SupportConversationSummaries', support_conversation_summaries_handler)
     app.router.add_post('/api/Message/CreateConversation', create_conversation_handler)
     
     # Add CORS to all routes
@@ -356,7 +466,10 @@ async def setup_ws_server():
         close_timeout=60,
         max_size=10 * 1024 * 1024,
         max_queue=64,
+        # compression=None only turns off the library's default permessage-deflate,
+        # compression is negotiated by server_extensions() with a size threshold instead
         compression=None,
+        extensions=server_extensions(),
         logger=logger
     )
     logger.info(f"WebSocket server started on port {WS_PORT}")
@@ -368,6 +481,8 @@ async def main():
     
     try:
         # Start HTTP and WebSocket servers
+        await message_handler.start()
+        heartbeat_scheduler.start()
         await setup_http_server()
         await setup_ws_server()
         
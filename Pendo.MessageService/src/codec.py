@@ -0,0 +1,105 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+"""
+Wire codecs for the chat WebSocket protocol.
+
+Every frame uses the same message schema whatever the codec. JSON text is
+the default; clients can ask for a binary codec in their register message
+and every frame sent to them afterwards is encoded with it.
+"""
+
+class Codec(ABC):
+    """
+    Encodes message dicts to frames and decodes frames to message dicts.
+    """
+    name = None
+    binary = False
+
+    @abstractmethod
+    def encode(self, message):
+        pass
+
+    @abstractmethod
+    def decode(self, frame):
+        pass
+
+class JsonCodec(Codec):
+    name = "json"
+    binary = False
+
+    def encode(self, message):
+        return json.dumps(message)
+
+    def decode(self, frame):
+        return json.loads(frame)
+
+class MsgPackCodec(Codec):
+    """
+    MessagePack binary codec, sent as binary WebSocket frames.
+    """
+    name = "msgpack"
+    binary = True
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, frame):
+        return msgpack.unpackb(frame, raw=False)
+
+JSON = JsonCodec()
+
+# Codecs this node can speak, by name. Binary codecs depend on optional packages.
+CODECS = {JSON.name: JSON}
+if msgpack is not None:
+    CODECS[MsgPackCodec.name] = MsgPackCodec()
+
+def negotiate(requested):
+    """
+    Choose the codec for a connection from the client's preference.
+
+    Parameters:
+        requested (str | list[str] | None): Codec name, or names in order of preference
+
+    Returns:
+        Codec: The first requested codec this node supports, otherwise JSON
+    """
+    if isinstance(requested, str):
+        requested = [requested]
+    for name in requested or []:
+        codec = CODECS.get(str(name).lower())
+        if codec is not None:
+            return codec
+    if requested:
+        logger.info(f"No supported codec in {requested}, using {JSON.name}")
+    return JSON
+
+class PreparedMessage():
+    """
+    A message encoded at most once per codec, so one broadcast or history
+    response can be shared by recipients using different codecs.
+    """
+    __slots__ = ("message", "_encoded")
+
+    def __init__(self, message, json_encoding=None):
+        """
+        Parameters:
+            message (dict): Message to send
+            json_encoding (str): Optional ready-made JSON encoding of the message
+        """
+        self.message = message
+        self._encoded = {JSON.name: json_encoding} if json_encoding is not None else {}
+
+    def encode(self, codec):
+        encoded = self._encoded.get(codec.name)
+        if encoded is None:
+            encoded = self._encoded[codec.name] = codec.encode(self.message)
+        return encoded
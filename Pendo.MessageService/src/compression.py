@@ -0,0 +1,76 @@
+import os
+from websockets.frames import CTRL_OPCODES, OP_CONT
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+
+"""
+permessage-deflate with a size threshold.
+
+Most chat frames are a few hundred bytes, where deflate costs CPU and
+saves little, while history responses are large and repetitive JSON.
+Messages smaller than the threshold are sent uncompressed (RSV1 clear),
+which RFC 7692 allows on a connection that negotiated the extension.
+"""
+
+# Outgoing messages smaller than this many bytes are not compressed
+WS_COMPRESSION_THRESHOLD = int(os.environ.get("WS_COMPRESSION_THRESHOLD", "1024"))
+
+# Smaller windows than zlib's default keep per-connection memory down
+WS_COMPRESSION_WINDOW_BITS = int(os.environ.get("WS_COMPRESSION_WINDOW_BITS", "12"))
+WS_COMPRESSION_LEVEL = int(os.environ.get("WS_COMPRESSION_LEVEL", "6"))
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """
+    PerMessageDeflate that leaves messages below a size threshold uncompressed.
+    """
+
+    def __init__(self, *args, threshold=WS_COMPRESSION_THRESHOLD, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+
+    def encode(self, frame):
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+
+        # Only unfragmented messages are measured, every frame of a fragmented message is compressed
+        if frame.opcode is not OP_CONT and frame.fin and len(frame.data) < self.threshold:
+            return frame
+        return super().encode(frame)
+
+class ThresholdPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+    """
+    Server-side permessage-deflate negotiation producing ThresholdPerMessageDeflate.
+    """
+
+    def __init__(self, threshold=WS_COMPRESSION_THRESHOLD, **kwargs):
+        super().__init__(**kwargs)
+        self.threshold = threshold
+
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            threshold=self.threshold
+        )
+
+def server_extensions(threshold=WS_COMPRESSION_THRESHOLD):
+    """
+    Extension factories for the WebSocket server.
+
+    Parameters:
+        threshold (int): Smallest message size in bytes to compress, negative to disable compression
+
+    Returns:
+        list: Server extension factories to pass to websockets.serve
+    """
+    if threshold < 0:
+        return []
+    return [ThresholdPerMessageDeflateFactory(
+        threshold=threshold,
+        server_max_window_bits=WS_COMPRESSION_WINDOW_BITS,
+        client_max_window_bits=WS_COMPRESSION_WINDOW_BITS,
+        compress_settings={"level": WS_COMPRESSION_LEVEL, "memLevel": 5}
+    )]
@@ -0,0 +1,184 @@
+import logging
+import os
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for cached messages
+CACHE_MAX_CONVERSATIONS = int(os.environ.get("MESSAGE_CACHE_MAX_CONVERSATIONS", "1000"))
+CACHE_MESSAGES_PER_CONVERSATION = int(os.environ.get("MESSAGE_CACHE_MESSAGES_PER_CONVERSATION", "100"))
+CACHE_MAX_MESSAGES = int(os.environ.get("MESSAGE_CACHE_MAX_MESSAGES", "50000"))
+
+class _CachedConversation():
+    """
+    Ring buffer of the most recent messages for one conversation, oldest first.
+    """
+    __slots__ = ("messages", "complete", "truncated")
+
+    def __init__(self, capacity, complete):
+        self.messages = deque(maxlen=capacity)
+        # complete: the buffer holds every recent message, not just ones seen live on this node
+        self.complete = complete
+        # truncated: older messages exist that are not in the buffer
+        self.truncated = False
+
+class ConversationCache():
+    """
+    Bounded in-memory cache of recent messages per conversation.
+
+    Each conversation keeps a fixed-size ring buffer of its latest messages and
+    conversations are evicted least recently used first once either the
+    conversation or total message budget is exceeded.
+
+    When backed by a database the cache only answers history lookups for
+    conversations that were seeded from the database, since live messages
+    alone do not prove nothing older exists. Without a database the cache is
+    the source of truth and every conversation is considered complete.
+    """
+
+    def __init__(self,
+                 max_conversations=CACHE_MAX_CONVERSATIONS,
+                 messages_per_conversation=CACHE_MESSAGES_PER_CONVERSATION,
+                 max_messages=CACHE_MAX_MESSAGES,
+                 authoritative=False):
+        """
+        Parameters:
+            max_conversations (int): Maximum number of cached conversations
+            messages_per_conversation (int): Ring buffer size per conversation
+            max_messages (int): Maximum number of messages cached across all conversations
+            authoritative (bool): True when there is no database behind the cache
+        """
+        self.max_conversations = max_conversations
+        self.messages_per_conversation = messages_per_conversation
+        self.max_messages = max_messages
+        self.authoritative = authoritative
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conversations = OrderedDict()
+        self._message_count = 0
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def __contains__(self, conversation_id):
+        return conversation_id in self._conversations
+
+    def __getitem__(self, conversation_id):
+        return self._conversations[conversation_id].messages
+
+    def __setitem__(self, conversation_id, messages):
+        self.seed(conversation_id, messages)
+
+    def get(self, conversation_id, default=None):
+        entry = self._conversations.get(conversation_id)
+        return entry.messages if entry is not None else default
+
+    @property
+    def message_count(self):
+        return self._message_count
+
+    def append(self, conversation_id, message):
+        """
+        Append a live message to a conversation, creating its buffer if needed.
+
+        Parameters:
+            conversation_id (str): Conversation identifier
+            message (dict): Message in wire format
+
+        Returns:
+            None
+        """
+        entry = self._conversations.get(conversation_id)
+        if entry is None:
+            entry = self._create(conversation_id, complete=self.authoritative)
+        else:
+            self._conversations.move_to_end(conversation_id)
+
+        self._push(entry, message)
+        self._enforce_budget()
+
+    def seed(self, conversation_id, messages, truncated=False):
+        """
+        Replace a conversation's buffer with messages loaded from the database,
+        keeping any live messages that arrived after the load was issued.
+
+        Parameters:
+            conversation_id (str): Conversation identifier
+            messages (list[dict]): Messages in wire format, oldest first
+            truncated (bool): True if older messages exist that were not loaded
+
+        Returns:
+            list[dict]: The cached messages, oldest first
+        """
+        previous = self._conversations.get(conversation_id)
+        loaded_ids = {m.get("id") for m in messages if m.get("id") is not None}
+        live = [m for m in previous.messages if m.get("id") not in loaded_ids] if previous else []
+
+        self.invalidate(conversation_id)
+        entry = self._create(conversation_id, complete=True)
+        for message in list(messages) + live:
+            self._push(entry, message)
+        entry.truncated = entry.truncated or truncated
+
+        self._enforce_budget()
+        return list(entry.messages)
+
+    def lookup(self, conversation_id, limit):
+        """
+        Return the cached messages for a conversation if the cache can answer a
+        request for its latest `limit` messages without a database round trip.
+
+        Parameters:
+            conversation_id (str): Conversation identifier
+            limit (int): Number of latest messages the caller needs
+
+        Returns:
+            list[dict] | None: Cached messages oldest first, or None on a miss
+        """
+        entry = self._conversations.get(conversation_id)
+        if entry is not None and entry.complete and (not entry.truncated or len(entry.messages) >= limit):
+            self.hits += 1
+            self._conversations.move_to_end(conversation_id)
+            return list(entry.messages)
+
+        self.misses += 1
+        return None
+
+    def is_truncated(self, conversation_id):
+        """
+        Returns:
+            bool: True if older messages exist beyond the cached window
+        """
+        entry = self._conversations.get(conversation_id)
+        return entry.truncated if entry is not None else False
+
+    def invalidate(self, conversation_id):
+        """
+        Drop a conversation from the cache.
+        """
+        entry = self._conversations.pop(conversation_id, None)
+        if entry is not None:
+            self._message_count -= len(entry.messages)
+
+    def _create(self, conversation_id, complete):
+        entry = _CachedConversation(self.messages_per_conversation, complete)
+        self._conversations[conversation_id] = entry
+        return entry
+
+    def _push(self, entry, message):
+        if len(entry.messages) == entry.messages.maxlen:
+            entry.truncated = True
+        else:
+            self._message_count += 1
+        entry.messages.append(message)
+
+    def _enforce_budget(self):
+        while self._conversations and (len(self._conversations) > self.max_conversations
+                                       or self._message_count > self.max_messages):
+            conversation_id, entry = self._conversations.popitem(last=False)
+            self._message_count -= len(entry.messages)
+            self.evictions += 1
+            logger.debug(f"Evicted conversation {conversation_id} from message cache")
@@ -0,0 +1,82 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .PendoDatabaseProvider import DB_POOL_SIZE
+from ..metrics import REPOSITORY_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+def get_db_executor():
+    """
+    Returns the shared, bounded thread pool used for blocking database calls.
+    The pool is sized to match the SQLAlchemy connection pool so a worker
+    never waits on a connection while holding a thread.
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="pendo-db")
+        logger.info(f"Database executor initialised with {DB_POOL_SIZE} workers")
+
+    return _executor
+
+def shutdown_db_executor(wait=True):
+    """
+    Shuts down the shared database executor, waiting for in-flight calls by default.
+    """
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+class AsyncRepository():
+    """
+    Async facade over a synchronous repository.
+
+    Every repository method is exposed as a coroutine that runs the original
+    call on the shared database executor, so database latency never blocks
+    the event loop serving the WebSocket and HTTP servers.
+    """
+
+    def __init__(self, repository, executor=None):
+        self.repository = repository
+        self._executor = executor
+
+    @property
+    def executor(self):
+        return self._executor or get_db_executor()
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking callable on the database executor and await its result.
+
+        Parameters:
+            func (callable): Blocking function to run
+            *args, **kwargs: Arguments passed to the function
+
+        Returns:
+            The function's return value
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            method = getattr(func, "__name__", "call")
+            REPOSITORY_CALL_SECONDS.labels(method=method).observe(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        attr = getattr(self.repository, name)
+        if not callable(attr):
+            return attr
+
+        async def _call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        _call.__name__ = name
+        return _call
@@ -1,12 +1,65 @@
 from .PendoDatabase import *
 from sqlalchemy.orm import joinedload, with_loader_criteria
 from .PendoDatabaseProvider import get_db
-from sqlalchemy import desc
+from sqlalchemy import bindparam, case, desc, func, insert, select, update, and_, or_
 import uuid
 import datetime
+import base64
+import hashlib
+import json
+from collections import Counter
 from .PendoDatabase import User
 from .PendoDatabase import ConversationParticipants
 
+def encode_cursor(create_date, message_id):
+    """
+    Encode a message's position as an opaque history cursor.
+    """
+    raw = f"{create_date.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decode a history cursor into (CreateDate, MessageId).
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        create_date, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(create_date), uuid.UUID(message_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+# Longest last-message preview stored on a conversation
+MESSAGE_PREVIEW_LENGTH = 200
+
+def message_preview(content):
+    """
+    Plain-text preview of stored message content, for conversation summaries.
+    """
+    text_value = content
+    try:
+        content_obj = json.loads(content)
+        if isinstance(content_obj, dict):
+            text_value = content_obj.get("text", content_obj.get("content", content))
+    except (json.JSONDecodeError, TypeError):
+        pass
+    if text_value is None:
+        return None
+    return str(text_value)[:MESSAGE_PREVIEW_LENGTH]
+
+def participant_set_key(participants):
+    """
+    Canonical key for a set of participants, independent of order and duplicates.
+
+    Parameters:
+        participants (iterable): User ids as UUIDs or strings
+
+    Returns:
+        str: SHA-256 hex digest of the sorted, comma separated lower-case ids
+    """
+    ids = sorted({str(uuid.UUID(str(p))) for p in participants})
+    return hashlib.sha256(",".join(ids).encode()).hexdigest()
+
 class MessageRepository():
     """
     Responsible for handling all database operations related to messages.
@@ -27,6 +80,12 @@ class MessageRepository():
                 IsDeleted=is_deleted
             )
             db_session.add(message)
+            self._update_summaries(db_session, [{
+                "ConversationId": conversation_id,
+                "SenderId": sender_id,
+                "Content": content,
+                "CreateDate": message.CreateDate
+            }])
             db_session.commit()
             return message
         except Exception as e:
@@ -35,13 +94,223 @@ class MessageRepository():
         finally:
             db_session.close()
 
-    def get_messages_by_conversation_id(self, conversation_id, limit=100, skip=0):
+    def save_messages(self, messages):
+        """
+        Bulk insert pre-built message rows in a single transaction.
+        Used by the write-behind MessageWriter to batch many chat messages into one commit.
+        """
+        if not messages:
+            return 0
+
+        db_session = next(get_db())
+        try:
+            db_session.execute(insert(Messages), messages)
+            self._update_summaries(db_session, messages)
+            db_session.commit()
+            return len(messages)
+        except Exception as e:
+            db_session.rollback()
+            raise e
+        finally:
+            db_session.close()
+
+    @staticmethod
+    def _update_summaries(db_session, messages):
+        """
+        Fold newly written messages into the conversation summaries: the last
+        message preview on each conversation, and the last activity time and
+        unread count on each of its participants. Two statements per conversation.
+
+        Parameters:
+            db_session (Session): Session the messages are being written in
+            messages (list[dict]): Message rows, in the order they were sent
+        """
+        by_conversation = {}
+        for message in messages:
+            by_conversation.setdefault(message["ConversationId"], []).append(message)
+
+        for conversation_id, rows in by_conversation.items():
+            last = rows[-1]
+            db_session.execute(
+                update(Conversations)
+                .where(Conversations.ConversationId == conversation_id)
+                .values(
+                    UpdateDate=last["CreateDate"],
+                    LastMessageAt=last["CreateDate"],
+                    LastMessagePreview=message_preview(last["Content"]),
+                    LastMessageSenderId=last["SenderId"]
+                )
+            )
+
+            # Senders do not get unread counts for their own messages
+            sent = Counter(row["SenderId"] for row in rows)
+            unread = case(
+                {sender: len(rows) - count for sender, count in sent.items()},
+                value=ConversationParticipants.UserId,
+                else_=len(rows)
+            )
+            db_session.execute(
+                update(ConversationParticipants)
+                .where(ConversationParticipants.ConversationId == conversation_id)
+                .where(ConversationParticipants.LeftAt == None)
+                .values(
+                    UnreadCount=ConversationParticipants.UnreadCount + unread,
+                    LastActivityAt=last["CreateDate"]
+                )
+            )
+
+    def mark_conversations_read(self, reads):
+        """
+        Clear the unread count of each (conversation, user) pair in one statement.
+        Pairs that are not participants are ignored.
+
+        Parameters:
+            reads (iterable): (conversation_id, user_id) pairs as UUIDs
+        """
+        now = datetime.datetime.utcnow()
+        rows = [{"conversation_id": conversation_id, "user_id": user_id, "read_at": now} for conversation_id, user_id in reads]
+        if not rows:
+            return 0
+
+        participants = ConversationParticipants.__table__
+        db_session = next(get_db())
+        try:
+            db_session.execute(
+                update(participants)
+                .where(participants.c.ConversationId == bindparam("conversation_id"))
+                .where(participants.c.UserId == bindparam("user_id"))
+                .values(UnreadCount=0, LastReadAt=bindparam("read_at")),
+                rows
+            )
+            db_session.commit()
+            return len(rows)
+        except Exception as e:
+            db_session.rollback()
+            raise e
+        finally:
+            db_session.close()
+
+    def get_conversation_summaries(self, user_id, limit=20, before=None):
+        """
+        A page of the user's conversations, most recently active first, with
+        the user's participant row holding their unread count.
+
+        Parameters:
+            user_id (str | UUID): User whose conversations to list
+            limit (int): Maximum number of conversations to return
+            before (str): Cursor of the last conversation on the previous page
+
+        Returns:
+            list[tuple[Conversations, ConversationParticipants]]: The page
+        """
+        if not isinstance(user_id, uuid.UUID):
+            user_id = uuid.UUID(str(user_id))
+
+        db_session = next(get_db())
+        try:
+            query = db_session.query(Conversations, ConversationParticipants)\
+                .join(ConversationParticipants, ConversationParticipants.ConversationId == Conversations.ConversationId)\
+                .filter(ConversationParticipants.UserId == user_id)\
+                .filter(ConversationParticipants.LeftAt == None)
+
+            if before:
+                last_activity, conversation_id = decode_cursor(before)
+                query = query.filter(or_(
+                    ConversationParticipants.LastActivityAt < last_activity,
+                    and_(
+                        ConversationParticipants.LastActivityAt == last_activity,
+                        ConversationParticipants.ConversationId < conversation_id
+                    )
+                ))
+
+            return query.order_by(
+                ConversationParticipants.LastActivityAt.desc(),
+                ConversationParticipants.ConversationId.desc()
+            ).limit(limit).all()
+        finally:
+            db_session.close()
+
+    def get_messages_by_conversation_id(self, conversation_id, limit=100, skip=0, before=None, after=None):
+        """
+        Returns a page of messages for a conversation, newest first.
+
+        Pages are keyset paginated on (CreateDate, MessageId), backed by the
+        IX_Messages_ConversationId_CreateDate index:
+          - before: (CreateDate, MessageId) position, returns the messages immediately older than it
+          - after: (CreateDate, MessageId | None) position, returns the messages immediately newer
+            than it. A MessageId of None filters on CreateDate alone.
+        """
+        if not isinstance(conversation_id, uuid.UUID):
+            conversation_id = uuid.UUID(str(conversation_id))
+
+        db_session = next(get_db())
+        try:
+            query = db_session.query(Messages)\
+                .filter(Messages.ConversationId == conversation_id)
+
+            if after is not None:
+                after_date, after_id = after
+                if after_id is None:
+                    query = query.filter(Messages.CreateDate > after_date)
+                else:
+                    query = query.filter(or_(
+                        Messages.CreateDate > after_date,
+                        and_(Messages.CreateDate == after_date, Messages.MessageId > after_id)
+                    ))
+
+            if before is not None:
+                before_date, before_id = before
+                query = query.filter(or_(
+                    Messages.CreateDate < before_date,
+                    and_(Messages.CreateDate == before_date, Messages.MessageId < before_id)
+                ))
+
+            if after is not None and before is None:
+                # Walk forwards from the cursor, then present newest first
+                messages = query.order_by(Messages.CreateDate, Messages.MessageId)\
+                    .offset(skip)\
+                    .limit(limit)\
+                    .all()
+                return messages[::-1]
+
+            messages = query.order_by(desc(Messages.CreateDate), desc(Messages.MessageId))\
+                .offset(skip)\
+                .limit(limit)\
+                .all()
+            return messages
+        finally:
+            db_session.close()
+
+    def get_last_sequence_number(self, conversation_id):
+        """
+        Returns the highest message sequence number in a conversation, or 0 if none are numbered.
+        """
+        if not isinstance(conversation_id, uuid.UUID):
+            conversation_id = uuid.UUID(str(conversation_id))
+
+        db_session = next(get_db())
+        try:
+            last = db_session.query(func.max(Messages.SequenceNumber))\
+                .filter(Messages.ConversationId == conversation_id)\
+                .scalar()
+            return last or 0
+        finally:
+            db_session.close()
+
+    def get_messages_since_sequence(self, conversation_id, sequence_number, limit=100):
+        """
+        Returns up to `limit` messages numbered after `sequence_number`, oldest first.
+        Backed by the IX_Messages_ConversationId_SequenceNumber index.
+        """
+        if not isinstance(conversation_id, uuid.UUID):
+            conversation_id = uuid.UUID(str(conversation_id))
+
         db_session = next(get_db())
         try:
             messages = db_session.query(Messages)\
                 .filter(Messages.ConversationId == conversation_id)\
-                .order_by(desc(Messages.CreateDate))\
-                .offset(skip)\
+                .filter(Messages.SequenceNumber > sequence_number)\
+                .order_by(Messages.SequenceNumber)\
                 .limit(limit)\
                 .all()
             return messages
@@ -56,7 +325,7 @@ class MessageRepository():
         finally:
             db_session.close()
 
-    def create_conversation(self, conversation_type, name=None):
+    def create_conversation(self, conversation_type, name=None, participant_set_key=None):
         db_session = next(get_db())
         try:
             conversation = Conversations(
@@ -64,7 +333,8 @@ class MessageRepository():
                 Type=conversation_type,
                 CreateDate=datetime.datetime.utcnow(),
                 UpdateDate=datetime.datetime.utcnow(),
-                Name=name
+                Name=name,
+                ParticipantSetKey=participant_set_key
             )
             db_session.add(conversation)
             db_session.commit()
@@ -103,9 +373,23 @@ class MessageRepository():
             participant = ConversationParticipants(
                 ConversationId=conversation_id,
                 UserId=user_id,
-                JoinedAt=datetime.datetime.utcnow()
+                JoinedAt=datetime.datetime.utcnow(),
+                # Joining does not move the conversation in other members' lists
+                LastActivityAt=select(Conversations.UpdateDate)
+                    .where(Conversations.ConversationId == conversation_id)
+                    .scalar_subquery(),
+                UnreadCount=0
             )
             db_session.add(participant)
+
+            # The participant set changed, keep the conversation's dedup key in step
+            member_ids = [row.UserId for row in db_session.query(ConversationParticipants.UserId).filter(
+                ConversationParticipants.ConversationId == conversation_id,
+                ConversationParticipants.LeftAt == None
+            )]
+            db_session.query(Conversations)\
+                .filter(Conversations.ConversationId == conversation_id)\
+                .update({Conversations.ParticipantSetKey: participant_set_key(member_ids + [user_id])}, synchronize_session=False)
             db_session.commit()
             db_session.refresh(participant)
             return participant
@@ -116,6 +400,9 @@ class MessageRepository():
             db_session.close()
 
     def get_user_conversations(self, user_id):
+        if not isinstance(user_id, uuid.UUID):
+            user_id = uuid.UUID(str(user_id))
+
         db_session = next(get_db())
         try:
             conversations = db_session.query(Conversations)\
@@ -129,6 +416,34 @@ class MessageRepository():
         finally:
             db_session.close()
 
+    def find_conversation_by_participants(self, participants):
+        """
+        Find a conversation whose active participants are exactly the given users.
+
+        Parameters:
+            participants (iterable): User ids as UUIDs or strings
+
+        Returns:
+            Conversations: The most recently updated match, otherwise None
+        """
+        expected = {uuid.UUID(str(p)) for p in participants}
+
+        db_session = next(get_db())
+        try:
+            candidates = db_session.query(Conversations)\
+                .options(joinedload(Conversations.ConversationParticipants))\
+                .filter(Conversations.ParticipantSetKey == participant_set_key(expected))\
+                .order_by(Conversations.UpdateDate.desc())\
+                .all()
+            # The key is a hash, confirm the participant set before trusting it
+            for conversation in candidates:
+                members = {p.UserId for p in conversation.ConversationParticipants if p.LeftAt is None}
+                if members == expected:
+                    return conversation
+            return None
+        finally:
+            db_session.close()
+
     def get_user_by_id(self, user_id):
         db_session = next(get_db())
         try:
@@ -140,15 +455,7 @@ class MessageRepository():
     def create_user_stub(self, user_id):
         db_session = next(get_db())
         try:
-            user = User(
-                UserId=user_id,
-                Email=f"user_{user_id}@example.com",
-                UserTypeId=1,  # Default user type
-                CreateDate=datetime.datetime.utcnow(),
-                UpdateDate=datetime.datetime.utcnow(),
-                FirstName="",
-                LastName=""
-            )
+            user = self._user_stub(user_id, datetime.datetime.utcnow())
             db_session.add(user)
             db_session.commit()
             db_session.refresh(user)
@@ -159,20 +466,58 @@ class MessageRepository():
         finally:
             db_session.close()
 
+    @staticmethod
+    def _user_stub(user_id, now):
+        return User(
+            UserId=user_id,
+            Email=f"user_{user_id}@example.com",
+            UserTypeId=1,  # Default user type
+            CreateDate=now,
+            UpdateDate=now,
+            FirstName="",
+            LastName=""
+        )
+
     def create_conversation_with_participants(self, conversation_type, participants, name=None):
-        conversation = self.create_conversation(conversation_type, name)
-        added_users = set()
-        for participant in participants:
-            participant_str = str(participant)
-            if participant_str in added_users:
-                continue
-            if not isinstance(participant, uuid.UUID):
-                participant_id = uuid.UUID(str(participant))
-            else:
-                participant_id = participant
-            user = self.get_user_by_id(participant_id)
-            if not user:
-                user = self.create_user_stub(participant_id)
-            self.add_user_to_conversation(conversation.ConversationId, participant_id)
-            added_users.add(participant_str)
-        return conversation
\ No newline at end of file
+        """
+        Create a conversation with its participants in one transaction.
+        Participants without a user record get a stub user.
+
+        Parameters:
+            conversation_type (str): Conversation type
+            participants (iterable): User ids as UUIDs or strings, duplicates are ignored
+            name (str): Optional conversation name
+
+        Returns:
+            Conversations: The created conversation
+        """
+        participant_ids = list(dict.fromkeys(uuid.UUID(str(p)) for p in participants))
+        now = datetime.datetime.utcnow()
+
+        db_session = next(get_db())
+        try:
+            existing_users = {row.UserId for row in db_session.query(User.UserId).filter(User.UserId.in_(participant_ids))}
+
+            conversation = Conversations(
+                ConversationId=uuid.uuid4(),
+                Type=conversation_type,
+                CreateDate=now,
+                UpdateDate=now,
+                Name=name,
+                ParticipantSetKey=participant_set_key(participant_ids)
+            )
+            db_session.add(conversation)
+            db_session.add_all([self._user_stub(user_id, now) for user_id in participant_ids if user_id not in existing_users])
+            db_session.add_all([
+                ConversationParticipants(ConversationId=conversation.ConversationId, UserId=user_id, JoinedAt=now, LastActivityAt=now, UnreadCount=0)
+                for user_id in participant_ids
+            ])
+            db_session.commit()
+
+            db_session.refresh(conversation)
+            return conversation
+        except Exception as e:
+            db_session.rollback()
+            raise e
+        finally:
+            db_session.close()
\ No newline at end of file
@@ -0,0 +1,186 @@
+import asyncio
+import datetime
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = int(os.environ.get("MESSAGE_FLUSH_BATCH_SIZE", "200"))
+FLUSH_INTERVAL_MS = int(os.environ.get("MESSAGE_FLUSH_INTERVAL_MS", "50"))
+
+class MessageWriter():
+    """
+    Write-behind persistence stage for chat messages.
+
+    Messages are queued in memory and written to the database in bulk
+    multi-row inserts, either when the queue reaches the batch size or when
+    the flush interval elapses, whichever comes first. Flushes are serialised
+    so rows are committed in the order they were enqueued.
+
+    Read markers are coalesced the same way and written after the messages
+    of the same flush, so a reader's unread count ends at zero.
+    """
+
+    def __init__(self, db, batch_size=FLUSH_BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS):
+        """
+        Parameters:
+            db (AsyncRepository): Async repository used to write batches
+            batch_size (int): Number of queued messages that triggers an immediate flush
+            flush_interval_ms (int): Maximum time a message waits before being flushed
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+
+        self._pending = []
+        # Rows queued or being written per conversation, until their batch has been attempted
+        self._unwritten = {}
+        self._reads = {}
+        self._timer = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    @property
+    def pending_reads(self):
+        return len(self._reads)
+
+    def has_unwritten(self, conversation_id):
+        """
+        Returns:
+            bool: True if rows of the conversation are queued or being written
+        """
+        try:
+            return self._to_uuid(conversation_id) in self._unwritten
+        except ValueError:
+            return False
+
+    def enqueue(self, conversation_id, sender_id, message_type, content, is_deleted=False, sequence_number=None):
+        """
+        Queue a message for persistence. Identifiers are validated up front so
+        malformed messages are rejected before they reach a batch.
+
+        Parameters:
+            conversation_id (str | UUID): Conversation the message belongs to
+            sender_id (str | UUID): User who sent the message
+            message_type (str): Message type
+            content (str): Serialised message content
+            is_deleted (bool): Whether the message is soft deleted
+            sequence_number (int): Position of the message within its conversation
+
+        Returns:
+            dict: The queued message row
+        """
+        row = {
+            "MessageId": uuid.uuid4(),
+            "ConversationId": self._to_uuid(conversation_id),
+            "SenderId": self._to_uuid(sender_id),
+            "MessageType": message_type,
+            "Content": content,
+            "CreateDate": datetime.datetime.utcnow(),
+            "IsDeleted": is_deleted,
+            "SequenceNumber": sequence_number
+        }
+        self._pending.append(row)
+        self._unwritten[row["ConversationId"]] = self._unwritten.get(row["ConversationId"], 0) + 1
+
+        if len(self._pending) >= self.batch_size:
+            self._schedule_flush()
+        else:
+            self._start_timer()
+
+        return row
+
+    def mark_read(self, conversation_id, user_id):
+        """
+        Queue clearing a user's unread count for a conversation.
+
+        Parameters:
+            conversation_id (str | UUID): Conversation the user has read
+            user_id (str | UUID): User who read it
+        """
+        self._reads[(self._to_uuid(conversation_id), self._to_uuid(user_id))] = None
+        self._start_timer()
+
+    def _start_timer(self):
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.flush_interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """
+        Write all queued messages, then queued read markers, to the database.
+
+        Returns:
+            int: Number of messages written
+        """
+        async with self._lock:
+            written = 0
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                written += await self._write_batch(batch)
+
+            if self._reads:
+                reads, self._reads = list(self._reads), {}
+                try:
+                    await self.db.mark_conversations_read(reads)
+                except Exception as e:
+                    logger.error(f"Dropping {len(reads)} read markers after failed update: {str(e)}")
+            return written
+
+    async def _write_batch(self, batch):
+        try:
+            return await self._save_batch(batch)
+        finally:
+            for row in batch:
+                remaining = self._unwritten.pop(row["ConversationId"]) - 1
+                if remaining:
+                    self._unwritten[row["ConversationId"]] = remaining
+
+    async def _save_batch(self, batch):
+        try:
+            await self.db.save_messages(batch)
+            logger.debug(f"Flushed {len(batch)} messages")
+            return len(batch)
+        except Exception as e:
+            logger.error(f"Bulk message insert failed, retrying rows individually: {str(e)}")
+
+        # Retry row by row so a single bad message does not lose the whole batch
+        written = 0
+        for row in batch:
+            try:
+                await self.db.save_messages([row])
+                written += 1
+            except Exception as e:
+                logger.error(f"Dropping message {row['MessageId']} after failed insert: {str(e)}")
+        return written
+
+    async def close(self):
+        """
+        Stop the flush timer and write any remaining messages.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+
+        await self.flush()
+
+    @staticmethod
+    def _to_uuid(value):
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
@@ -1,6 +1,6 @@
 from typing import List
 
-from sqlalchemy import Boolean, CHAR, Column, DECIMAL, Float, ForeignKeyConstraint, Identity, Index, Integer, PrimaryKeyConstraint, Unicode, Uuid, text
+from sqlalchemy import BigInteger, Boolean, CHAR, Column, DECIMAL, Float, ForeignKeyConstraint, Identity, Index, Integer, PrimaryKeyConstraint, Unicode, Uuid, text
 from sqlalchemy.dialects.mssql import DATETIME2
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column, relationship
 from sqlalchemy.orm.base import Mapped
@@ -42,6 +42,7 @@ class Conversations(Base):
     __tablename__ = 'Conversations'
     __table_args__ = (
         PrimaryKeyConstraint('ConversationId', name='PK__Conversa__C050D877485655A0'),
+        Index('IX_Conversations_ParticipantSetKey', 'ParticipantSetKey'),
         {'schema': 'messaging'}
     )
 
@@ -50,6 +51,10 @@ class Conversations(Base):
     CreateDate = mapped_column(DATETIME2, nullable=False, server_default=text('(getutcdate())'))
     UpdateDate = mapped_column(DATETIME2, nullable=False, server_default=text('(getutcdate())'))
     Name = mapped_column(Unicode(100, 'SQL_Latin1_General_CP1_CI_AS'))
+    ParticipantSetKey = mapped_column(CHAR(64, 'SQL_Latin1_General_CP1_CI_AS'))
+    LastMessageAt = mapped_column(DATETIME2)
+    LastMessagePreview = mapped_column(Unicode(200, 'SQL_Latin1_General_CP1_CI_AS'))
+    LastMessageSenderId = mapped_column(Uuid)
 
     ConversationParticipants: Mapped[List['ConversationParticipants']] = relationship('ConversationParticipants', uselist=True, back_populates='Conversations_')
     Messages: Mapped[List['Messages']] = relationship('Messages', uselist=True, back_populates='Conversations_')
@@ -192,6 +197,7 @@ class ConversationParticipants(Base):
         ForeignKeyConstraint(['UserId'], ['identity.User.UserId'], name='FK_ConversationParticipants_Users'),
         PrimaryKeyConstraint('ConversationId', 'UserId', name='PK__Conversa__112854B398DE4EE1'),
         Index('IX_ConversationParticipants_UserId', 'UserId'),
+        Index('IX_ConversationParticipants_UserId_LastActivityAt', 'UserId', 'LastActivityAt', 'ConversationId'),
         {'schema': 'messaging'}
     )
 
@@ -199,6 +205,9 @@ class ConversationParticipants(Base):
     UserId = mapped_column(Uuid, nullable=False)
     JoinedAt = mapped_column(DATETIME2, nullable=False, server_default=text('(getutcdate())'))
     LeftAt = mapped_column(DATETIME2)
+    LastActivityAt = mapped_column(DATETIME2, nullable=False, server_default=text('(getutcdate())'))
+    UnreadCount = mapped_column(Integer, nullable=False, server_default=text('((0))'))
+    LastReadAt = mapped_column(DATETIME2)
 
     Conversations_: Mapped['Conversations'] = relationship('Conversations', back_populates='ConversationParticipants')
     User_: Mapped['User'] = relationship('User', back_populates='ConversationParticipants')
@@ -210,7 +219,8 @@ class Messages(Base):
         ForeignKeyConstraint(['ConversationId'], ['messaging.Conversations.ConversationId'], ondelete='CASCADE', name='FK_Messages_Conversations'),
         ForeignKeyConstraint(['SenderId'], ['identity.User.UserId'], name='FK_Messages_Sender'),
         PrimaryKeyConstraint('MessageId', name='PK__Messages__C87C0C9CC7F08CF7'),
-        Index('IX_Messages_ConversationId', 'ConversationId'),
+        Index('IX_Messages_ConversationId_CreateDate', 'ConversationId', 'CreateDate', 'MessageId'),
+        Index('IX_Messages_ConversationId_SequenceNumber', 'ConversationId', 'SequenceNumber'),
         Index('IX_Messages_SenderId', 'SenderId'),
         {'schema': 'messaging'}
     )
@@ -223,6 +233,7 @@ class Messages(Base):
     CreateDate = mapped_column(DATETIME2, nullable=False, server_default=text('(getutcdate())'))
     IsDeleted = mapped_column(Boolean, nullable=False, server_default=text('((0))'))
     EditedAt = mapped_column(DATETIME2)
+    SequenceNumber = mapped_column(BigInteger)
 
     Conversations_: Mapped['Conversations'] = relationship('Conversations', back_populates='Messages')
     User_: Mapped['User'] = relationship('User', back_populates='Messages')
@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import StaticPool
 import os
 import logging
 from dotenv import load_dotenv, find_dotenv
@@ -17,6 +18,24 @@ Base = declarative_base()
 engine = None
 SessionLocal = None
 
+# Size of the connection pool, also used to size the database executor
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
+def _create_engine(connection_string):
+    """
+    Create an engine suited to being shared by the database executor threads.
+    In-memory SQLite gets a single static connection so every thread sees the same database.
+    """
+    if connection_string.startswith("sqlite") and ":memory:" in connection_string:
+        return create_engine(
+            connection_string,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+    if connection_string.startswith("sqlite"):
+        return create_engine(connection_string, connect_args={"check_same_thread": False})
+    return create_engine(connection_string, pool_size=DB_POOL_SIZE, max_overflow=0, pool_pre_ping=True)
+
 def _initialise_database():
     """Initialise the database engine and session factory."""
     global engine, SessionLocal
@@ -68,7 +87,7 @@ def _initialise_database():
 
             # Create engine with connection string
             logger.info(f"Initialising database connection type: {connection_string.split('://')[0]}")
-            engine = create_engine(connection_string)
+            engine = _create_engine(connection_string)
             SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
             
         except Exception as e:
@@ -76,12 +95,12 @@ def _initialise_database():
             # Fallback to in-memory SQLite if initialisation fails
             logger.warning("Falling back to in-memory SQLite due to initialisation error.")
             connection_string = "sqlite:///:memory:"
-            engine = create_engine(connection_string)
+            engine = _create_engine(connection_string)
             SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
     else:
         # If database is disabled, use in-memory SQLite
         logger.info("Database usage is disabled. Initialising in-memory SQLite.")
-        engine = create_engine("sqlite:///:memory:")
+        engine = _create_engine("sqlite:///:memory:")
         SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 # Dependency to get DB session
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# Maximum time a single recipient may take to accept a frame before it is treated as slow
+SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "5"))
+
+async def _send_one(user_id, websocket, payload, timeout):
+    try:
+        await asyncio.wait_for(websocket.send(payload), timeout=timeout)
+        return user_id, None
+    except websockets.exceptions.ConnectionClosed:
+        return user_id, "closed"
+    except asyncio.TimeoutError:
+        return user_id, "slow"
+    except Exception as e:
+        logger.error(f"Error sending to user {user_id}: {str(e)}")
+        return user_id, "error"
+
+async def fan_out(recipients, payload, timeout=SEND_TIMEOUT):
+    """
+    Send a pre-encoded payload to many recipients concurrently.
+
+    Each send is bounded by a timeout so one slow socket cannot hold up
+    delivery to the rest of the conversation.
+
+    Parameters:
+        recipients (list[tuple[str, websocket]]): (user_id, websocket) pairs to deliver to
+        payload (str | bytes): Encoded frame, shared by every recipient
+        timeout (float): Per-recipient send timeout in seconds
+
+    Returns:
+        dict: Mapping of user_id to failure reason ("closed", "slow" or "error") for failed sends
+    """
+    if not recipients:
+        return {}
+
+    if len(recipients) == 1:
+        user_id, websocket = recipients[0]
+        results = [await _send_one(user_id, websocket, payload, timeout)]
+    else:
+        results = await asyncio.gather(*(
+            _send_one(user_id, websocket, payload, timeout) for user_id, websocket in recipients
+        ))
+
+    return {user_id: reason for user_id, reason in results if reason is not None}
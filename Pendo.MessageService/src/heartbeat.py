@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from src.codec import PreparedMessage
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = float(os.environ.get("HEARTBEAT_INTERVAL", "15"))
+HEARTBEAT_WHEEL_SLOTS = int(os.environ.get("HEARTBEAT_WHEEL_SLOTS", "15"))
+HEARTBEAT_SEND_TIMEOUT = float(os.environ.get("HEARTBEAT_SEND_TIMEOUT", "5"))
+
+class HeartbeatScheduler():
+    """
+    Single timer wheel driving heartbeats for every WebSocket connection.
+
+    Connections are spread across the wheel's slots and one task advances
+    the wheel a slot per tick, so each connection is visited once per
+    interval without a timer of its own. On each visit a connection that is
+    already closed is reported as dead, and one that has been idle for the
+    whole interval is sent the tick's heartbeat message, encoded once per
+    codec and shared by every connection in the slot. Liveness of open but silent
+    peers is left to the websockets library's ping/pong.
+    """
+
+    def __init__(self, send, on_dead=None, interval=HEARTBEAT_INTERVAL, slots=HEARTBEAT_WHEEL_SLOTS,
+                 send_timeout=HEARTBEAT_SEND_TIMEOUT):
+        """
+        Parameters:
+            send (coroutine function): Called as send(websocket, payload, key="heartbeat")
+            on_dead (callable): Called with a websocket found to be closed
+            interval (float): Seconds between heartbeats for an idle connection
+            slots (int): Number of wheel slots, the wheel ticks every interval / slots seconds
+            send_timeout (float): Longest a heartbeat send may take
+        """
+        self.send = send
+        self.on_dead = on_dead
+        self.interval = interval
+        self.slots = max(1, slots)
+        self.tick_interval = interval / self.slots
+        self.send_timeout = send_timeout
+
+        self._wheel = [set() for _ in range(self.slots)]
+        self._slot_of = {}
+        self._last_activity = {}
+        self._position = 0
+        self._task = None
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def add(self, websocket):
+        """
+        Start tracking a connection. Its first heartbeat is due one interval from now.
+        """
+        if websocket in self._slot_of:
+            return
+        slot = (self._position - 1) % self.slots
+        self._wheel[slot].add(websocket)
+        self._slot_of[websocket] = slot
+        self._last_activity[websocket] = time.monotonic()
+
+    def touch(self, websocket):
+        """
+        Record activity on a connection, postponing its next heartbeat.
+        """
+        if websocket in self._last_activity:
+            self._last_activity[websocket] = time.monotonic()
+
+    def remove(self, websocket):
+        """
+        Stop tracking a connection.
+        """
+        slot = self._slot_of.pop(websocket, None)
+        if slot is not None:
+            self._wheel[slot].discard(websocket)
+        self._last_activity.pop(websocket, None)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Heartbeat scheduler started: interval={self.interval}s, slots={self.slots}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick_interval
+            await asyncio.sleep(max(0, next_tick - time.monotonic()))
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Heartbeat tick failed: {str(e)}")
+
+    async def tick(self):
+        """
+        Advance the wheel one slot and service the connections in it.
+
+        Returns:
+            int: Number of heartbeats sent
+        """
+        self._position = (self._position + 1) % self.slots
+        now = time.monotonic()
+        due = []
+
+        for websocket in list(self._wheel[self._position]):
+            if getattr(websocket, "closed", False) is True:
+                logger.info(f"Heartbeat found dead connection {id(websocket)}")
+                self.remove(websocket)
+                if self.on_dead:
+                    self.on_dead(websocket)
+            elif now - self._last_activity.get(websocket, now) >= self.interval - self.tick_interval:
+                due.append(websocket)
+
+        if not due:
+            return 0
+
+        payload = PreparedMessage({
+            "type": "heartbeat",
+            "timestamp": datetime.now().isoformat()
+        })
+        await asyncio.gather(*(self._send(websocket, payload) for websocket in due))
+        for websocket in due:
+            if websocket in self._last_activity:
+                self._last_activity[websocket] = now
+        return len(due)
+
+    async def _send(self, websocket, payload):
+        try:
+            await asyncio.wait_for(self.send(websocket, payload, key="heartbeat"), timeout=self.send_timeout)
+        except Exception as e:
+            logger.info(f"Heartbeat failed for connection {id(websocket)}: {str(e)}")
@@ -0,0 +1,98 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Seconds a confirmed conversation or membership is trusted without checking the database
+MEMBERSHIP_CACHE_TTL = float(os.environ.get("MEMBERSHIP_CACHE_TTL", "300"))
+# Number of conversations and memberships kept
+MEMBERSHIP_CACHE_MAX_ENTRIES = int(os.environ.get("MEMBERSHIP_CACHE_MAX_ENTRIES", "50000"))
+
+class MembershipCache():
+    """
+    TTL cache of conversations known to exist and users known to be participants.
+
+    Clients rejoin the same conversations constantly; a join by a participant
+    confirmed within the TTL needs no database round trip. Entries expire
+    after the TTL and are dropped explicitly when a conversation or a
+    membership changes.
+    """
+
+    def __init__(self, ttl=MEMBERSHIP_CACHE_TTL, max_entries=MEMBERSHIP_CACHE_MAX_ENTRIES, clock=time.monotonic):
+        """
+        Parameters:
+            ttl (float): Seconds an entry stays valid
+            max_entries (int): Maximum number of cached conversations and memberships, each
+            clock (callable): Monotonic time source
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conversations = OrderedDict()
+        self._members = OrderedDict()
+
+    def has_conversation(self, conversation_id):
+        """
+        Returns:
+            bool: Whether the conversation was confirmed to exist within the TTL
+        """
+        return self._lookup(self._conversations, str(conversation_id))
+
+    def is_member(self, conversation_id, user_id):
+        """
+        Returns:
+            bool: Whether the user was confirmed as a participant within the TTL
+        """
+        return self._lookup(self._members, (str(conversation_id), str(user_id)))
+
+    def add_conversation(self, conversation_id):
+        self._store(self._conversations, str(conversation_id))
+
+    def add_member(self, conversation_id, user_id):
+        """
+        Record a confirmed participant, which also confirms the conversation exists.
+        """
+        self.add_conversation(conversation_id)
+        self._store(self._members, (str(conversation_id), str(user_id)))
+
+    def invalidate(self, conversation_id, user_id=None):
+        """
+        Drop one membership, or a conversation and every cached membership of it.
+
+        Parameters:
+            conversation_id (str): Conversation identifier
+            user_id (str): Optional participant, otherwise the whole conversation
+        """
+        conversation_id = str(conversation_id)
+        if user_id is not None:
+            self._members.pop((conversation_id, str(user_id)), None)
+            return
+        self._conversations.pop(conversation_id, None)
+        for key in [key for key in self._members if key[0] == conversation_id]:
+            del self._members[key]
+
+    def clear(self):
+        self._conversations.clear()
+        self._members.clear()
+
+    def _lookup(self, entries, key):
+        expires = entries.get(key)
+        if expires is not None and expires > self.clock():
+            self.hits += 1
+            return True
+        if expires is not None:
+            del entries[key]
+        self.misses += 1
+        return False
+
+    def _store(self, entries, key):
+        entries[key] = self.clock() + self.ttl
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+"""
+Cross-node fan-out for the message service.
+
+Every node publishes the conversation broadcasts it originates to the bus and
+delivers broadcasts from other nodes to its own local sockets. Backends only
+need to move opaque envelopes between nodes, so a broker such as Redis can be
+added by implementing MessageBus.
+"""
+
+MESSAGE_BUS = os.environ.get("MESSAGE_BUS", "none").lower()
+MESSAGE_BUS_PATH = os.environ.get("MESSAGE_BUS_PATH", "/tmp/pendo-message-bus")
+# Largest envelope sent as one datagram, bigger ones are replaced by their fallback
+MESSAGE_BUS_MAX_DATAGRAM = int(os.environ.get("MESSAGE_BUS_MAX_DATAGRAM", str(64 * 1024)))
+
+class MessageBus(ABC):
+    """
+    Base class for pub/sub backends. Backends implement start, calling the base
+    method to record the callback, and publish.
+    """
+
+    def __init__(self, node_id=None):
+        self.node_id = node_id or uuid.uuid4().hex
+        self._on_message = None
+
+    @abstractmethod
+    async def start(self, on_message):
+        """
+        Start receiving envelopes from other nodes.
+
+        Parameters:
+            on_message (coroutine function): Called with each envelope published by another node
+        """
+        self._on_message = on_message
+
+    @abstractmethod
+    async def publish(self, envelope, fallback=None):
+        """
+        Publish an envelope to every other node.
+
+        Parameters:
+            envelope (dict): JSON-serialisable broadcast envelope
+            fallback (dict): Optional small envelope sent instead to nodes the envelope cannot reach
+        """
+
+    async def close(self):
+        self._on_message = None
+
+    def _receive(self, envelope):
+        if self._on_message is None or envelope.get("origin") == self.node_id:
+            return
+        asyncio.get_running_loop().create_task(self._dispatch(envelope))
+
+    async def _dispatch(self, envelope):
+        try:
+            await self._on_message(envelope)
+        except Exception as e:
+            logger.error(f"Error delivering bus message on node {self.node_id}: {str(e)}")
+
+class LocalBus(MessageBus):
+    """
+    In-process backend connecting every LocalBus sharing a channel name.
+    Useful for tests and for running several handlers in one process.
+    """
+    _channels = {}
+
+    def __init__(self, channel="default", node_id=None):
+        super().__init__(node_id)
+        self.channel = channel
+
+    async def start(self, on_message):
+        await super().start(on_message)
+        LocalBus._channels.setdefault(self.channel, set()).add(self)
+
+    async def publish(self, envelope, fallback=None):
+        envelope = json.loads(json.dumps(envelope))
+        for peer in list(LocalBus._channels.get(self.channel, ())):
+            if peer is not self:
+                peer._receive(envelope)
+
+    async def close(self):
+        LocalBus._channels.get(self.channel, set()).discard(self)
+        await super().close()
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, bus):
+        self.bus = bus
+
+    def datagram_received(self, data, addr):
+        try:
+            self.bus._receive(json.loads(data))
+        except json.JSONDecodeError:
+            logger.error("Discarding malformed bus datagram")
+
+    def error_received(self, exc):
+        logger.warning(f"Message bus socket error: {str(exc)}")
+
+class UnixSocketBus(MessageBus):
+    """
+    Brokerless backend for nodes on one host. Each node binds a UNIX datagram
+    socket in a shared directory and publishes by sending to every other
+    socket found there. Envelopes over the datagram limit, or that a peer
+    cannot accept, are replaced by their fallback.
+    """
+    PEER_REFRESH_SECONDS = 1.0
+
+    def __init__(self, directory=MESSAGE_BUS_PATH, node_id=None, max_datagram=MESSAGE_BUS_MAX_DATAGRAM):
+        super().__init__(node_id)
+        self.directory = directory
+        self.max_datagram = max_datagram
+        self.path = os.path.join(directory, f"{self.node_id}.sock")
+        self._transport = None
+        self._peers = []
+        self._peers_refreshed = 0.0
+
+    async def start(self, on_message):
+        await super().start(on_message)
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(self),
+            local_addr=self.path,
+            family=socket.AF_UNIX
+        )
+        logger.info(f"Message bus node {self.node_id} listening on {self.path}")
+
+    def _refresh_peers(self):
+        now = time.monotonic()
+        if now - self._peers_refreshed < self.PEER_REFRESH_SECONDS:
+            return
+        self._peers = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".sock") and os.path.join(self.directory, name) != self.path
+        ]
+        self._peers_refreshed = now
+
+    async def publish(self, envelope, fallback=None):
+        if self._transport is None:
+            return
+
+        self._refresh_peers()
+        data = json.dumps(envelope).encode()
+        fallback_data = json.dumps(fallback).encode() if fallback is not None else None
+        if len(data) > self.max_datagram:
+            logger.warning(f"Bus envelope of {len(data)} bytes exceeds the {self.max_datagram} byte datagram limit, sending its fallback")
+            data, fallback_data = fallback_data, None
+            if data is None:
+                return
+
+        for peer in self._peers:
+            try:
+                self._transport.sendto(data, peer)
+            except OSError as e:
+                logger.warning(f"Could not publish to bus peer {peer}: {str(e)}")
+                if fallback_data is not None:
+                    try:
+                        self._transport.sendto(fallback_data, peer)
+                    except OSError:
+                        pass
+
+    def refresh_peers(self):
+        """
+        Force the peer list to be re-read on the next publish.
+        """
+        self._peers_refreshed = 0.0
+
+    async def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        await super().close()
+
+def create_bus(kind=MESSAGE_BUS):
+    """
+    Create the configured message bus, or None for a single node deployment.
+
+    Parameters:
+        kind (str): "none", "local" or "unix"
+    """
+    if kind in ("", "none"):
+        return None
+    if kind == "local":
+        return LocalBus()
+    if kind == "unix":
+        return UnixSocketBus()
+    raise ValueError(f"Unknown message bus backend: {kind}")
@@ -1,13 +1,36 @@
 from enum import Enum
+import asyncio
 import json
 from typing import Dict, Set, List
 from datetime import datetime, timezone
 import logging
+import os
 import websockets
 import uuid
+from collections import OrderedDict
+from types import SimpleNamespace
+from src.db.AsyncRepository import AsyncRepository
+from src.db.MessageRepository import encode_cursor, decode_cursor
+from src.db.MessageWriter import MessageWriter
+from src.fan_out import fan_out
+from src.outbound_queue import OutboundQueue
+from src.conversation_cache import ConversationCache
+from src.wire_cache import WireCache
+from src.membership_cache import MembershipCache
+from src.codec import JSON, CODECS, PreparedMessage, negotiate
+from src.metrics import MESSAGES_RECEIVED, FAN_OUT_SIZE, SEND_FAILURES, HISTORY_LOADS
 
 logger = logging.getLogger(__name__)
 
+# Number of latest messages returned by a history request
+HISTORY_LIMIT = 100
+
+# Largest gap replayed to a resuming client before falling back to a full history fetch
+RESUME_MAX_REPLAY = int(os.environ.get("RESUME_MAX_REPLAY", "500"))
+
+# Message types counted individually in metrics, anything else is counted as "other"
+METRIC_MESSAGE_TYPES = {'chat', 'history_request', 'join_conversation', 'leave_conversation', 'booking_amendment', 'mark_read'}
+
 """
 Code derived from websockets documentation & example code
 Reference: https://websockets.readthedocs.io/en/stable/topics/index.html
@@ -21,28 +44,68 @@ class MessageType(Enum):
     LEAVE_CONVERSATION = "leave_conversation",
 
 class MessageHandler:
-    def __init__(self, repository=None):
+    def __init__(self, repository=None, bus=None):
         # User connections and sessions
         self.connections: Dict[str, object] = {}
         self.user_sessions: Dict[str, object] = {}
         self.repository = repository
 
+        # Repository calls are awaited through the executor-backed facade
+        # so database I/O never blocks the event loop
+        self.db = AsyncRepository(repository) if repository else None
+
+        # Chat messages are persisted write-behind in batched inserts
+        self.writer = MessageWriter(self.db) if repository else None
+
         # In memory data and user connections
         # Provides quick access to messages and user connections
         self.message_cache: Dict[str, List[Dict]] = {}
         self.user_connections: Dict[str, websockets.WebSocketServerProtocol] = {}
         self.conversations: Dict[str, Set[str]] = {}
-        self.message_store: Dict[str, list] = {}
+
+        # Reverse indexes so connect, join, leave and disconnect only touch
+        # the user's own memberships
+        self.user_conversations: Dict[str, Set[str]] = {}
+        self.socket_users: Dict[object, str] = {}
+
+        # Bounded recent-message cache per conversation, evicted LRU across conversations
+        self.message_store = ConversationCache(authoritative=repository is None)
+
+        # Wire format of stored messages by MessageId, so history responses
+        # join cached encodings instead of parsing and re-encoding rows
+        self.wire_cache = WireCache()
+        # Conversations and participants recently confirmed in the database
+        self.membership_cache = MembershipCache()
+
+        # Bounded outbound queue and writer task per registered connection
+        self.outbound_queues: Dict[object, OutboundQueue] = {}
+
+        # Codec negotiated at register time, connections without one use JSON
+        self.connection_codecs: Dict[object, object] = {}
+
+        # Optional pub/sub bus carrying broadcasts between service nodes
+        self.bus = bus
+
+        # Last allocated message sequence number per conversation, loaded
+        # from the database the first time a conversation is written to
+        self.sequences: OrderedDict[str, int] = OrderedDict()
+
+        # Highest sequence number seen on the bus for conversations not loaded yet
+        self._sequence_floors: OrderedDict[str, int] = OrderedDict()
+
+        # In-flight history loads keyed by conversation and cursor, shared by concurrent requests
+        self._history_loads: Dict[tuple, asyncio.Future] = {}
 
         logger.info("MessageHandler initialised")
     
-    def register_user(self, user_id: str, websocket: websockets.WebSocketServerProtocol):
+    def register_user(self, user_id: str, websocket: websockets.WebSocketServerProtocol, codec=JSON):
         """
         Register a user connection
 
         Parameters:
             user_id (str): Unique user identifier
             websocket (websockets.WebSocketServerProtocol): Websocket connection object
+            codec (Codec): Codec every frame to this connection is encoded with
         
         Returns:
             None
@@ -52,7 +115,25 @@ class MessageHandler:
         if user_id not in self.message_cache:
             self.message_cache[user_id] = []
 
+        previous = self.user_connections.get(user_id)
+        if previous is not None and previous is not websocket:
+            self._release_connection(previous)
+            self.socket_users.pop(previous, None)
+
         self.user_connections[user_id] = websocket
+        self.socket_users[websocket] = user_id
+        if codec is not JSON:
+            self.connection_codecs[websocket] = codec
+        else:
+            self.connection_codecs.pop(websocket, None)
+
+        if websocket not in self.outbound_queues:
+            try:
+                self.outbound_queues[websocket] = OutboundQueue(websocket, on_disconnect=self._on_connection_lost)
+            except RuntimeError:
+                # No running event loop, sends to this connection go out inline
+                pass
+
         logger.info(f"User {user_id} registered")
     
     def remove_user(self, user_id: str):
@@ -68,17 +149,158 @@ class MessageHandler:
         if user_id in self.connections:
             del self.connections[user_id]
         if user_id in self.user_connections:
-            del self.user_connections[user_id]
-            for conv_id, users in list(self.conversations.items()):
-                if user_id in users:
-                    users.remove(user_id)
+            websocket = self.user_connections.pop(user_id)
+            self._release_connection(websocket)
+            if self.socket_users.get(websocket) == user_id:
+                del self.socket_users[websocket]
 
-                    # Remove conversation from memory if empty
-                    if not users:
-                        del self.conversations[conv_id]
+            for conv_id in self.user_conversations.pop(user_id, set()):
+                self._remove_member(conv_id, user_id)
 
             logger.info(f"User {user_id} removed")
 
+    def remove_connection(self, websocket):
+        """
+        Remove whichever user is registered on a connection, if any
+
+        Parameters:
+            websocket (websockets.WebSocketServerProtocol): Websocket connection object
+
+        Returns:
+            None
+        """
+        user_id = self.socket_users.get(websocket)
+        if user_id is not None:
+            self.remove_user(user_id)
+        else:
+            self._release_connection(websocket)
+
+    def _add_member(self, conversation_id, user_id):
+        if conversation_id not in self.conversations:
+            self.conversations[conversation_id] = set()
+        self.conversations[conversation_id].add(user_id)
+        self.user_conversations.setdefault(user_id, set()).add(conversation_id)
+
+    def _remove_member(self, conversation_id, user_id):
+        users = self.conversations.get(conversation_id)
+        if users is not None:
+            users.discard(user_id)
+
+            # Remove conversation from memory if empty
+            if not users:
+                del self.conversations[conversation_id]
+
+        joined = self.user_conversations.get(user_id)
+        if joined is not None:
+            joined.discard(conversation_id)
+            if not joined:
+                del self.user_conversations[user_id]
+
+    def _release_connection(self, websocket):
+        self.connection_codecs.pop(websocket, None)
+        queue = self.outbound_queues.pop(websocket, None)
+        if queue is not None:
+            queue.close()
+
+    def _on_connection_lost(self, websocket):
+        """
+        Called by an outbound queue when its connection has gone away or was
+        disconnected as a slow consumer.
+        """
+        self.remove_connection(websocket)
+
+    def codec_for(self, websocket):
+        """
+        Returns:
+            Codec: The codec negotiated by a connection, JSON if none was
+        """
+        return self.connection_codecs.get(websocket, JSON)
+
+    def encode_for(self, websocket, message):
+        """
+        Encode a message with a connection's codec.
+
+        Parameters:
+            websocket (websockets.WebSocketServerProtocol): Websocket connection object
+            message (dict | PreparedMessage | str | bytes): Message, frames already encoded are returned as is
+
+        Returns:
+            str | bytes: The frame to send
+        """
+        if isinstance(message, (str, bytes)):
+            return message
+        if isinstance(message, PreparedMessage):
+            return message.encode(self.codec_for(websocket))
+        return self.codec_for(websocket).encode(message)
+
+    def decode_from(self, websocket, frame):
+        """
+        Decode a frame received on a connection. Text frames are always JSON,
+        binary frames use the connection's codec.
+        """
+        if isinstance(frame, str):
+            return JSON.decode(frame)
+        codec = self.codec_for(websocket)
+        if not codec.binary:
+            # Binary frame before a binary codec was negotiated
+            codec = next((c for c in CODECS.values() if c.binary), JSON)
+        return codec.decode(frame)
+
+    async def send(self, websocket, message, key=None):
+        """
+        Send a message to a connection, encoded with the connection's codec.
+        Registered connections are written through their outbound queue,
+        anything else is sent inline.
+
+        Parameters:
+            websocket (websockets.WebSocketServerProtocol): Websocket connection object
+            message (dict | PreparedMessage | str | bytes): Message to send
+            key (str): Optional coalesce key, e.g. "heartbeat"
+
+        Returns:
+            None
+        """
+        payload = self.encode_for(websocket, message)
+        queue = self.outbound_queues.get(websocket)
+        if queue is not None:
+            queue.put(payload, key=key)
+        else:
+            await websocket.send(payload)
+
+    async def drain(self):
+        """
+        Wait for every outbound queue to hand its frames to the network.
+        """
+        await asyncio.gather(*(queue.drain() for queue in list(self.outbound_queues.values())))
+
+    async def start(self):
+        """
+        Start background components that need a running event loop, such as the message bus.
+
+        Returns:
+            None
+        """
+        if self.bus:
+            await self.bus.start(self._on_bus_message)
+            logger.info(f"Joined message bus as node {self.bus.node_id}")
+
+    async def shutdown(self):
+        """
+        Flush any state that must outlive the process, such as queued messages.
+
+        Returns:
+            None
+        """
+        if self.bus:
+            await self.bus.close()
+
+        if self.writer:
+            await self.writer.close()
+            logger.info("Queued messages flushed")
+
+        for websocket in list(self.outbound_queues):
+            self._release_connection(websocket)
+
     def serialize_message(self, message):
         """
         Convert a SQLAlchemy Messages model instance to a JSON-serializable dictionary.
@@ -119,12 +341,204 @@ class MessageHandler:
             "timestamp": message.CreateDate.isoformat() if message.CreateDate else None,
             **additional_props
         }
+
+        sequence_number = getattr(message, 'SequenceNumber', None)
+        result["seq"] = sequence_number if isinstance(sequence_number, int) else None
         
         return result
     
+    def _serialize_row(self, row):
+        """
+        Serialize a queued message row exactly as it will read back from the database.
+        """
+        return self._wire(SimpleNamespace(**row))[0]
+
+    def _wire(self, message):
+        """
+        Return a stored message's wire format, serializing it only the first time it is seen.
+
+        Parameters:
+            message (Messages): Stored message row
+
+        Returns:
+            tuple[dict, str]: The serialized message and its JSON encoding
+        """
+        message_id = str(message.MessageId)
+        entry = self.wire_cache.get(message_id)
+        if entry is None:
+            serialized = self.serialize_message(message)
+            entry = (serialized, json.dumps(serialized))
+            self.wire_cache.put(message_id, *entry)
+        return entry
+
+    def _encode_entry(self, message):
+        """
+        Return the JSON encoding of a serialized message, reusing the cached encoding when there is one.
+        """
+        message_id = message.get('id')
+        if message_id is None:
+            return json.dumps(message)
+
+        entry = self.wire_cache.get(message_id)
+        if entry is None or entry[0] is not message:
+            entry = (message, json.dumps(message))
+            self.wire_cache.put(message_id, *entry)
+        return entry[1]
+
+    def _history_payload(self, messages, has_more, resumed):
+        """
+        Assemble a history_response, joining the messages' cached encodings for JSON connections.
+
+        Parameters:
+            messages (list[dict]): Serialized messages, newest first
+            has_more (bool): Whether more messages exist beyond the page
+            resumed (bool): Whether only the gap after the client's last_seq was sent
+
+        Returns:
+            PreparedMessage: The response, with its JSON encoding built from the cached encodings
+        """
+        trailer = {
+            'has_more': has_more,
+            'resumed': resumed,
+            'before_cursor': self._cursor_for(messages[-1]) if messages and self.repository else None,
+            'after_cursor': self._cursor_for(messages[0]) if messages and self.repository else None
+        }
+        encoded = ", ".join(self._encode_entry(message) for message in messages)
+        return PreparedMessage(
+            {'type': 'history_response', 'messages': messages, **trailer},
+            json_encoding='{"type": "history_response", "messages": [' + encoded + '], ' + json.dumps(trailer)[1:]
+        )
+
+    def _cursor_for(self, message):
+        """
+        Build the history cursor for a serialized message, if it has a stored position.
+        """
+        if not message.get('id') or not message.get('timestamp'):
+            return None
+        try:
+            return encode_cursor(datetime.fromisoformat(message['timestamp']), message['id'])
+        except ValueError:
+            return None
+
+    def _parse_since_timestamp(self, since_timestamp):
+        """
+        Parse a client supplied ISO timestamp into the naive UTC form stored in the database.
+        """
+        since = datetime.fromisoformat(since_timestamp.replace('Z', '+00:00'))
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return since
+
+    async def _current_sequence(self, conversation_id):
+        """
+        Return the last sequence number allocated in a conversation, loading it from the database on first use.
+        """
+        if conversation_id not in self.sequences:
+            if self.writer and self.writer.has_unwritten(conversation_id):
+                # The counter was evicted with rows still queued, the stored maximum is stale until they are written
+                await self.writer.flush()
+            loaded = await self.db.get_last_sequence_number(conversation_id) if self.repository else 0
+            # Another message may have been numbered, here or on another node, while the load was in flight
+            floor = self._sequence_floors.pop(conversation_id, 0)
+            self.sequences[conversation_id] = max(self.sequences.get(conversation_id, 0), floor, loaded)
+            self._trim_sequences()
+        else:
+            self.sequences.move_to_end(conversation_id)
+        return self.sequences[conversation_id]
+
+    async def _next_sequence(self, conversation_id):
+        """
+        Allocate the next sequence number in a conversation.
+
+        Returns:
+            int | None: The sequence number, or None if the current position could not be loaded
+        """
+        try:
+            await self._current_sequence(conversation_id)
+        except Exception as e:
+            logger.error(f"Error loading sequence number for conversation {conversation_id}: {str(e)}")
+            return None
+        self.sequences[conversation_id] += 1
+        return self.sequences[conversation_id]
+
+    def _observe_sequence(self, conversation_id, sequence_number):
+        """
+        Advance a conversation's sequence past a number allocated by another node.
+        """
+        if not isinstance(sequence_number, int):
+            return
+        if conversation_id in self.sequences or not self.repository:
+            self.sequences[conversation_id] = max(self.sequences.get(conversation_id, 0), sequence_number)
+            self.sequences.move_to_end(conversation_id)
+        else:
+            # Kept as a floor for the first load, which may read the database before this message is written
+            self._sequence_floors[conversation_id] = max(self._sequence_floors.get(conversation_id, 0), sequence_number)
+            self._sequence_floors.move_to_end(conversation_id)
+        self._trim_sequences()
+
+    def _trim_sequences(self):
+        """
+        Evict the least recently used sequence counters once they exceed the message cache's conversation budget.
+        Without a database the counters are the only record of a conversation's position, so they are kept.
+        """
+        if not self.repository:
+            return
+        limit = self.message_store.max_conversations
+        for counters in (self.sequences, self._sequence_floors):
+            while len(counters) > limit:
+                counters.popitem(last=False)
+
+    async def _replay_since(self, conversation_id, last_seq):
+        """
+        Collect the messages a resuming client has not seen, from the cache when it
+        holds the whole gap and otherwise from the database.
+
+        Parameters:
+            conversation_id (str): Conversation identifier
+            last_seq (int): Last sequence number the client has seen
+
+        Returns:
+            list[dict] | None: Missed messages newest first, or None if the gap cannot be replayed
+        """
+        try:
+            missed = await self._current_sequence(conversation_id) - last_seq
+        except Exception as e:
+            logger.error(f"Error loading sequence number for conversation {conversation_id}: {str(e)}")
+            return None
+
+        if missed < 0 or missed > RESUME_MAX_REPLAY:
+            return None
+        if missed == 0:
+            return []
+
+        cached = [m for m in self.message_store.get(conversation_id, ()) if (m.get('seq') or 0) > last_seq]
+        if len(cached) >= missed:
+            return sorted(cached, key=lambda m: m['seq'], reverse=True)
+        if not self.repository:
+            return None
+
+        # Make queued messages visible to the query
+        await self.writer.flush()
+        rows = await self.db.get_messages_since_sequence(conversation_id, last_seq, limit=RESUME_MAX_REPLAY + 1)
+        if len(rows) > RESUME_MAX_REPLAY:
+            return None
+        return [self._wire(msg)[0] for msg in reversed(rows)]
+
     async def _handle_history_request(self, websocket, data):
         """
-        Handle request for message history for a conversation and send back to the requester
+        Handle request for message history for a conversation and send back to the requester.
+
+        Messages are returned newest first in pages of at most HISTORY_LIMIT. Optional fields:
+            page_size (int): Number of messages to return
+            before (str): Cursor, return the page immediately older than it
+            after (str): Cursor, return the page immediately newer than it
+            since_timestamp (str): ISO timestamp, treated as an after cursor on CreateDate
+            last_seq (int): Last sequence number the client has seen, only the messages
+                after it are returned if the gap is at most RESUME_MAX_REPLAY
+
+        The response carries has_more plus before_cursor/after_cursor for the
+        oldest and newest message in the page, and resumed when only the gap
+        after last_seq was sent.
         
         Parameters:
             websocket (websockets.WebSocketServerProtocol): Websocket connection object
@@ -133,33 +547,125 @@ class MessageHandler:
             None
         """
         if not all(k in data for k in ('conversation_id', 'user_id')):
-            await websocket.send(json.dumps({
+            await self.send(websocket, {
                 "type": "error",
                 "message": "Missing conversation_id or user_id"
-            }))
+            })
             return
         
         conversation_id = data['conversation_id']
         since_timestamp = data.get('since_timestamp')
-        
-        messages = []
+
+        try:
+            last_seq = int(data['last_seq']) if data.get('last_seq') is not None else None
+            page_size = max(1, min(int(data.get('page_size') or HISTORY_LIMIT), HISTORY_LIMIT))
+            before = decode_cursor(data['before']) if data.get('before') else None
+            after = decode_cursor(data['after']) if data.get('after') else None
+            if after is None and since_timestamp:
+                after = (self._parse_since_timestamp(since_timestamp), None)
+        except (TypeError, ValueError):
+            await self.send(websocket, {
+                "type": "error",
+                "message": "Invalid page_size, cursor, since_timestamp or last_seq"
+            })
+            return
+
+        if last_seq is not None:
+            payload = await self._single_flight(
+                ('resume', conversation_id, last_seq),
+                lambda: self._load_resume(conversation_id, last_seq)
+            )
+            if payload is not None:
+                await self.send(websocket, payload)
+                return
+            # The gap is too large or unknown, fall back to the latest page
+
+        payload = await self._single_flight(
+            ('page', conversation_id, page_size, before, after, since_timestamp),
+            lambda: self._load_history_page(conversation_id, page_size, before, after, since_timestamp)
+        )
+        await self.send(websocket, payload)
+
+    async def _single_flight(self, key, load):
+        """
+        Run a history load once for all concurrent requests with the same key.
+
+        The first request for a key starts the load and later requests that arrive
+        while it is in flight await the same result, so a burst of identical
+        requests costs one query and one encoded payload. A request that is
+        cancelled does not cancel the load for the others.
+
+        Parameters:
+            key (tuple): Conversation and cursor identifying the load
+            load (callable): Returns a coroutine producing the encoded response
+
+        Returns:
+            The load's result
+        """
+        future = self._history_loads.get(key)
+        if future is None:
+            future = asyncio.ensure_future(load())
+            self._history_loads[key] = future
+            future.add_done_callback(lambda done: self._history_loads.pop(key, None)
+                                     if self._history_loads.get(key) is done else None)
+            HISTORY_LOADS.labels(outcome='loaded').inc()
+        else:
+            HISTORY_LOADS.labels(outcome='coalesced').inc()
+        return await asyncio.shield(future)
+
+    async def _load_resume(self, conversation_id, last_seq):
+        """
+        Build the resume response for a client that has seen up to last_seq.
+
+        Returns:
+            PreparedMessage | None: The response, or None if the gap cannot be replayed
+        """
+        missed = await self._replay_since(conversation_id, last_seq)
+        if missed is None:
+            return None
+        return self._history_payload(missed, has_more=False, resumed=True)
+
+    async def _load_history_page(self, conversation_id, page_size, before, after, since_timestamp):
+        """
+        Build the history response for one page of a conversation.
+
+        Returns:
+            PreparedMessage: The response
+        """
         if self.repository:
-            messages = self.repository.get_messages_by_conversation_id(conversation_id)
-            if since_timestamp:
-                messages = [msg for msg in messages if msg.CreateDate.isoformat() > since_timestamp]
-            # Convert Messages objects to dictionaries
-            messages = [self.serialize_message(msg) for msg in messages]
+            if before is None and after is None:
+                # Latest page: serve from the cache when it holds the window, otherwise load and seed it
+                cached = self.message_store.lookup(conversation_id, HISTORY_LIMIT)
+                if cached is None:
+                    rows = await self.db.get_messages_by_conversation_id(conversation_id)
+                    cached = self.message_store.seed(
+                        conversation_id,
+                        [self._wire(msg)[0] for msg in reversed(rows)],
+                        truncated=len(rows) >= HISTORY_LIMIT
+                    )
+                # Newest first, matching the database ordering
+                latest = cached[::-1]
+                messages = latest[:page_size]
+                has_more = len(latest) > page_size or self.message_store.is_truncated(conversation_id)
+            else:
+                # Make queued messages visible to the cursor query
+                await self.writer.flush()
+                rows = await self.db.get_messages_by_conversation_id(
+                    conversation_id, limit=page_size + 1, before=before, after=after
+                )
+                has_more = len(rows) > page_size
+                if has_more:
+                    # The extra row lies beyond the page in the direction being walked
+                    rows = rows[1:] if before is None else rows[:-1]
+                messages = [self._wire(msg)[0] for msg in rows]
         else:
-            messages = self.message_store.get(conversation_id, [])
+            messages = list(self.message_store.get(conversation_id, []))
             if since_timestamp:
-                messages = [msg for msg in messages if msg.get('timestamp', '') > since_timestamp]
-        
-        response = {
-            'type': 'history_response',
-            'messages': messages
-        }
+                messages = [msg for msg in messages if (msg.get('timestamp') or '') > since_timestamp]
+            has_more = len(messages) > page_size
+            messages = messages[-page_size:]
 
-        await websocket.send(json.dumps(response))
+        return self._history_payload(messages, has_more=has_more, resumed=False)
 
     async def handle_message(self, websocket, message):
         """
@@ -171,15 +677,21 @@ class MessageHandler:
         Returns:
             None
         """
-        data = json.loads(message)
+        data = self.decode_from(websocket, message)
         
         # Register user if this is an authentication message
         if 'register' in data and data['register'] and 'user_id' in data:
-            self.register_user(data['user_id'], websocket)
+            MESSAGES_RECEIVED.labels(type='register').inc()
+            codec = negotiate(data.get('codec'))
+            self.register_user(data['user_id'], websocket, codec=codec)
+            if data.get('codec'):
+                # Confirm the choice in JSON, pre-encoded so it is queued as a text frame ahead of any codec frames
+                await self.send(websocket, JSON.encode({'type': 'codec_selected', 'codec': codec.name}))
             return
             
         # Direct handling for specific message types without enum validation
         message_type = data.get('type')
+        MESSAGES_RECEIVED.labels(type=message_type if message_type in METRIC_MESSAGE_TYPES else 'other').inc()
         
         match message_type:
             case 'history_request':
@@ -191,6 +703,9 @@ class MessageHandler:
             case 'leave_conversation':
                 await self._handle_leave_conversation(data)
                 return
+            case 'mark_read':
+                self._handle_mark_read(data)
+                return
             case 'booking_amendment':
                 # Handle booking amendments as a special case
                 await self._handle_booking_amendment(data)
@@ -221,12 +736,12 @@ class MessageHandler:
         if 'timestamp' not in message:
             message['timestamp'] = datetime.now(timezone.utc).isoformat()
         
-        # Store message in memory
         conversation_id = message['conversation_id']
-        if conversation_id not in self.message_store:
-            self.message_store[conversation_id] = []
-        self.message_store[conversation_id].append(message)
-        
+        message['seq'] = await self._next_sequence(conversation_id)
+
+        # Without a database the cache holds the raw message
+        cache_entry = None if self.repository else message
+
         # Store message in database if repository is available
         try:
             if self.repository:
@@ -244,22 +759,28 @@ class MessageHandler:
                     
                     # Add any additional properties to preserve them
                     for key, value in message.items():
-                        if key not in ['from', 'conversation_id', 'content', 'type', 'timestamp']:
+                        if key not in ['from', 'conversation_id', 'content', 'type', 'timestamp', 'seq']:
                             content[key] = value
                 
-                self.repository.save_message(
+                row = self.writer.enqueue(
                     conversation_id=conversation_id,
                     sender_id=message['from'],
                     message_type=message_type,
-                    content=json.dumps(content)
+                    content=json.dumps(content),
+                    sequence_number=message['seq']
                 )
+                cache_entry = self._serialize_row(row)
         except Exception as e:
             logger.error(f"Error saving chat message to database: {str(e)}")
+
+        if cache_entry is not None:
+            self.message_store.append(conversation_id, cache_entry)
         
         logger.debug(f"Broadcasting message to conversation {conversation_id}: {message}")
         
         # Broadcast to all users in this conversation except the sender
-        await self._broadcast_to_conversation(conversation_id, message, exclude_user=message['from'])
+        await self._broadcast_to_conversation(conversation_id, message, exclude_user=message['from'], cache_entry=cache_entry)
+        self._mark_viewers_read(conversation_id)
 
     async def _handle_booking_amendment(self, message):
         """
@@ -282,9 +803,8 @@ class MessageHandler:
         message['type'] = 'booking_amendment'
         
         conversation_id = message['conversation_id']
-        if conversation_id not in self.message_store:
-            self.message_store[conversation_id] = []
-        self.message_store[conversation_id].append(message)
+        message['seq'] = await self._next_sequence(conversation_id)
+        cache_entry = None if self.repository else message
         
         # Store message in database with special handling
         try:
@@ -295,18 +815,24 @@ class MessageHandler:
                     "booking_amendment": True
                 }
                 
-                self.repository.save_message(
+                row = self.writer.enqueue(
                     conversation_id=conversation_id,
                     sender_id=message['from'],
                     message_type='booking_amendment',
-                    content=json.dumps(content_obj)
+                    content=json.dumps(content_obj),
+                    sequence_number=message['seq']
                 )
-                logger.info(f"Saved booking amendment message to database, amendmentId: {message['amendmentId']}")
+                cache_entry = self._serialize_row(row)
+                logger.info(f"Queued booking amendment message for database, amendmentId: {message['amendmentId']}")
         except Exception as e:
             logger.error(f"Error saving booking amendment message to database: {str(e)}")
+
+        if cache_entry is not None:
+            self.message_store.append(conversation_id, cache_entry)
         
         # Broadcast to all users in this conversation
-        await self._broadcast_to_conversation(conversation_id, message)
+        await self._broadcast_to_conversation(conversation_id, message, cache_entry=cache_entry)
+        self._mark_viewers_read(conversation_id)
 
     async def _handle_join_conversation(self, message):
         """
@@ -330,53 +856,61 @@ class MessageHandler:
         except ValueError:
             user_socket = self.user_connections.get(user_id)
             if user_socket:
-                await user_socket.send(json.dumps({
+                await self.send(user_socket, {
                     "type": "error",
                     "message": "Invalid UUID format for user_id or conversation_id"
-                }))
+                })
             return
 
+        # Repeat joins by a known participant need no database round trip
+        known_member = self.membership_cache.is_member(conv_uuid, user_uuid)
+
         # Check conversation exists if using the database
-        if self.repository:
-            convo = self.repository.get_conversation_by_id(conv_uuid)
+        if self.repository and not known_member and not self.membership_cache.has_conversation(conv_uuid):
+            convo = await self.db.get_conversation_by_id(conv_uuid)
             if not convo:
                 user_socket = self.user_connections.get(user_id)
                 if user_socket:
-                    await user_socket.send(json.dumps({
+                    await self.send(user_socket, {
                         "type": "error",
                         "message": "Conversation does not exist"
-                    }))
+                    })
                 return
+            self.membership_cache.add_conversation(conv_uuid)
         
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = set()
-        
-        self.conversations[conversation_id].add(user_id)
+        self._add_member(conversation_id, user_id)
 
         logger.info(f"User {user_id} joined conversation {conversation_id}")
         
         try:
-            if self.repository:
-                self.repository.add_user_to_conversation(conversation_id, user_id)
+            if self.repository and not known_member:
+                await self.db.add_user_to_conversation(conversation_id, user_id)
+                self.membership_cache.add_member(conv_uuid, user_uuid)
         except Exception as e:
+            # The conversation may have changed since it was cached
+            self.membership_cache.invalidate(conv_uuid)
             logger.error(f"Error adding user to conversation in database: {str(e)}")
             user_socket = self.user_connections.get(user_id)
             if user_socket:
-                await user_socket.send(json.dumps({
+                await self.send(user_socket, {
                     "type": "error",
                     "message": str(e)
-                }))
+                })
             return
 
+        # Joining shows the user the conversation's history
+        if self.writer:
+            self.writer.mark_read(conv_uuid, user_uuid)
+
         # Send confirmation to the user
         user_socket = self.user_connections.get(user_id)
         if user_socket:
-            await user_socket.send(json.dumps({
+            await self.send(user_socket, {
                 'type': 'conversation_joined',
                 'conversation_id': conversation_id,
                 'timestamp': datetime.now(timezone.utc).isoformat(),
                 'message': f'Successfully joined conversation {conversation_id}'
-            }))
+            })
             await self._handle_history_request(user_socket, message)
         
         # Notify other users
@@ -388,43 +922,172 @@ class MessageHandler:
         }
         await self._broadcast_to_conversation(conversation_id, join_notification, exclude_user=user_id)
 
-    async def _broadcast_to_conversation(self, conversation_id, message, exclude_user=None):
+    async def _broadcast_to_conversation(self, conversation_id, message, exclude_user=None, cache_entry=None):
         """
-        Broadcast a message to all users in a conversation, optionally excluding one user
+        Broadcast a message to all users in a conversation, optionally excluding one user.
+        When a message bus is configured the broadcast is also published so other
+        nodes can deliver it to their own connections.
         
         Parameters:
             conversation_id (str): Conversation identifier
             message (dict): Message to broadcast
             exclude_user (str): Optional user to exclude from broadcast
+            cache_entry (dict): Optional cached form of the message for other nodes' caches
         
+        Returns:
+            None
+        """
+        if self.bus:
+            # Nodes the broadcast cannot reach still learn its sequence number and that their cache is incomplete
+            fallback = {
+                "origin": self.bus.node_id,
+                "conversation_id": conversation_id,
+                "seq": message.get('seq'),
+                "invalidate": True
+            }
+            try:
+                await self.bus.publish({
+                    "origin": self.bus.node_id,
+                    "conversation_id": conversation_id,
+                    "message": message,
+                    "exclude_user": exclude_user,
+                    "cache_entry": cache_entry
+                }, fallback=fallback)
+            except Exception as e:
+                logger.error(f"Error publishing to message bus: {str(e)}")
+                try:
+                    await self.bus.publish(fallback)
+                except Exception as e:
+                    logger.error(f"Error publishing cache invalidation to message bus: {str(e)}")
+
+        await self._deliver_local(conversation_id, message, exclude_user, echo=True)
+
+    async def _on_bus_message(self, envelope):
+        """
+        Deliver a broadcast published by another node to this node's connections.
+
+        Parameters:
+            envelope (dict): Broadcast envelope from the message bus
+
+        Returns:
+            None
+        """
+        conversation_id = envelope['conversation_id']
+        if envelope.get('invalidate'):
+            self._observe_sequence(conversation_id, envelope.get('seq'))
+            # A broadcast was lost, so the cached conversation is reloaded on its next history request.
+            # Without a database the cache is the only copy and is kept.
+            if not self.message_store.authoritative:
+                self.message_store.invalidate(conversation_id)
+            return
+
+        cache_entry = envelope.get('cache_entry')
+        self._observe_sequence(conversation_id, envelope['message'].get('seq'))
+
+        # Keep conversations this node already caches complete
+        if cache_entry is not None and (self.message_store.authoritative or conversation_id in self.message_store):
+            self.message_store.append(conversation_id, cache_entry)
+
+        await self._deliver_local(conversation_id, envelope['message'], envelope.get('exclude_user'), echo=False)
+        if cache_entry is not None:
+            self._mark_viewers_read(conversation_id)
+
+    async def _deliver_local(self, conversation_id, message, exclude_user=None, echo=True):
+        """
+        Deliver a message to the conversation members connected to this node.
+
+        Parameters:
+            conversation_id (str): Conversation identifier
+            message (dict): Message to deliver
+            exclude_user (str): Optional user to skip
+            echo (bool): Send the excluded user a user_message_sent confirmation
+
         Returns:
             None
         """
         if conversation_id not in self.conversations:
             return
 
-        for user_id in self.conversations[conversation_id]:
-            # Skip the excluded user if specified
+        members = self.conversations[conversation_id]
+        recipients = []
+        sender_socket = None
+
+        for user_id in members:
+            websocket = self.user_connections.get(user_id)
+            if websocket is None:
+                continue
             if exclude_user and user_id == exclude_user:
-                # Echo back to sender for confirmation
-                response = {
-                    'type': 'user_message_sent',
-                    'timestamp': datetime.now(timezone.utc).isoformat(),
-                    'status': 'delivered' if len(self.conversations[conversation_id]) > 2 else 'stored'
-                }
-                try:
-                    await self.user_connections[user_id].send(json.dumps(response))
-                except websockets.exceptions.ConnectionClosed:
+                sender_socket = websocket
+            else:
+                recipients.append((user_id, websocket))
+
+        FAN_OUT_SIZE.observe(len(recipients))
+
+        # Encode once per codec; queued connections take the frame without
+        # waiting on the network and anything else is delivered concurrently
+        prepared = PreparedMessage(message)
+        direct = {}
+        for user_id, websocket in recipients:
+            queue = self.outbound_queues.get(websocket)
+            if queue is not None:
+                queue.put(self.encode_for(websocket, prepared))
+            else:
+                direct.setdefault(self.codec_for(websocket), []).append((user_id, websocket))
+        sends = [fan_out(group, prepared.encode(codec)) for codec, group in direct.items()]
+
+        if sender_socket is not None and echo:
+            # Echo back to sender for confirmation
+            response = {
+                'type': 'user_message_sent',
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'status': 'delivered' if len(members) > 2 else 'stored'
+            }
+            payload = self.encode_for(sender_socket, response)
+            queue = self.outbound_queues.get(sender_socket)
+            if queue is not None:
+                queue.put(payload)
+            else:
+                sends.append(fan_out([(exclude_user, sender_socket)], payload))
+
+        for failures in await asyncio.gather(*sends):
+            for user_id, reason in failures.items():
+                SEND_FAILURES.labels(reason=reason).inc()
+                if reason == "closed":
                     logger.info(f"Connection closed for user {user_id}")
                     self.remove_user(user_id)
-                continue
-                
+                else:
+                    logger.warning(f"Failed to deliver to user {user_id} in conversation {conversation_id}: {reason}")
+
+    def _handle_mark_read(self, message):
+        """
+        Clear the user's unread count for a conversation.
+
+        Parameters:
+            message (dict): Mark read message with user_id and conversation_id
+
+        Returns:
+            None
+        """
+        if not self.writer or not all(k in message for k in ['user_id', 'conversation_id']):
+            return
+        try:
+            self.writer.mark_read(message['conversation_id'], message['user_id'])
+        except ValueError:
+            logger.warning(f"Invalid mark_read for conversation {message['conversation_id']}")
+
+    def _mark_viewers_read(self, conversation_id):
+        """
+        Members connected to a conversation see its messages as they arrive,
+        so they are kept read rather than accumulating unread counts.
+        """
+        if not self.writer:
+            return
+        for user_id in self.conversations.get(conversation_id, ()):
             if user_id in self.user_connections:
                 try:
-                    await self.user_connections[user_id].send(json.dumps(message))
-                except websockets.exceptions.ConnectionClosed:
-                    logger.info(f"Connection closed for user {user_id}")
-                    self.remove_user(user_id)
+                    self.writer.mark_read(conversation_id, user_id)
+                except ValueError:
+                    continue
 
     async def _handle_leave_conversation(self, message):
         """
@@ -443,9 +1106,5 @@ class MessageHandler:
         conversation_id = message['conversation_id']
         
         if conversation_id in self.conversations and user_id in self.conversations[conversation_id]:
-            self.conversations[conversation_id].remove(user_id)
-            logger.info(f"User {user_id} left conversation {conversation_id}")
-            
-            # Remove conversation if empty
-            if not self.conversations[conversation_id]:
-                del self.conversations[conversation_id]
\ No newline at end of file
+            self._remove_member(conversation_id, user_id)
+            logger.info(f"User {user_id} left conversation {conversation_id}")
\ No newline at end of file
@@ -0,0 +1,293 @@
+import bisect
+import math
+import threading
+
+"""
+Minimal Prometheus-style metrics for the message service.
+
+Metrics are registered in REGISTRY when created and rendered in the
+Prometheus text exposition format by the /metrics endpoint. Counters and
+histograms are updated inline; counters and gauges can instead read their
+value from a callback at scrape time so live state such as connection
+counts or cache hits is never tracked twice.
+
+Reference: https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Registry():
+    """
+    Collection of metrics rendered together.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Returns:
+            str: Every registered metric in the Prometheus text format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+REGISTRY = Registry()
+
+class _Metric():
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values, **labels):
+        """
+        Return the child metric for a set of label values.
+        """
+        if labels:
+            values = tuple(str(labels[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels, use labels() first")
+        return self._children[()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return "\n".join(lines) + "\n"
+
+class _CounterValue():
+    __slots__ = ("value", "callback")
+
+    def __init__(self):
+        self.value = 0.0
+        self.callback = None
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self.value += amount
+
+    def set_function(self, callback):
+        self.callback = callback
+
+    def get(self):
+        return self.callback() if self.callback else self.value
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, exposed with a _total suffix. The count can
+    instead be read from a callback, for components that keep their own counters.
+    """
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def set_function(self, callback):
+        self._unlabelled().set_function(callback)
+
+    @property
+    def value(self):
+        return self._unlabelled().get()
+
+    def _render_child(self, values, child):
+        try:
+            value = child.get()
+        except Exception:
+            value = math.nan
+        return [f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(value)}"]
+
+class _GaugeValue():
+    __slots__ = ("value", "callback")
+
+    def __init__(self):
+        self.value = 0.0
+        self.callback = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, callback):
+        self.callback = callback
+
+    def get(self):
+        return self.callback() if self.callback else self.value
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down, optionally read from a callback at scrape time.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, callback=None):
+        super().__init__(name, documentation, labelnames, registry)
+        if callback is not None:
+            self.set_function(callback)
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def set_function(self, callback):
+        self._unlabelled().set_function(callback)
+
+    @property
+    def value(self):
+        return self._unlabelled().get()
+
+    def _render_child(self, values, child):
+        try:
+            value = child.get()
+        except Exception:
+            value = math.nan
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"]
+
+class _HistogramValue():
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over cumulative buckets.
+    """
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    @property
+    def count(self):
+        return self._unlabelled().count
+
+    @property
+    def sum(self):
+        return self._unlabelled().sum
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(child.buckets, child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values, [("le", "+Inf")])
+        lines.append(f"{self.name}_bucket{labels} {child.count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}")
+        return lines
+
+# Service metrics
+MESSAGES_RECEIVED = Counter(
+    "pendo_messages_received",
+    "WebSocket messages received, by message type",
+    labelnames=("type",)
+)
+FAN_OUT_SIZE = Histogram(
+    "pendo_fan_out_recipients",
+    "Local recipients per conversation broadcast",
+    buckets=SIZE_BUCKETS
+)
+SEND_FAILURES = Counter(
+    "pendo_send_failures",
+    "Frames that could not be delivered, by reason",
+    labelnames=("reason",)
+)
+HISTORY_LOADS = Counter(
+    "pendo_history_loads",
+    "History requests by whether they started a load or joined one in flight",
+    labelnames=("outcome",)
+)
+REPOSITORY_CALL_SECONDS = Histogram(
+    "pendo_repository_call_seconds",
+    "Repository call latency including executor queueing, by method",
+    labelnames=("method",)
+)
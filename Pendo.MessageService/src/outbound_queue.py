@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from enum import Enum
+import websockets
+from src.metrics import SEND_FAILURES
+
+logger = logging.getLogger(__name__)
+
+class SlowConsumerPolicy(str, Enum):
+    """
+    What to do when a connection's outbound queue is full.
+    """
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+OUTBOUND_QUEUE_SIZE = int(os.environ.get("WS_OUTBOUND_QUEUE_SIZE", "256"))
+SLOW_CONSUMER_POLICY = SlowConsumerPolicy(os.environ.get("WS_SLOW_CONSUMER_POLICY", SlowConsumerPolicy.DROP_OLDEST.value))
+
+class OutboundQueue():
+    """
+    Bounded outbound frame queue with a dedicated writer task for one connection.
+
+    Producers enqueue without waiting on the network, so a client on a bad
+    connection only ever delays itself. Frames sent with a coalesce key (such
+    as heartbeats) replace any queued frame with the same key rather than
+    queueing behind it. When the queue is full the slow consumer policy decides
+    whether to drop the oldest frame, evict coalescable frames first, or
+    disconnect the client.
+    """
+
+    def __init__(self, websocket, max_size=OUTBOUND_QUEUE_SIZE, policy=SLOW_CONSUMER_POLICY, on_disconnect=None):
+        """
+        Parameters:
+            websocket (websockets.WebSocketServerProtocol): Connection to write to
+            max_size (int): Maximum number of queued frames
+            policy (SlowConsumerPolicy): Behaviour when the queue is full
+            on_disconnect (callable): Called with the websocket whenever the writer stops on its own, as the client went away, was too slow or could not be written to
+        """
+        self.websocket = websocket
+        self.max_size = max_size
+        self.policy = SlowConsumerPolicy(policy)
+        self.on_disconnect = on_disconnect
+
+        self.dropped = 0
+        self._frames = deque()
+        self._keyed = {}
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put(self, payload, key=None):
+        """
+        Queue a frame for sending.
+
+        Parameters:
+            payload (str | bytes): Encoded frame
+            key (str): Optional coalesce key, a queued frame with the same key is replaced
+
+        Returns:
+            bool: True if the frame was queued or coalesced, False if it was rejected
+        """
+        if self._closed:
+            return False
+
+        if key is not None and key in self._keyed:
+            self._keyed[key][1] = payload
+            return True
+
+        if len(self._frames) >= self.max_size and not self._make_room():
+            return False
+
+        frame = [key, payload]
+        self._frames.append(frame)
+        if key is not None:
+            self._keyed[key] = frame
+
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    def _make_room(self):
+        if self.policy == SlowConsumerPolicy.DISCONNECT:
+            logger.warning(f"Outbound queue full for {id(self.websocket)}, disconnecting slow consumer")
+            SEND_FAILURES.labels(reason="slow_consumer").inc()
+            self._disconnect()
+            return False
+
+        if self.policy == SlowConsumerPolicy.COALESCE and self._keyed:
+            # Evict the oldest coalescable frame before touching regular messages
+            frame = next(f for f in self._frames if f[0] is not None)
+            self._frames.remove(frame)
+            del self._keyed[frame[0]]
+        else:
+            frame = self._frames.popleft()
+            if frame[0] is not None:
+                del self._keyed[frame[0]]
+
+        self.dropped += 1
+        SEND_FAILURES.labels(reason="dropped").inc()
+        return True
+
+    async def _run(self):
+        try:
+            while True:
+                while not self._frames:
+                    self._idle.set()
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                key, payload = self._frames.popleft()
+                if key is not None:
+                    del self._keyed[key]
+
+                await self.websocket.send(payload)
+        except websockets.exceptions.ConnectionClosed:
+            logger.info(f"Connection {id(self.websocket)} closed while writing")
+            SEND_FAILURES.labels(reason="closed").inc()
+            self._stop()
+            if self.on_disconnect:
+                self.on_disconnect(self.websocket)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Outbound writer for {id(self.websocket)} failed: {str(e)}")
+            SEND_FAILURES.labels(reason="error").inc()
+            # The writer is gone, so the client is closed and deregistered rather than left with a dead queue
+            self._stop()
+            asyncio.get_running_loop().create_task(self._close_socket(1011, "Outbound writer failed"))
+            if self.on_disconnect:
+                self.on_disconnect(self.websocket)
+        finally:
+            self._idle.set()
+
+    def _disconnect(self):
+        self._stop()
+        self._task.cancel()
+        asyncio.get_running_loop().create_task(self._close_socket(1008, "Slow consumer"))
+        if self.on_disconnect:
+            self.on_disconnect(self.websocket)
+
+    async def _close_socket(self, code, reason):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception as e:
+            logger.debug(f"Error closing connection {id(self.websocket)}: {str(e)}")
+
+    def _stop(self):
+        self._closed = True
+        self._frames.clear()
+        self._keyed.clear()
+
+    async def drain(self):
+        """
+        Wait until every queued frame has been handed to the websocket.
+        """
+        await self._idle.wait()
+
+    def close(self):
+        """
+        Stop the writer task and discard any queued frames.
+        """
+        self._stop()
+        self._task.cancel()
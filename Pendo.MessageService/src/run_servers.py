@@ -3,6 +3,7 @@ import logging
 import sys
 import signal
 from src import app
+from src.db.AsyncRepository import shutdown_db_executor
 
 # Set up logging
 # Derived from: https://docs.python.org/3/howto/logging.html
@@ -18,6 +19,13 @@ async def shutdown(signal, loop):
     """Gracefully shutdown the servers"""
     logger.info(f"Received exit signal {signal.name}...")
     logger.info("Shutting down servers...")
+
+    # Flush write-behind messages before tasks are cancelled
+    try:
+        await app.heartbeat_scheduler.stop()
+        await app.message_handler.shutdown()
+    except Exception as e:
+        logger.error(f"Error flushing message handler: {str(e)}")
     
     # Cancel all running tasks
     tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
@@ -26,6 +34,9 @@ async def shutdown(signal, loop):
     
     logger.info(f"Cancelling {len(tasks)} outstanding tasks")
     await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Let in-flight database calls finish before stopping the loop
+    shutdown_db_executor(wait=True)
     loop.stop()
     
 # Register signal handlers
@@ -0,0 +1,72 @@
+import logging
+import os
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Number of messages whose wire format is kept
+WIRE_CACHE_MAX_MESSAGES = int(os.environ.get("WIRE_CACHE_MAX_MESSAGES", "20000"))
+
+class WireCache():
+    """
+    LRU cache of stored messages in wire format, keyed by MessageId.
+
+    Stored message content never changes once written, so each message's
+    serialized dict and its JSON encoding are built once and reused by every
+    history response that includes it. Responses are then assembled by
+    joining the cached encodings rather than parsing and re-encoding rows.
+    """
+
+    def __init__(self, max_messages=WIRE_CACHE_MAX_MESSAGES):
+        """
+        Parameters:
+            max_messages (int): Maximum number of cached messages
+        """
+        self.max_messages = max_messages
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, message_id):
+        return message_id in self._entries
+
+    def get(self, message_id):
+        """
+        Parameters:
+            message_id (str): Message identifier
+
+        Returns:
+            tuple[dict, str] | None: The serialized message and its JSON encoding, or None on a miss
+        """
+        entry = self._entries.get(message_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(message_id)
+        return entry
+
+    def put(self, message_id, serialized, encoded):
+        """
+        Cache a message's wire format, evicting the least recently used message if full.
+
+        Parameters:
+            message_id (str): Message identifier
+            serialized (dict): Message in wire format
+            encoded (str): JSON encoding of the serialized message
+        """
+        self._entries[message_id] = (serialized, encoded)
+        self._entries.move_to_end(message_id)
+        while len(self._entries) > self.max_messages:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, message_id):
+        """
+        Drop a message, for example after it is edited or deleted.
+        """
+        self._entries.pop(message_id, None)
@@ -1,9 +1,11 @@
 import uuid
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from aiohttp.test_utils import AioHTTPTestCase
 from aiohttp import web
 
-from src.app import root_handler, health_check, user_conversations_handler, create_conversation_handler
+from src.app import root_handler, health_check, user_conversations_handler, create_conversation_handler, conversation_summaries_handler
+from src.db.MessageRepository import decode_cursor
 
 
 class TestHttpEndpoints(AioHTTPTestCase):
@@ -16,6 +18,8 @@ class TestHttpEndpoints(AioHTTPTestCase):
         self.mock_repo = MagicMock()
         self.mock_repo.create_conversation_with_participants = MagicMock()
         self.mock_repo.get_user_conversations = MagicMock()
+        self.mock_repo.find_conversation_by_participants = MagicMock(return_value=None)
+        self.mock_repo.get_conversation_summaries = MagicMock(return_value=[])
         
         app['repository'] = self.mock_repo
         
@@ -24,6 +28,7 @@ class TestHttpEndpoints(AioHTTPTestCase):
         app.router.add_get('/health', health_check)
         app.router.add_post('/user-conversations', user_conversations_handler)
         app.router.add_post('/create-conversation', create_conversation_handler)
+        app.router.add_post('/conversation-summaries', conversation_summaries_handler)
         
         # Patch the repository in the app module
         # Derived from: https://stackoverflow.com/questions/69192748/pytest-mocking-class-instance-passed-as-an-argument
@@ -120,6 +125,79 @@ class TestHttpEndpoints(AioHTTPTestCase):
         self.assertEqual(data['Type'], conversation_type)
         self.assertEqual(data['Name'], name)
     
+    async def test_create_conversation_returns_existing(self):
+        """Test that an existing conversation with the same participants is returned"""
+        participants = [str(uuid.uuid4())]
+        user_id = str(uuid.uuid4())
+
+        existing = MagicMock()
+        existing.ConversationId = uuid.uuid4()
+        existing.Type = "direct"
+        existing.Name = "Existing"
+        existing.CreateDate.isoformat.return_value = "2023-01-01T12:00:00Z"
+        existing.UpdateDate.isoformat.return_value = "2023-01-01T12:05:00Z"
+        self.mock_repo.find_conversation_by_participants.return_value = existing
+
+        resp = await self.client.post(
+            '/create-conversation',
+            json={
+                "ConversationType": "direct",
+                "participants": participants,
+                "UserId": user_id
+            }
+        )
+
+        self.assertEqual(resp.status, 200)
+        data = await resp.json()
+        self.assertEqual(data['ConversationId'], str(existing.ConversationId))
+        self.mock_repo.find_conversation_by_participants.assert_called_once_with(
+            [uuid.UUID(participants[0]), uuid.UUID(user_id)]
+        )
+        self.mock_repo.create_conversation_with_participants.assert_not_called()
+        self.mock_repo.get_user_conversations.assert_not_called()
+
+    async def test_conversation_summaries_handler(self):
+        """Test a page of conversation summaries and its next cursor"""
+        user_id = str(uuid.uuid4())
+        rows = []
+        for i in range(3):
+            conv = MagicMock()
+            conv.ConversationId = uuid.uuid4()
+            conv.Type = "direct"
+            conv.Name = f"Conversation {i}"
+            conv.CreateDate = datetime(2025, 1, 1)
+            conv.UpdateDate = datetime(2025, 1, 2, 12, 0, 3 - i)
+            conv.LastMessageAt = conv.UpdateDate if i == 0 else None
+            conv.LastMessagePreview = "See you at 9"
+            conv.LastMessageSenderId = uuid.uuid4()
+            participant = MagicMock()
+            participant.ConversationId = conv.ConversationId
+            participant.LastActivityAt = conv.UpdateDate
+            participant.UnreadCount = 2 - i
+            rows.append((conv, participant))
+        self.mock_repo.get_conversation_summaries.return_value = rows
+
+        resp = await self.client.post('/conversation-summaries', json={"UserId": user_id, "PageSize": 2})
+
+        self.assertEqual(resp.status, 200)
+        data = await resp.json()
+        self.mock_repo.get_conversation_summaries.assert_called_once_with(uuid.UUID(user_id), limit=3, before=None)
+        self.assertEqual([c['Name'] for c in data['conversations']], ["Conversation 0", "Conversation 1"])
+        self.assertEqual(data['conversations'][0]['UnreadCount'], 2)
+        self.assertEqual(data['conversations'][0]['LastMessage']['Preview'], "See you at 9")
+        self.assertIsNone(data['conversations'][1]['LastMessage'])
+        self.assertEqual(decode_cursor(data['NextCursor']), (rows[1][1].LastActivityAt, rows[1][1].ConversationId))
+
+    async def test_conversation_summaries_last_page(self):
+        """Test the last page has no next cursor and an invalid cursor is rejected"""
+        resp = await self.client.post('/conversation-summaries', json={"UserId": str(uuid.uuid4())})
+        data = await resp.json()
+        self.assertEqual(data, {"conversations": [], "NextCursor": None})
+
+        self.mock_repo.get_conversation_summaries.side_effect = ValueError("Invalid history cursor")
+        resp = await self.client.post('/conversation-summaries', json={"UserId": str(uuid.uuid4()), "Cursor": "bad"})
+        self.assertEqual(resp.status, 400)
+
     async def test_missing_fields_in_create_conversation(self):
         """Test validation for missing fields in create conversation"""
         resp = await self.client.post(
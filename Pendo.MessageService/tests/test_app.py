@@ -119,3 +119,16 @@ async def test_setup_ws_server():
         
         mock_serve.assert_called_once()
         assert result == "mock_server"
+
+
+@pytest.mark.asyncio
+async def test_metrics_handler():
+    """Test the metrics endpoint exposes service metrics in the Prometheus text format"""
+    response = await app.metrics_handler(MagicMock())
+
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    body = response.body.decode('utf-8')
+    assert "# TYPE pendo_ws_connections gauge" in body
+    assert "# TYPE pendo_repository_call_seconds histogram" in body
+    assert "pendo_registered_users " in body
@@ -0,0 +1,49 @@
+import pytest
+import threading
+from unittest.mock import MagicMock
+from concurrent.futures import ThreadPoolExecutor
+
+from src.db.AsyncRepository import AsyncRepository
+
+
+@pytest.mark.asyncio
+async def test_repository_methods_are_awaitable():
+    """Test repository methods are exposed as coroutines returning the original result"""
+    mock_repo = MagicMock()
+    mock_repo.get_conversation_by_id.return_value = "conversation"
+
+    result = await AsyncRepository(mock_repo).get_conversation_by_id("conv-1")
+
+    assert result == "conversation"
+    mock_repo.get_conversation_by_id.assert_called_once_with("conv-1")
+
+
+@pytest.mark.asyncio
+async def test_repository_calls_run_off_the_event_loop():
+    """Test blocking calls run on the executor rather than the event loop thread"""
+    loop_thread = threading.get_ident()
+    call_threads = []
+
+    class BlockingRepository:
+        def save_message(self, **kwargs):
+            call_threads.append(threading.get_ident())
+            return kwargs
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        result = await AsyncRepository(BlockingRepository(), executor=executor).save_message(content="hi")
+    finally:
+        executor.shutdown(wait=True)
+
+    assert result == {"content": "hi"}
+    assert call_threads and call_threads[0] != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_repository_exceptions_propagate():
+    """Test exceptions raised by the repository surface to the awaiting coroutine"""
+    mock_repo = MagicMock()
+    mock_repo.save_message.side_effect = ValueError("db down")
+
+    with pytest.raises(ValueError):
+        await AsyncRepository(mock_repo).save_message("conv", "user", "chat", "{}")
@@ -0,0 +1,51 @@
+import pytest
+
+from src.codec import JSON, CODECS, Codec, PreparedMessage, negotiate
+
+msgpack = pytest.importorskip("msgpack")
+
+
+def test_negotiate_defaults_to_json():
+    """Test connections that do not ask for a codec, or ask for an unknown one, use JSON"""
+    assert negotiate(None) is JSON
+    assert negotiate("cbor-unknown") is JSON
+
+
+def test_negotiate_picks_first_supported():
+    """Test the first supported codec in the client's preference list is chosen"""
+    codec = negotiate(["unknown", "msgpack", "json"])
+
+    assert codec.name == "msgpack"
+    assert codec.binary
+
+
+def test_incomplete_codec_cannot_be_created():
+    """Test a codec missing decode fails when created rather than on its first frame"""
+    class EncodeOnly(Codec):
+        name = "encode-only"
+
+        def encode(self, message):
+            return str(message)
+
+    with pytest.raises(TypeError):
+        EncodeOnly()
+
+
+def test_msgpack_round_trip():
+    """Test the binary codec carries the same message schema"""
+    codec = CODECS["msgpack"]
+    message = {"type": "chat", "content": "hello", "seq": 3, "meta": None}
+
+    frame = codec.encode(message)
+
+    assert isinstance(frame, bytes)
+    assert codec.decode(frame) == message
+
+
+def test_prepared_message_encodes_once_per_codec():
+    """Test a prepared message reuses its encoding and any supplied JSON encoding"""
+    prepared = PreparedMessage({"type": "heartbeat"}, json_encoding='{"type": "heartbeat"}')
+    codec = CODECS["msgpack"]
+
+    assert prepared.encode(JSON) == '{"type": "heartbeat"}'
+    assert prepared.encode(codec) is prepared.encode(codec)
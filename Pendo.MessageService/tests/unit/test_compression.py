@@ -0,0 +1,81 @@
+from websockets.frames import Frame, OP_TEXT, OP_CONT, OP_PING
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+
+from src.compression import ThresholdPerMessageDeflate, ThresholdPerMessageDeflateFactory, server_extensions
+
+
+def make_pair(threshold):
+    """Create a server extension with the given threshold and a plain client to decode its frames"""
+    server = ThresholdPerMessageDeflate(False, False, 12, 12, threshold=threshold)
+    client = PerMessageDeflate(False, False, 12, 12)
+    return server, client
+
+
+def test_small_messages_are_not_compressed():
+    """Test messages below the threshold are sent uncompressed"""
+    server, client = make_pair(threshold=100)
+    frame = Frame(OP_TEXT, b'{"type": "chat"}')
+
+    encoded = server.encode(frame)
+
+    assert encoded.rsv1 is False
+    assert encoded.data == frame.data
+    assert client.decode(encoded).data == frame.data
+
+
+def test_large_messages_are_compressed():
+    """Test messages above the threshold are compressed and decode intact"""
+    server, client = make_pair(threshold=100)
+    data = b'{"type": "history_response", "messages": [' + b'{"content": "hello"}, ' * 50 + b']}'
+
+    encoded = server.encode(Frame(OP_TEXT, data))
+
+    assert encoded.rsv1 is True
+    assert len(encoded.data) < len(data)
+    assert client.decode(encoded).data == data
+
+
+def test_skipped_messages_keep_the_compression_context_in_step():
+    """Test uncompressed messages in between do not break decoding of later compressed ones"""
+    server, client = make_pair(threshold=100)
+    large = b"x" * 500
+
+    for data in (large, b"small", large, b"tiny", large):
+        assert client.decode(server.encode(Frame(OP_TEXT, data))).data == data
+
+
+def test_fragmented_messages_are_compressed():
+    """Test a fragmented message is compressed across its frames"""
+    server, client = make_pair(threshold=100)
+
+    first = server.encode(Frame(OP_TEXT, b"abc", fin=False))
+    last = server.encode(Frame(OP_CONT, b"def"))
+
+    assert first.rsv1 is True
+    assert last.data != b"def"
+    assert client.decode(first).data + client.decode(last).data == b"abcdef"
+
+
+def test_control_frames_pass_through():
+    """Test control frames are never compressed"""
+    server, _ = make_pair(threshold=0)
+    frame = Frame(OP_PING, b"ping")
+
+    assert server.encode(frame) is frame
+
+
+def test_factory_negotiates_threshold_extension():
+    """Test the factory negotiates an extension carrying its threshold"""
+    factory = ThresholdPerMessageDeflateFactory(threshold=64, server_max_window_bits=12)
+
+    _, extension = factory.process_request_params([], [])
+
+    assert isinstance(extension, ThresholdPerMessageDeflate)
+    assert extension.threshold == 64
+    assert extension.local_max_window_bits == 12
+
+
+def test_negative_threshold_disables_compression():
+    """Test a negative threshold disables the extension"""
+    assert server_extensions(threshold=-1) == []
+    assert server_extensions(threshold=0)[0].threshold == 0
@@ -0,0 +1,67 @@
+import pytest
+
+from src.conversation_cache import ConversationCache
+
+
+def message(i):
+    return {"id": str(i), "content": f"message {i}", "timestamp": f"2025-01-01T12:00:{i:02d}"}
+
+
+def test_ring_buffer_keeps_latest_messages():
+    """Test each conversation keeps only its most recent messages"""
+    cache = ConversationCache(messages_per_conversation=3, authoritative=True)
+
+    for i in range(5):
+        cache.append("conv", message(i))
+
+    assert [m["id"] for m in cache["conv"]] == ["2", "3", "4"]
+    assert cache.message_count == 3
+
+
+def test_lru_eviction_by_conversation_budget():
+    """Test the least recently used conversation is evicted first"""
+    cache = ConversationCache(max_conversations=2, authoritative=True)
+
+    cache.append("a", message(1))
+    cache.append("b", message(2))
+    cache.lookup("a", 100)
+    cache.append("c", message(3))
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.evictions == 1
+
+
+def test_eviction_by_message_budget():
+    """Test conversations are evicted once the total message budget is exceeded"""
+    cache = ConversationCache(max_messages=4, authoritative=True)
+
+    for i in range(3):
+        cache.append("a", message(i))
+    for i in range(3):
+        cache.append("b", message(i))
+
+    assert "a" not in cache
+    assert cache.message_count == 3
+
+
+def test_live_messages_alone_do_not_answer_lookups():
+    """Test a database-backed cache misses until the conversation is seeded"""
+    cache = ConversationCache()
+    cache.append("conv", message(1))
+
+    assert cache.lookup("conv", 100) is None
+    assert cache.misses == 1
+
+    cache.seed("conv", [message(0)])
+    assert [m["id"] for m in cache.lookup("conv", 100)] == ["0", "1"]
+    assert cache.hits == 1
+
+
+def test_truncated_window_misses_when_too_short():
+    """Test a truncated conversation only answers lookups the buffer can fully cover"""
+    cache = ConversationCache(messages_per_conversation=5)
+    cache.seed("conv", [message(i) for i in range(5)], truncated=True)
+
+    assert cache.lookup("conv", 5) is not None
+    assert cache.lookup("conv", 10) is None
@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+import time
+import websockets
+
+from src.fan_out import fan_out
+
+
+class RecordingWebSocket:
+    """Mock WebSocket recording frames, optionally slow or closed"""
+
+    def __init__(self, delay=0, closed=False):
+        self.sent_messages = []
+        self.delay = delay
+        self.closed = closed
+
+    async def send(self, message):
+        if self.closed:
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent_messages.append(message)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_delivers_same_payload_to_all():
+    """Test every recipient receives the single encoded payload"""
+    sockets = {f"user-{i}": RecordingWebSocket() for i in range(5)}
+
+    failures = await fan_out(list(sockets.items()), '{"type": "chat"}')
+
+    assert failures == {}
+    for socket in sockets.values():
+        assert socket.sent_messages == ['{"type": "chat"}']
+
+
+@pytest.mark.asyncio
+async def test_slow_recipient_does_not_delay_others():
+    """Test a slow socket times out without holding up fast recipients"""
+    slow = RecordingWebSocket(delay=1)
+    fast = RecordingWebSocket()
+
+    started = time.perf_counter()
+    failures = await fan_out([("slow", slow), ("fast", fast)], "payload", timeout=0.05)
+    elapsed = time.perf_counter() - started
+
+    assert failures == {"slow": "slow"}
+    assert fast.sent_messages == ["payload"]
+    assert elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_closed_recipient_reported():
+    """Test closed connections are reported so they can be cleaned up"""
+    failures = await fan_out([("gone", RecordingWebSocket(closed=True)), ("here", RecordingWebSocket())], "payload")
+
+    assert failures == {"gone": "closed"}
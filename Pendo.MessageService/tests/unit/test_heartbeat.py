@@ -0,0 +1,128 @@
+import json
+import pytest
+
+from src.codec import JSON
+from src.heartbeat import HeartbeatScheduler
+
+
+class MockWebSocket:
+    """Mock WebSocket with a closed flag"""
+
+    def __init__(self, closed=False):
+        self.closed = closed
+
+
+class Recorder:
+    """Records heartbeat sends"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, websocket, payload, key=None):
+        self.sent.append((websocket, payload, key))
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_sent_once_per_interval():
+    """Test an idle connection gets one heartbeat per turn of the wheel"""
+    recorder = Recorder()
+    scheduler = HeartbeatScheduler(recorder.send, interval=0, slots=4)
+    socket = MockWebSocket()
+    scheduler.add(socket)
+
+    for _ in range(8):
+        await scheduler.tick()
+
+    assert len(recorder.sent) == 2
+    websocket, payload, key = recorder.sent[0]
+    assert websocket is socket
+    assert key == "heartbeat"
+    assert json.loads(payload.encode(JSON))["type"] == "heartbeat"
+
+
+@pytest.mark.asyncio
+async def test_connections_spread_across_slots():
+    """Test connections added at different ticks are serviced on different ticks"""
+    recorder = Recorder()
+    scheduler = HeartbeatScheduler(recorder.send, interval=0, slots=4)
+    first, second = MockWebSocket(), MockWebSocket()
+
+    scheduler.add(first)
+    await scheduler.tick()
+    scheduler.add(second)
+
+    sent_per_tick = []
+    for _ in range(4):
+        recorder.sent.clear()
+        await scheduler.tick()
+        sent_per_tick.append([ws for ws, _, _ in recorder.sent])
+
+    assert sent_per_tick.count([first]) == 1
+    assert sent_per_tick.count([second]) == 1
+
+
+@pytest.mark.asyncio
+async def test_active_connection_skips_heartbeat():
+    """Test a connection with recent activity is not sent a heartbeat"""
+    recorder = Recorder()
+    scheduler = HeartbeatScheduler(recorder.send, interval=60, slots=4)
+    socket = MockWebSocket()
+    scheduler.add(socket)
+
+    for _ in range(4):
+        scheduler.touch(socket)
+        await scheduler.tick()
+
+    assert recorder.sent == []
+
+
+@pytest.mark.asyncio
+async def test_dead_connection_reported_and_removed():
+    """Test a closed connection is reported once and no longer tracked"""
+    recorder = Recorder()
+    dead = []
+    scheduler = HeartbeatScheduler(recorder.send, on_dead=dead.append, interval=0, slots=2)
+    socket = MockWebSocket()
+    scheduler.add(socket)
+    socket.closed = True
+
+    for _ in range(4):
+        await scheduler.tick()
+
+    assert dead == [socket]
+    assert len(scheduler) == 0
+    assert recorder.sent == []
+
+
+@pytest.mark.asyncio
+async def test_failed_send_does_not_stop_tick():
+    """Test one failing heartbeat send does not prevent others"""
+    sent = []
+
+    async def send(websocket, payload, key=None):
+        if websocket.closed is None:
+            raise RuntimeError("send failed")
+        sent.append(websocket)
+
+    scheduler = HeartbeatScheduler(send, interval=0, slots=1)
+    failing, healthy = MockWebSocket(closed=None), MockWebSocket()
+    scheduler.add(failing)
+    scheduler.add(healthy)
+
+    assert await scheduler.tick() == 2
+    assert sent == [healthy]
+
+
+@pytest.mark.asyncio
+async def test_removed_connection_not_serviced():
+    """Test removing a connection stops its heartbeats"""
+    recorder = Recorder()
+    scheduler = HeartbeatScheduler(recorder.send, interval=0, slots=2)
+    socket = MockWebSocket()
+    scheduler.add(socket)
+    scheduler.remove(socket)
+
+    for _ in range(4):
+        await scheduler.tick()
+
+    assert recorder.sent == []
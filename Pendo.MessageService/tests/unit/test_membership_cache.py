@@ -0,0 +1,57 @@
+from src.membership_cache import MembershipCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_member_known_until_ttl_expires():
+    """Test a confirmed participant is known for the TTL and then checked again"""
+    clock = FakeClock()
+    cache = MembershipCache(ttl=10, clock=clock)
+
+    assert not cache.is_member("c", "u")
+    cache.add_member("c", "u")
+    clock.now = 9.9
+
+    assert cache.is_member("c", "u")
+    assert cache.has_conversation("c")
+    assert not cache.is_member("c", "other")
+
+    clock.now = 10
+    assert not cache.is_member("c", "u")
+    assert cache.hits == 2
+    assert cache.misses == 3
+
+
+def test_invalidate_member_and_conversation():
+    """Test invalidating one membership, then a whole conversation"""
+    cache = MembershipCache(ttl=60)
+    cache.add_member("c", "a")
+    cache.add_member("c", "b")
+    cache.add_member("d", "a")
+
+    cache.invalidate("c", "a")
+    assert not cache.is_member("c", "a")
+    assert cache.is_member("c", "b")
+
+    cache.invalidate("c")
+    assert not cache.has_conversation("c")
+    assert not cache.is_member("c", "b")
+    assert cache.is_member("d", "a")
+
+
+def test_oldest_entries_evicted_when_full():
+    """Test the least recently confirmed entries are evicted past the size limit"""
+    cache = MembershipCache(ttl=60, max_entries=2)
+    for user_id in ("a", "b", "c"):
+        cache.add_member("c", user_id)
+
+    assert not cache.is_member("c", "a")
+    assert cache.is_member("c", "b")
+    assert cache.is_member("c", "c")
+    assert cache.evictions == 1
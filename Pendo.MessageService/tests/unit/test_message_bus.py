@@ -0,0 +1,183 @@
+import asyncio
+import json
+import pytest
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+from src.message_bus import MessageBus, LocalBus, UnixSocketBus, create_bus
+from src.message_handler import MessageHandler
+
+
+class MockWebSocket:
+    """Mock WebSocket for testing"""
+
+    def __init__(self):
+        self.sent_messages = []
+
+    async def send(self, message):
+        self.sent_messages.append(message)
+
+
+async def wait_for(condition, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_users_on_other_nodes():
+    """Test a chat message sent on one node is delivered to a member connected to another"""
+    channel = str(uuid.uuid4())
+    node1 = MessageHandler(bus=LocalBus(channel))
+    node2 = MessageHandler(bus=LocalBus(channel))
+    await node1.start()
+    await node2.start()
+
+    conversation_id = str(uuid.uuid4())
+    sender, receiver = str(uuid.uuid4()), str(uuid.uuid4())
+    sender_socket, receiver_socket = MockWebSocket(), MockWebSocket()
+
+    node1.register_user(sender, sender_socket)
+    node1._add_member(conversation_id, sender)
+    node2.register_user(receiver, receiver_socket)
+    node2._add_member(conversation_id, receiver)
+
+    await node1._handle_chat_message({
+        "type": "chat",
+        "from": sender,
+        "conversation_id": conversation_id,
+        "content": "Hello from node 1"
+    })
+    await wait_for(lambda: receiver_socket.sent_messages)
+    await node1.drain()
+
+    delivered = json.loads(receiver_socket.sent_messages[0])
+    assert delivered["content"] == "Hello from node 1"
+    assert [json.loads(m)["type"] for m in sender_socket.sent_messages] == ["user_message_sent"]
+
+    # The receiving node keeps its authoritative store in step
+    assert node2.message_store[conversation_id][0]["content"] == "Hello from node 1"
+
+    await node1.shutdown()
+    await node2.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_local_bus_does_not_echo_to_publisher():
+    """Test a node never receives its own publications"""
+    channel = str(uuid.uuid4())
+    received = []
+
+    async def on_message(envelope):
+        received.append(envelope)
+
+    bus = LocalBus(channel)
+    await bus.start(on_message)
+    await bus.publish({"origin": bus.node_id, "conversation_id": "c"})
+    await asyncio.sleep(0.01)
+
+    assert received == []
+    await bus.close()
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_bus_exchanges_envelopes(tmp_path):
+    """Test two UNIX socket bus nodes in a shared directory exchange envelopes"""
+    received = []
+
+    async def on_message(envelope):
+        received.append(envelope)
+
+    async def ignore(envelope):
+        pass
+
+    node1 = UnixSocketBus(str(tmp_path))
+    node2 = UnixSocketBus(str(tmp_path))
+    await node1.start(ignore)
+    await node2.start(on_message)
+
+    await node1.publish({"origin": node1.node_id, "conversation_id": "c", "message": {"content": "hi"}})
+    await wait_for(lambda: received)
+
+    assert received[0]["message"] == {"content": "hi"}
+
+    await node1.close()
+    await node2.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_bus_sends_fallback_for_oversized_envelope(tmp_path):
+    """Test an envelope over the datagram limit is replaced by its fallback"""
+    received = []
+
+    async def on_message(envelope):
+        received.append(envelope)
+
+    async def ignore(envelope):
+        pass
+
+    node1 = UnixSocketBus(str(tmp_path), max_datagram=256)
+    node2 = UnixSocketBus(str(tmp_path))
+    await node1.start(ignore)
+    await node2.start(on_message)
+
+    fallback = {"origin": node1.node_id, "conversation_id": "c", "seq": 3, "invalidate": True}
+    await node1.publish({"origin": node1.node_id, "conversation_id": "c", "message": {"content": "x" * 1000}}, fallback=fallback)
+    await wait_for(lambda: received)
+
+    assert received == [fallback]
+
+    await node1.close()
+    await node2.close()
+
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_remote_cache_and_keeps_sequence():
+    """Test a node told a broadcast was lost stops serving its cached copy of the conversation"""
+    handler = MessageHandler(repository=MagicMock())
+    conversation_id = str(uuid.uuid4())
+    handler.message_store.seed(conversation_id, [{"id": "1", "seq": 1, "content": "hi"}])
+
+    await handler._on_bus_message({"origin": "other", "conversation_id": conversation_id, "seq": 2, "invalidate": True})
+
+    assert conversation_id not in handler.message_store
+    assert handler._sequence_floors[conversation_id] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_sends_invalidation():
+    """Test a broadcast the bus fails to publish is followed by its invalidation"""
+    bus = LocalBus(str(uuid.uuid4()))
+    bus.publish = AsyncMock(side_effect=[OSError("message too long"), None])
+    handler = MessageHandler(bus=bus)
+    conversation_id = str(uuid.uuid4())
+
+    await handler._broadcast_to_conversation(conversation_id, {"type": "chat", "seq": 5})
+
+    assert bus.publish.call_args.args[0] == {
+        "origin": bus.node_id,
+        "conversation_id": conversation_id,
+        "seq": 5,
+        "invalidate": True
+    }
+
+
+def test_create_bus_defaults_to_single_node():
+    """Test no bus is created unless one is configured"""
+    assert create_bus("none") is None
+    assert isinstance(create_bus("local"), LocalBus)
+    with pytest.raises(ValueError):
+        create_bus("carrier-pigeon")
+
+
+def test_incomplete_bus_cannot_be_created():
+    """Test a backend missing publish fails when created rather than on its first broadcast"""
+    class ReceiveOnlyBus(MessageBus):
+        async def start(self, on_message):
+            await super().start(on_message)
+
+    with pytest.raises(TypeError):
+        ReceiveOnlyBus()
@@ -1,7 +1,8 @@
+import asyncio
 import json
 import pytest
 from unittest.mock import MagicMock, AsyncMock
-from src.message_handler import MessageHandler
+from src.message_handler import MessageHandler, RESUME_MAX_REPLAY
 import uuid
 from datetime import datetime
 
@@ -255,7 +256,567 @@ async def test_broadcast_to_conversation(message_handler):
     }
     
     await handler._broadcast_to_conversation(conversation_id, message, exclude_user=user1_id)
+    await handler.drain()
     
     assert len(sent_messages[user1_id]) == 1
     assert len(sent_messages[user2_id]) == 1
     assert len(sent_messages[user3_id]) == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_message_persisted_write_behind(message_handler):
+    """Test chat messages are queued and persisted in a batch on shutdown"""
+    handler, mock_repo = message_handler
+    handler._broadcast_to_conversation = AsyncMock()
+    mock_repo.get_last_sequence_number.return_value = 0
+
+    conversation_id = str(uuid.uuid4())
+    for i in range(2):
+        await handler._handle_chat_message({
+            "type": "chat",
+            "from": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "content": f"message {i}"
+        })
+
+    mock_repo.save_messages.assert_not_called()
+
+    await handler.shutdown()
+
+    mock_repo.save_messages.assert_called_once()
+    assert len(mock_repo.save_messages.call_args[0][0]) == 2
+
+
+@pytest.mark.asyncio
+async def test_registered_connection_gets_outbound_queue(message_handler):
+    """Test registering a user creates an outbound queue that is closed on removal"""
+    handler, _ = message_handler
+    user_id = str(uuid.uuid4())
+    mock_socket = MockWebSocket()
+
+    handler.register_user(user_id, mock_socket)
+    queue = handler.outbound_queues[mock_socket]
+
+    await handler.send(mock_socket, "frame")
+    await handler.drain()
+    assert mock_socket.sent_messages == ["frame"]
+
+    handler.remove_user(user_id)
+    assert mock_socket not in handler.outbound_queues
+    assert queue.closed
+
+
+@pytest.mark.asyncio
+async def test_history_request_served_from_cache(message_handler):
+    """Test a repeated history request is answered from the cache including live messages"""
+    handler, mock_repo = message_handler
+    handler._broadcast_to_conversation = AsyncMock()
+    conversation_id = str(uuid.uuid4())
+
+    stored = MagicMock()
+    stored.MessageId = uuid.uuid4()
+    stored.ConversationId = conversation_id
+    stored.SenderId = "test-user-1"
+    stored.MessageType = "chat"
+    stored.Content = "Stored message"
+    stored.CreateDate = datetime(2025, 1, 1, 12, 0, 0)
+    mock_repo.get_messages_by_conversation_id.return_value = [stored]
+
+    socket = MockWebSocket()
+    request = {"conversation_id": conversation_id, "user_id": str(uuid.uuid4())}
+
+    await handler._handle_history_request(socket, request)
+    await handler._handle_chat_message({
+        "type": "chat",
+        "from": str(uuid.uuid4()),
+        "conversation_id": conversation_id,
+        "content": "Live message"
+    })
+    await handler._handle_history_request(socket, request)
+
+    mock_repo.get_messages_by_conversation_id.assert_called_once()
+    second = json.loads(socket.sent_messages[1])
+    assert [m["content"] for m in second["messages"]] == ["Live message", "Stored message"]
+    assert handler.message_store.hits == 1
+    assert handler.message_store.misses == 1
+
+
+def make_stored_message(conversation_id, content, create_date):
+    stored = MagicMock()
+    stored.MessageId = uuid.uuid4()
+    stored.ConversationId = conversation_id
+    stored.SenderId = "test-user"
+    stored.MessageType = "chat"
+    stored.Content = content
+    stored.CreateDate = create_date
+    return stored
+
+
+@pytest.mark.asyncio
+async def test_history_request_pages_with_before_cursor(message_handler):
+    """Test an older page is loaded with a keyset cursor and reports has_more"""
+    from src.db.MessageRepository import encode_cursor, decode_cursor
+
+    handler, mock_repo = message_handler
+    conversation_id = str(uuid.uuid4())
+    rows = [make_stored_message(conversation_id, f"message {i}", datetime(2025, 1, 1, 12, 0, 10 - i)) for i in range(3)]
+    mock_repo.get_messages_by_conversation_id.return_value = rows
+
+    cursor = encode_cursor(datetime(2025, 1, 1, 12, 0, 30), uuid.uuid4())
+    socket = MockWebSocket()
+    await handler._handle_history_request(socket, {
+        "conversation_id": conversation_id,
+        "user_id": str(uuid.uuid4()),
+        "before": cursor,
+        "page_size": 2
+    })
+
+    kwargs = mock_repo.get_messages_by_conversation_id.call_args.kwargs
+    assert kwargs["limit"] == 3
+    assert kwargs["before"] == decode_cursor(cursor)
+    assert kwargs["after"] is None
+
+    response = json.loads(socket.sent_messages[0])
+    assert [m["content"] for m in response["messages"]] == ["message 0", "message 1"]
+    assert response["has_more"] is True
+    assert decode_cursor(response["before_cursor"]) == (rows[1].CreateDate, rows[1].MessageId)
+
+
+@pytest.mark.asyncio
+async def test_history_request_since_timestamp_filters_in_sql(message_handler):
+    """Test since_timestamp is pushed into the query as an after cursor"""
+    handler, mock_repo = message_handler
+    conversation_id = str(uuid.uuid4())
+    mock_repo.get_messages_by_conversation_id.return_value = []
+
+    socket = MockWebSocket()
+    await handler._handle_history_request(socket, {
+        "conversation_id": conversation_id,
+        "user_id": str(uuid.uuid4()),
+        "since_timestamp": "2025-01-01T12:00:00Z"
+    })
+
+    kwargs = mock_repo.get_messages_by_conversation_id.call_args.kwargs
+    assert kwargs["after"] == (datetime(2025, 1, 1, 12, 0, 0), None)
+    response = json.loads(socket.sent_messages[0])
+    assert response["messages"] == []
+    assert response["has_more"] is False
+
+
+@pytest.mark.asyncio
+async def test_history_request_rejects_invalid_cursor(message_handler):
+    """Test a malformed cursor returns an error without querying the database"""
+    handler, mock_repo = message_handler
+    socket = MockWebSocket()
+
+    await handler._handle_history_request(socket, {
+        "conversation_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "before": "not-a-cursor"
+    })
+
+    mock_repo.get_messages_by_conversation_id.assert_not_called()
+    assert json.loads(socket.sent_messages[0])["type"] == "error"
+
+
+@pytest.mark.asyncio
+async def test_remove_user_uses_membership_index(message_handler):
+    """Test removing a user drops only their own memberships via the reverse index"""
+    handler, _ = message_handler
+    user_id = str(uuid.uuid4())
+    other_id = str(uuid.uuid4())
+    shared, solo = str(uuid.uuid4()), str(uuid.uuid4())
+
+    handler.register_user(user_id, MockWebSocket())
+    handler.register_user(other_id, MockWebSocket())
+    handler._add_member(shared, user_id)
+    handler._add_member(shared, other_id)
+    handler._add_member(solo, user_id)
+
+    assert handler.user_conversations[user_id] == {shared, solo}
+
+    handler.remove_user(user_id)
+
+    assert handler.conversations == {shared: {other_id}}
+    assert user_id not in handler.user_conversations
+    assert handler.user_conversations[other_id] == {shared}
+
+
+@pytest.mark.asyncio
+async def test_remove_connection_ignores_replaced_socket(message_handler):
+    """Test cleaning up a replaced socket leaves the user's new connection registered"""
+    handler, _ = message_handler
+    user_id = str(uuid.uuid4())
+    old_socket, new_socket = MockWebSocket(), MockWebSocket()
+
+    handler.register_user(user_id, old_socket)
+    handler.register_user(user_id, new_socket)
+    handler.remove_connection(old_socket)
+
+    assert handler.user_connections[user_id] is new_socket
+    assert handler.socket_users == {new_socket: user_id}
+
+    handler.remove_connection(new_socket)
+    assert user_id not in handler.user_connections
+    assert handler.socket_users == {}
+
+
+@pytest.mark.asyncio
+async def test_resume_returns_only_missed_messages():
+    """Test a client resuming from its last sequence number only receives the gap"""
+    handler = MessageHandler(repository=None)
+    conversation_id = str(uuid.uuid4())
+    sender = str(uuid.uuid4())
+
+    for i in range(4):
+        await handler._handle_chat_message({
+            "type": "chat",
+            "from": sender,
+            "conversation_id": conversation_id,
+            "content": f"message {i}"
+        })
+
+    socket = MockWebSocket()
+    await handler._handle_history_request(socket, {
+        "conversation_id": conversation_id,
+        "user_id": str(uuid.uuid4()),
+        "last_seq": 2
+    })
+
+    response = json.loads(socket.sent_messages[0])
+    assert response["resumed"] is True
+    assert [m["seq"] for m in response["messages"]] == [4, 3]
+    assert [m["content"] for m in response["messages"]] == ["message 3", "message 2"]
+
+
+@pytest.mark.asyncio
+async def test_resume_up_to_date_sends_nothing():
+    """Test a client that has seen every message gets an empty resume response"""
+    handler = MessageHandler(repository=None)
+    conversation_id = str(uuid.uuid4())
+    await handler._handle_chat_message({
+        "type": "chat",
+        "from": str(uuid.uuid4()),
+        "conversation_id": conversation_id,
+        "content": "hello"
+    })
+
+    socket = MockWebSocket()
+    await handler._handle_history_request(socket, {
+        "conversation_id": conversation_id,
+        "user_id": str(uuid.uuid4()),
+        "last_seq": 1
+    })
+
+    response = json.loads(socket.sent_messages[0])
+    assert response["resumed"] is True
+    assert response["messages"] == []
+
+
+@pytest.mark.asyncio
+async def test_resume_falls_back_to_full_history(monkeypatch):
+    """Test a gap larger than the replay limit falls back to the latest page"""
+    monkeypatch.setattr("src.message_handler.RESUME_MAX_REPLAY", 2)
+    handler = MessageHandler(repository=None)
+    conversation_id = str(uuid.uuid4())
+
+    for i in range(5):
+        await handler._handle_chat_message({
+            "type": "chat",
+            "from": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "content": f"message {i}"
+        })
+
+    socket = MockWebSocket()
+    await handler._handle_history_request(socket, {
+        "conversation_id": conversation_id,
+        "user_id": str(uuid.uuid4()),
+        "last_seq": 1
+    })
+
+    response = json.loads(socket.sent_messages[0])
+    assert response["resumed"] is False
+    assert len(response["messages"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_sequence_continues_from_database(message_handler):
+    """Test sequence numbers continue from the highest stored number"""
+    handler, mock_repo = message_handler
+    handler._broadcast_to_conversation = AsyncMock()
+    mock_repo.get_last_sequence_number.return_value = 41
+    conversation_id = str(uuid.uuid4())
+
+    for _ in range(2):
+        await handler._handle_chat_message({
+            "type": "chat",
+            "from": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "content": "hello"
+        })
+    await handler.writer.flush()
+
+    mock_repo.get_last_sequence_number.assert_called_once_with(conversation_id)
+    rows = mock_repo.save_messages.call_args.args[0]
+    assert [row["SequenceNumber"] for row in rows] == [42, 43]
+    assert handler._broadcast_to_conversation.call_args.args[1]["seq"] == 43
+
+
+@pytest.mark.asyncio
+async def test_sequence_observed_before_load_is_a_floor(message_handler):
+    """Test a number seen on the bus before the first load is not reused when the database lags"""
+    handler, mock_repo = message_handler
+    mock_repo.get_last_sequence_number.return_value = 4
+    conversation_id = str(uuid.uuid4())
+
+    handler._observe_sequence(conversation_id, 7)
+
+    assert await handler._next_sequence(conversation_id) == 8
+    mock_repo.get_last_sequence_number.assert_called_once_with(conversation_id)
+
+
+@pytest.mark.asyncio
+async def test_sequences_evicted_least_recently_used(message_handler):
+    """Test sequence counters are bounded by the message cache's conversation budget"""
+    handler, mock_repo = message_handler
+    mock_repo.get_last_sequence_number.return_value = 0
+    handler.message_store.max_conversations = 2
+    first, second, third = (str(uuid.uuid4()) for _ in range(3))
+
+    await handler._next_sequence(first)
+    await handler._next_sequence(second)
+    await handler._next_sequence(first)
+    await handler._next_sequence(third)
+    for conversation_id in (first, second, third):
+        handler._observe_sequence(conversation_id + "-remote", 1)
+
+    assert list(handler.sequences) == [first, third]
+    assert len(handler._sequence_floors) == 2
+
+
+@pytest.mark.asyncio
+async def test_evicted_sequence_reloads_after_queued_rows_are_written(message_handler):
+    """Test a counter evicted while its rows are still queued does not hand out a number again"""
+    handler, mock_repo = message_handler
+    handler._broadcast_to_conversation = AsyncMock()
+    handler.message_store.max_conversations = 1
+    saved = []
+    mock_repo.save_messages.side_effect = saved.extend
+    mock_repo.get_last_sequence_number.side_effect = lambda conversation_id: max(
+        [row["SequenceNumber"] for row in saved if str(row["ConversationId"]) == str(conversation_id)], default=0
+    )
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+
+    for conversation_id in (first, second, first):
+        await handler._handle_chat_message({
+            "type": "chat",
+            "from": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "content": "hello"
+        })
+    await handler.writer.flush()
+
+    assert [(str(row["ConversationId"]), row["SequenceNumber"]) for row in saved] == [(first, 1), (second, 1), (first, 2)]
+
+
+@pytest.mark.asyncio
+async def test_resume_loads_gap_from_database(message_handler):
+    """Test a gap not held in the cache is loaded by sequence number"""
+    handler, mock_repo = message_handler
+    conversation_id = str(uuid.uuid4())
+    mock_repo.get_last_sequence_number.return_value = 12
+    rows = []
+    for seq in (11, 12):
+        row = make_stored_message(conversation_id, f"message {seq}", datetime(2025, 1, 1, 12, 0, seq))
+        row.SequenceNumber = seq
+        rows.append(row)
+    mock_repo.get_messages_since_sequence.return_value = rows
+
+    socket = MockWebSocket()
+    await handler._handle_history_request(socket, {
+        "conversation_id": conversation_id,
+        "user_id": str(uuid.uuid4()),
+        "last_seq": 10
+    })
+
+    mock_repo.get_messages_since_sequence.assert_called_once_with(conversation_id, 10, limit=RESUME_MAX_REPLAY + 1)
+    mock_repo.get_messages_by_conversation_id.assert_not_called()
+    response = json.loads(socket.sent_messages[0])
+    assert response["resumed"] is True
+    assert [m["seq"] for m in response["messages"]] == [12, 11]
+
+
+class SlowHistoryDb:
+    """Async repository stand-in whose history query waits until released"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def get_messages_by_conversation_id(self, conversation_id, **kwargs):
+        self.calls += 1
+        await self.release.wait()
+        return self.rows
+
+
+@pytest.mark.asyncio
+async def test_concurrent_history_requests_share_one_load(message_handler):
+    """Test identical history requests in flight together share one query and payload"""
+    handler, _ = message_handler
+    conversation_id = str(uuid.uuid4())
+    handler.db = SlowHistoryDb([make_stored_message(conversation_id, "hello", datetime(2025, 1, 1, 12, 0, 0))])
+
+    sockets = [MockWebSocket() for _ in range(5)]
+    requests = [
+        asyncio.create_task(handler._handle_history_request(socket, {
+            "conversation_id": conversation_id,
+            "user_id": str(uuid.uuid4())
+        }))
+        for socket in sockets
+    ]
+    await asyncio.sleep(0)
+    handler.db.release.set()
+    await asyncio.gather(*requests)
+
+    assert handler.db.calls == 1
+    payloads = {socket.sent_messages[0] for socket in sockets}
+    assert len(payloads) == 1
+    assert json.loads(payloads.pop())["messages"][0]["content"] == "hello"
+    assert handler._history_loads == {}
+
+
+@pytest.mark.asyncio
+async def test_history_requests_with_different_cursors_not_shared(message_handler):
+    """Test requests for different pages each run their own query"""
+    from src.db.MessageRepository import encode_cursor
+
+    handler, _ = message_handler
+    conversation_id = str(uuid.uuid4())
+    handler.db = SlowHistoryDb([])
+    handler.db.release.set()
+
+    for second in (10, 20):
+        await handler._handle_history_request(MockWebSocket(), {
+            "conversation_id": conversation_id,
+            "user_id": str(uuid.uuid4()),
+            "before": encode_cursor(datetime(2025, 1, 1, 12, 0, second), uuid.uuid4())
+        })
+
+    assert handler.db.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_history_pages_reuse_cached_wire_format(message_handler):
+    """Test rows seen before are not serialized again and responses stay valid JSON"""
+    from src.db.MessageRepository import encode_cursor
+
+    handler, mock_repo = message_handler
+    conversation_id = str(uuid.uuid4())
+    rows = [make_stored_message(conversation_id, json.dumps({"text": f"message {i}"}), datetime(2025, 1, 1, 12, 0, 10 - i)) for i in range(3)]
+    mock_repo.get_messages_by_conversation_id.return_value = rows
+
+    serialize = MagicMock(wraps=handler.serialize_message)
+    handler.serialize_message = serialize
+    socket = MockWebSocket()
+    for second in (30, 40):
+        await handler._handle_history_request(socket, {
+            "conversation_id": conversation_id,
+            "user_id": str(uuid.uuid4()),
+            "before": encode_cursor(datetime(2025, 1, 1, 12, 0, second), uuid.uuid4())
+        })
+
+    assert serialize.call_count == 3
+    first, second = (json.loads(frame) for frame in socket.sent_messages)
+    assert first == second
+    assert [m["content"] for m in first["messages"]] == ["message 0", "message 1", "message 2"]
+    assert first["type"] == "history_response"
+    assert first["has_more"] is False
+
+
+@pytest.mark.asyncio
+async def test_register_negotiates_binary_codec():
+    """Test a connection registered with msgpack receives binary frames with the same schema"""
+    msgpack = pytest.importorskip("msgpack")
+
+    handler = MessageHandler(repository=None)
+    conversation_id = str(uuid.uuid4())
+    binary_user, json_user, sender = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    binary_socket, json_socket = MockWebSocket(), MockWebSocket()
+
+    await handler.handle_message(binary_socket, json.dumps({"register": True, "user_id": binary_user, "codec": ["msgpack"]}))
+    await handler.handle_message(json_socket, json.dumps({"register": True, "user_id": json_user}))
+    await handler.drain()
+    assert isinstance(binary_socket.sent_messages[0], str)
+    assert json.loads(binary_socket.sent_messages[0]) == {"type": "codec_selected", "codec": "msgpack"}
+
+    for user_id in (binary_user, json_user):
+        handler._add_member(conversation_id, user_id)
+    await handler.handle_message(binary_socket, msgpack.packb({
+        "type": "chat",
+        "from": sender,
+        "conversation_id": conversation_id,
+        "content": "hello"
+    }))
+    await handler.drain()
+
+    binary_frame = binary_socket.sent_messages[-1]
+    assert isinstance(binary_frame, bytes)
+    assert msgpack.unpackb(binary_frame) == json.loads(json_socket.sent_messages[-1])
+    await handler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_connected_members_are_kept_read(message_handler):
+    """Test members connected to a conversation are marked read as messages arrive"""
+    handler, mock_repo = message_handler
+    handler._broadcast_to_conversation = AsyncMock()
+    mock_repo.get_last_sequence_number.return_value = 0
+    conversation_id = str(uuid.uuid4())
+    sender, viewer, offline = (str(uuid.uuid4()) for _ in range(3))
+    handler.register_user(sender, MockWebSocket())
+    handler.register_user(viewer, MockWebSocket())
+    for user_id in (sender, viewer, offline):
+        handler._add_member(conversation_id, user_id)
+
+    await handler._handle_chat_message({
+        "type": "chat",
+        "from": sender,
+        "conversation_id": conversation_id,
+        "content": "hello"
+    })
+    await handler.handle_message(MockWebSocket(), json.dumps({
+        "type": "mark_read",
+        "user_id": offline,
+        "conversation_id": conversation_id
+    }))
+    await handler.writer.flush()
+
+    reads = mock_repo.mark_conversations_read.call_args.args[0]
+    assert {str(user_id) for _, user_id in reads} == {sender, viewer, offline}
+
+
+@pytest.mark.asyncio
+async def test_repeat_join_skips_database(message_handler):
+    """Test a participant rejoining within the membership TTL makes no database calls"""
+    handler, mock_repo = message_handler
+    handler._broadcast_to_conversation = AsyncMock()
+    handler._handle_history_request = AsyncMock()
+    user_id, other_id = str(uuid.uuid4()), str(uuid.uuid4())
+    conversation_id = str(uuid.uuid4())
+    handler.register_user(user_id, MockWebSocket())
+    join = {"type": "join_conversation", "user_id": user_id, "conversation_id": conversation_id}
+
+    await handler._handle_join_conversation(dict(join))
+    await handler._handle_join_conversation(dict(join))
+    # A new participant of a known conversation skips the existence check
+    await handler._handle_join_conversation({**join, "user_id": other_id})
+
+    mock_repo.get_conversation_by_id.assert_called_once()
+    assert mock_repo.add_user_to_conversation.call_count == 2
+
+    handler.membership_cache.invalidate(conversation_id)
+    await handler._handle_join_conversation(dict(join))
+    assert mock_repo.get_conversation_by_id.call_count == 2
+
@@ -3,9 +3,12 @@ import uuid
 from unittest.mock import MagicMock, patch
 from datetime import datetime
 
-from src.db.MessageRepository import MessageRepository
+from src.db.MessageRepository import MessageRepository, participant_set_key
 from src.db.PendoDatabase import Messages, Conversations, ConversationParticipants, User
 
+# Unpatched implementation, for tests that exercise it against a mocked session
+create_conversation_with_participants = MessageRepository.create_conversation_with_participants
+
 # Patch all repository methods that hit the DB for all tests in this module
 @pytest.fixture(autouse=True)
 def patch_repository_methods(monkeypatch):
@@ -163,3 +166,36 @@ def test_create_conversation_with_participants(message_repo):
     result = repo.create_conversation_with_participants(conversation_type, participants, name)
     repo.create_conversation_with_participants.assert_called_once_with(conversation_type, participants, name)
     assert result == mock_conversation
+
+def test_participant_set_key_ignores_order_duplicates_and_format():
+    """Test the participant-set key ignores order, duplicates and UUID formatting"""
+    a, b = uuid.uuid4(), uuid.uuid4()
+
+    key = participant_set_key([a, b])
+
+    assert key == participant_set_key([str(b).upper(), a, str(a)])
+    assert len(key) == 64
+    assert key != participant_set_key([a])
+    assert key != participant_set_key([a, b, uuid.uuid4()])
+
+def test_create_conversation_with_participants_commits_once(mock_db_session):
+    """Test a conversation, its participants and any missing user stubs are created in one commit"""
+    existing_user, new_user = uuid.uuid4(), uuid.uuid4()
+    mock_db_session.__iter__.return_value = iter([MagicMock(UserId=existing_user)])
+    added = []
+    mock_db_session.add.side_effect = added.append
+    mock_db_session.add_all.side_effect = added.extend
+
+    with patch('src.db.MessageRepository.get_db', return_value=iter([mock_db_session])):
+        conversation = create_conversation_with_participants(
+            MessageRepository(), "group", [existing_user, str(new_user), existing_user], "Support"
+        )
+
+    mock_db_session.commit.assert_called_once()
+    assert conversation.Name == "Support"
+    assert conversation.ParticipantSetKey == participant_set_key([existing_user, new_user])
+    stubs = [obj for obj in added if isinstance(obj, User)]
+    assert [stub.UserId for stub in stubs] == [new_user]
+    members = [obj for obj in added if isinstance(obj, ConversationParticipants)]
+    assert [member.UserId for member in members] == [existing_user, new_user]
+    assert all(member.ConversationId == conversation.ConversationId for member in members)
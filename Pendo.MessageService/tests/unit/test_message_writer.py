@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+from src.db.MessageWriter import MessageWriter
+
+
+def make_writer(batch_size=3, flush_interval_ms=10):
+    mock_db = MagicMock()
+    mock_db.save_messages = AsyncMock()
+    return MessageWriter(mock_db, batch_size=batch_size, flush_interval_ms=flush_interval_ms), mock_db
+
+
+def enqueue(writer, content="hello"):
+    return writer.enqueue(str(uuid.uuid4()), str(uuid.uuid4()), "chat", content)
+
+
+@pytest.mark.asyncio
+async def test_flush_on_batch_size():
+    """Test reaching the batch size writes the batch in a single insert"""
+    writer, mock_db = make_writer(batch_size=3, flush_interval_ms=60000)
+
+    for i in range(3):
+        enqueue(writer, f"message {i}")
+    await asyncio.sleep(0)
+    await writer.close()
+
+    mock_db.save_messages.assert_awaited_once()
+    batch = mock_db.save_messages.call_args[0][0]
+    assert [row["Content"] for row in batch] == ["message 0", "message 1", "message 2"]
+
+
+@pytest.mark.asyncio
+async def test_flush_on_interval():
+    """Test queued messages are written once the flush interval elapses"""
+    writer, mock_db = make_writer(batch_size=100, flush_interval_ms=10)
+
+    enqueue(writer)
+    assert writer.pending_count == 1
+
+    await asyncio.sleep(0.05)
+
+    mock_db.save_messages.assert_awaited_once()
+    assert writer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_messages():
+    """Test closing the writer persists messages still waiting on the timer"""
+    writer, mock_db = make_writer(batch_size=100, flush_interval_ms=60000)
+
+    enqueue(writer)
+    enqueue(writer)
+    await writer.close()
+
+    mock_db.save_messages.assert_awaited_once()
+    assert len(mock_db.save_messages.call_args[0][0]) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_retries_rows_individually():
+    """Test a failed bulk insert falls back to per-row inserts"""
+    writer, mock_db = make_writer(batch_size=100, flush_interval_ms=60000)
+    mock_db.save_messages.side_effect = [Exception("constraint"), None, Exception("bad row")]
+
+    enqueue(writer)
+    enqueue(writer)
+    written = await writer.flush()
+
+    assert written == 1
+    assert mock_db.save_messages.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_unwritten_rows_tracked_per_conversation():
+    """Test a conversation counts as unwritten until its rows' batch has been attempted"""
+    writer, mock_db = make_writer(batch_size=100, flush_interval_ms=60000)
+    mock_db.save_messages.side_effect = Exception("unavailable")
+
+    row = enqueue(writer)
+    assert writer.has_unwritten(row["ConversationId"])
+    assert not writer.has_unwritten(str(uuid.uuid4()))
+
+    await writer.flush()
+    assert not writer.has_unwritten(row["ConversationId"])
+
+
+@pytest.mark.asyncio
+async def test_invalid_ids_rejected_on_enqueue():
+    """Test malformed identifiers are rejected before reaching a batch"""
+    writer, _ = make_writer()
+
+    with pytest.raises(ValueError):
+        writer.enqueue("not-a-uuid", str(uuid.uuid4()), "chat", "hello")
+
+    assert writer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_read_markers_written_after_messages():
+    """Test read markers are coalesced and written once the flush's messages are stored"""
+    writer, mock_db = make_writer(batch_size=100, flush_interval_ms=60000)
+    calls = []
+    mock_db.save_messages = AsyncMock(side_effect=lambda batch: calls.append("messages"))
+    mock_db.mark_conversations_read = AsyncMock(side_effect=lambda reads: calls.append("reads"))
+    conversation_id, user_id = uuid.uuid4(), uuid.uuid4()
+
+    enqueue(writer)
+    writer.mark_read(str(conversation_id), str(user_id))
+    writer.mark_read(conversation_id, user_id)
+    assert writer.pending_reads == 1
+    await writer.close()
+
+    assert calls == ["messages", "reads"]
+    mock_db.mark_conversations_read.assert_awaited_once_with([(conversation_id, user_id)])
+    assert writer.pending_reads == 0
+
@@ -0,0 +1,83 @@
+import pytest
+
+from src.metrics import Registry, Counter, Gauge, Histogram
+
+
+def test_counter_renders_total():
+    """Test counters render with a _total suffix and labels"""
+    registry = Registry()
+    counter = Counter("test_messages", "Messages", labelnames=("type",), registry=registry)
+
+    counter.labels(type="chat").inc()
+    counter.labels(type="chat").inc(2)
+    counter.labels("join").inc()
+
+    output = registry.render()
+    assert "# TYPE test_messages counter" in output
+    assert 'test_messages_total{type="chat"} 3' in output
+    assert 'test_messages_total{type="join"} 1' in output
+
+
+def test_counter_rejects_decrease():
+    """Test counters cannot go down"""
+    counter = Counter("test_count", "Count", registry=None)
+
+    with pytest.raises(ValueError):
+        counter.inc(-1)
+
+
+def test_counter_reads_callback_at_render():
+    """Test a callback counter reports a component's own count at scrape time"""
+    registry = Registry()
+    cache = {"hits": 2}
+    counter = Counter("test_cache_lookups", "Lookups", labelnames=("result",), registry=registry)
+    counter.labels(result="hit").set_function(lambda: cache["hits"])
+
+    assert 'test_cache_lookups_total{result="hit"} 2' in registry.render()
+    cache["hits"] = 7
+    assert 'test_cache_lookups_total{result="hit"} 7' in registry.render()
+
+
+def test_gauge_reads_callback_at_render():
+    """Test a callback gauge reports the value at scrape time"""
+    registry = Registry()
+    state = {"connections": 1}
+    Gauge("test_connections", "Connections", registry=registry, callback=lambda: state["connections"])
+
+    assert "test_connections 1" in registry.render()
+    state["connections"] = 5
+    assert "test_connections 5" in registry.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test histogram buckets, sum and count"""
+    registry = Registry()
+    histogram = Histogram("test_latency", "Latency", buckets=(0.1, 1), registry=registry)
+
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value)
+
+    output = registry.render()
+    assert 'test_latency_bucket{le="0.1"} 1' in output
+    assert 'test_latency_bucket{le="1"} 3' in output
+    assert 'test_latency_bucket{le="+Inf"} 4' in output
+    assert "test_latency_sum 4.05" in output
+    assert "test_latency_count 4" in output
+
+
+def test_label_values_escaped():
+    """Test quotes in label values are escaped"""
+    registry = Registry()
+    counter = Counter("test_escape", "Escape", labelnames=("reason",), registry=registry)
+    counter.labels(reason='say "hi"').inc()
+
+    assert 'test_escape_total{reason="say \\"hi\\""} 1' in registry.render()
+
+
+def test_duplicate_registration_rejected():
+    """Test a metric name can only be registered once"""
+    registry = Registry()
+    Counter("test_duplicate", "Duplicate", registry=registry)
+
+    with pytest.raises(ValueError):
+        Counter("test_duplicate", "Duplicate", registry=registry)
@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+import websockets
+from unittest.mock import MagicMock
+
+from src.outbound_queue import OutboundQueue, SlowConsumerPolicy
+
+
+class BlockedWebSocket:
+    """Mock WebSocket whose sends wait until released"""
+
+    def __init__(self):
+        self.sent_messages = []
+        self.release = asyncio.Event()
+        self.closed_with = None
+
+    async def send(self, message):
+        await self.release.wait()
+        self.sent_messages.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_frames_written_in_order():
+    """Test queued frames are written to the socket in order"""
+    socket = BlockedWebSocket()
+    socket.release.set()
+    queue = OutboundQueue(socket, max_size=10)
+
+    for i in range(3):
+        queue.put(f"frame {i}")
+    await queue.drain()
+
+    assert socket.sent_messages == ["frame 0", "frame 1", "frame 2"]
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy_bounds_queue():
+    """Test a full queue drops its oldest frames under the drop_oldest policy"""
+    socket = BlockedWebSocket()
+    queue = OutboundQueue(socket, max_size=2, policy=SlowConsumerPolicy.DROP_OLDEST)
+    queue.put("in flight")
+    await asyncio.sleep(0)
+
+    for i in range(4):
+        assert queue.put(f"frame {i}")
+
+    assert len(queue) == 2
+    assert queue.dropped == 2
+
+    socket.release.set()
+    await queue.drain()
+    assert socket.sent_messages == ["in flight", "frame 2", "frame 3"]
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_heartbeats_coalesced():
+    """Test frames sharing a key replace each other instead of queueing"""
+    socket = BlockedWebSocket()
+    queue = OutboundQueue(socket, max_size=10)
+    queue.put("in flight")
+    await asyncio.sleep(0)
+
+    queue.put("heartbeat 1", key="heartbeat")
+    queue.put("chat")
+    queue.put("heartbeat 2", key="heartbeat")
+
+    socket.release.set()
+    await queue.drain()
+    assert socket.sent_messages == ["in flight", "heartbeat 2", "chat"]
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_policy_evicts_heartbeats_first():
+    """Test the coalesce policy evicts keyed frames before regular messages"""
+    socket = BlockedWebSocket()
+    queue = OutboundQueue(socket, max_size=2, policy=SlowConsumerPolicy.COALESCE)
+    queue.put("in flight")
+    await asyncio.sleep(0)
+
+    queue.put("chat 1")
+    queue.put("heartbeat", key="heartbeat")
+    queue.put("chat 2")
+
+    socket.release.set()
+    await queue.drain()
+    assert socket.sent_messages == ["in flight", "chat 1", "chat 2"]
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_slow_consumer():
+    """Test the disconnect policy closes the socket and reports the disconnect"""
+    socket = BlockedWebSocket()
+    on_disconnect = MagicMock()
+    queue = OutboundQueue(socket, max_size=1, policy=SlowConsumerPolicy.DISCONNECT, on_disconnect=on_disconnect)
+    queue.put("in flight")
+    await asyncio.sleep(0)
+
+    queue.put("queued")
+    assert not queue.put("overflow")
+    await asyncio.sleep(0)
+
+    assert queue.closed
+    assert socket.closed_with == 1008
+    on_disconnect.assert_called_once_with(socket)
+
+
+@pytest.mark.asyncio
+async def test_closed_connection_reported():
+    """Test a closed connection stops the writer and reports the disconnect"""
+    socket = MagicMock()
+
+    async def closed_send(message):
+        raise websockets.exceptions.ConnectionClosed(None, None)
+
+    socket.send = closed_send
+    on_disconnect = MagicMock()
+    queue = OutboundQueue(socket, on_disconnect=on_disconnect)
+
+    queue.put("frame")
+    await queue.drain()
+
+    assert queue.closed
+    on_disconnect.assert_called_once_with(socket)
+
+
+@pytest.mark.asyncio
+async def test_failed_writer_closes_and_reports_connection():
+    """Test an unexpected send error closes the connection and reports the disconnect"""
+    socket = BlockedWebSocket()
+
+    async def failing_send(message):
+        raise RuntimeError("encoder failed")
+
+    socket.send = failing_send
+    on_disconnect = MagicMock()
+    queue = OutboundQueue(socket, on_disconnect=on_disconnect)
+
+    queue.put("frame")
+    await queue.drain()
+    await asyncio.sleep(0)
+
+    assert queue.closed
+    assert socket.closed_with == 1011
+    on_disconnect.assert_called_once_with(socket)
@@ -0,0 +1,38 @@
+from src.wire_cache import WireCache
+
+
+def test_get_returns_cached_entry():
+    """Test a cached message is returned with hit and miss counts"""
+    cache = WireCache(max_messages=10)
+
+    assert cache.get("a") is None
+    cache.put("a", {"id": "a"}, '{"id": "a"}')
+
+    assert cache.get("a") == ({"id": "a"}, '{"id": "a"}')
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_least_recently_used_evicted():
+    """Test the least recently used message is evicted when full"""
+    cache = WireCache(max_messages=2)
+    cache.put("a", {}, "a")
+    cache.put("b", {}, "b")
+    cache.get("a")
+    cache.put("c", {}, "c")
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+
+def test_invalidate_removes_message():
+    """Test an invalidated message is no longer cached"""
+    cache = WireCache(max_messages=2)
+    cache.put("a", {}, "a")
+    cache.invalidate("a")
+    cache.invalidate("missing")
+
+    assert "a" not in cache